@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/stable/ref/settings/
 """
 
 from pathlib import Path
+import json
 import os
 import dj_database_url
 from dotenv import load_dotenv
@@ -48,6 +49,57 @@ elif not FERNET_KEY and not DEBUG:
      raise ValueError("La clé de chiffrement FERNET_KEY est manquante dans l'environnement de production.")
 
 
+# --- Appels Odoo (XML-RPC / JSON-RPC) ---
+# Protocole par défaut : 'xmlrpc' ou 'jsonrpc' (modifiable client par client dans l'admin)
+ODOO_RPC_PROTOCOL = os.getenv('ODOO_RPC_PROTOCOL', 'xmlrpc')
+# Délais en secondes : établissement de la connexion, puis attente de chaque réponse
+ODOO_RPC_CONNECT_TIMEOUT = float(os.getenv('ODOO_RPC_CONNECT_TIMEOUT', '10'))
+ODOO_RPC_TIMEOUT = float(os.getenv('ODOO_RPC_TIMEOUT', '60'))
+# Temps total (secondes) accordé à chaque client par exécution ; au-delà, ses indicateurs restants sont abandonnés.
+# 0 : sans limite
+ODOO_CLIENT_DEADLINE = int(os.getenv('ODOO_CLIENT_DEADLINE', '300'))
+# Échecs de transport consécutifs (délai, connexion) après lesquels un client n'est plus appelé ; 0 : désactivé
+ODOO_CIRCUIT_BREAKER_THRESHOLD = int(os.getenv('ODOO_CIRCUIT_BREAKER_THRESHOLD', '3'))
+# Backoff (secondes) d'un client en échec d'une exécution à l'autre : délai initial, doublé à chaque échec
+# consécutif jusqu'au plafond ; 0 désactive le backoff
+ODOO_CLIENT_BACKOFF_BASE = int(os.getenv('ODOO_CLIENT_BACKOFF_BASE', '900'))
+ODOO_CLIENT_BACKOFF_MAX = int(os.getenv('ODOO_CLIENT_BACKOFF_MAX', str(24 * 3600)))
+# Limites d'appels par hôte Odoo des clients, partagées par tous les workers d'un même processus :
+# {motif d'hôte (fnmatch): {'rate': appels/seconde, 'burst': rafale, 'max_in_flight': appels simultanés}},
+# premier motif correspondant appliqué ; 0 désactive une limite. Surchargeable en JSON par la variable d'environnement.
+# Avec plusieurs processus (--shard, --lease), chacun applique sa part du budget (divisé par le nombre de processus)
+# sans coordination : pas de compteur partagé, le débit cumulé sur un hôte peut donc dépasser ces valeurs.
+ODOO_HOST_RATE_LIMITS = json.loads(os.getenv('ODOO_HOST_RATE_LIMITS', '{}')) or {
+    '*.odoo.com': {'rate': 10, 'burst': 20, 'max_in_flight': 6},
+    '*': {'rate': 20, 'burst': 40, 'max_in_flight': 8},
+}
+# Budget propre à l'Odoo du cabinet (même format)
+ODOO_FIRM_RATE_LIMIT = json.loads(os.getenv('ODOO_FIRM_RATE_LIMIT', '{}')) or {
+    'rate': 5, 'burst': 10, 'max_in_flight': 4,
+}
+# Connexions keep-alive inactives conservées par hôte Odoo (partagées entre clients d'un même hôte SaaS)
+ODOO_RPC_MAX_IDLE_PER_HOST = int(os.getenv('ODOO_RPC_MAX_IDLE_PER_HOST', '10'))
+# Durée de validité (secondes) d'une session Odoo en cache (uid, version) ; 0 désactive le cache
+ODOO_SESSION_CACHE_TTL = int(os.getenv('ODOO_SESSION_CACHE_TTL', str(12 * 3600)))
+# Durée (secondes) après laquelle l'annuaire local des collaborateurs du cabinet est resynchronisé
+COLLABORATOR_DIRECTORY_TTL = int(os.getenv('COLLABORATOR_DIRECTORY_TTL', str(24 * 3600)))
+# Durée de validité (secondes) des références Odoo d'un client en cache (société, journaux, comptes) ; 0 désactive le cache
+CLIENT_REFERENCE_CACHE_TTL = int(os.getenv('CLIENT_REFERENCE_CACHE_TTL', str(24 * 3600)))
+# Durée de validité (secondes) des capacités sondées d'un Odoo (modèles, champs), remises à zéro à chaque changement
+# de version ; 0 désactive le cache
+ODOO_CAPABILITY_CACHE_TTL = int(os.getenv('ODOO_CAPABILITY_CACHE_TTL', str(7 * 24 * 3600)))
+# Délai (secondes) entre deux cycles de fetch_indicators --daemon
+FETCH_INDICATORS_INTERVAL = int(os.getenv('FETCH_INDICATORS_INTERVAL', '900'))
+# Durée (secondes) sans signe de vie après laquelle une extraction lancée depuis l'admin est considérée interrompue
+EXTRACTION_JOB_STALE_AFTER = int(os.getenv('EXTRACTION_JOB_STALE_AFTER', '3600'))
+# Durée (secondes) d'un bail de client en extraction partagée (--lease), prolongé au fil du travail du processus ;
+# doit dépasser ODOO_CLIENT_DEADLINE
+EXTRACTION_LEASE_TTL = int(os.getenv('EXTRACTION_LEASE_TTL', '600'))
+# Poids de la dernière durée mesurée dans la durée d'extraction estimée de chaque client (moyenne glissante),
+# utilisée pour lancer les clients les plus longs en premier
+CLIENT_LATENCY_SMOOTHING = float(os.getenv('CLIENT_LATENCY_SMOOTHING', '0.3'))
+
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -100,6 +152,10 @@ DATABASES = {
         conn_max_age=600
     )
 }
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Plusieurs processus fetch_indicators (--shard, --lease) écrivent dans la même base : attendre le verrou
+    # d'écriture plutôt qu'échouer (ses transactions d'écriture le prennent d'emblée, cf. core.utils.write_transaction)
+    DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 30
 
 
 # Password validation
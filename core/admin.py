@@ -6,9 +6,9 @@ from django.contrib.auth.models import User
 from django.contrib import messages
 
 # Importez vos modèles, y compris ClientOdooStatus
-from .models import UserProfile, ConfigurationCabinet, ClientsOdoo, IndicateursHistoriques, ClientOdooStatus
+from .models import UserProfile, ConfigurationCabinet, ClientsOdoo, IndicateursHistoriques, ClientOdooStatus, CollaborateurCabinet, ClientReferenceCache, OdooCapabilityCache, ClientIncrementalState, ExtractionJob, ExtractionRun, ExtractionLease
 # Importez les fonctions utilitaires
-from .utils import encrypt_value, get_odoo_cabinet_collaborators
+from .utils import encrypt_value, get_odoo_cabinet_collaborators, reset_client_backoff
 
 # --- Gestion User et UserProfile ---
 class UserProfileForm(forms.ModelForm):
@@ -85,7 +85,7 @@ class ClientsOdooForm(forms.ModelForm):
 
 @admin.register(ClientsOdoo)
 class ClientsOdooAdmin(admin.ModelAdmin):
-    form = ClientsOdooForm; list_display = ('client_name', 'client_odoo_url', 'client_odoo_db', 'client_odoo_api_user', 'display_api_key_status'); search_fields = ('client_name', 'client_odoo_url', 'client_odoo_db'); list_per_page = 20; fieldsets = ((None, {'fields': ('client_name', 'client_odoo_url', 'client_odoo_db', 'client_odoo_api_user', 'plain_api_key', 'client_odoo_encrypted_api_key')}),); readonly_fields = ('client_odoo_encrypted_api_key',)
+    form = ClientsOdooForm; list_display = ('client_name', 'client_odoo_url', 'client_odoo_db', 'client_odoo_api_user', 'display_api_key_status'); search_fields = ('client_name', 'client_odoo_url', 'client_odoo_db'); list_per_page = 20; fieldsets = ((None, {'fields': ('client_name', 'client_odoo_url', 'client_odoo_db', 'client_odoo_api_user', 'plain_api_key', 'client_odoo_encrypted_api_key', 'odoo_rpc_protocol')}),); readonly_fields = ('client_odoo_encrypted_api_key',)
     def display_api_key_status(self, obj): return "Définie" if obj.client_odoo_encrypted_api_key else "Non définie"; display_api_key_status.short_description = "Statut Clé API"
     def save_model(self, request, obj, form, change):
         plain_key = form.cleaned_data.get('plain_api_key');
@@ -93,6 +93,8 @@ class ClientsOdooAdmin(admin.ModelAdmin):
             try: obj.client_odoo_encrypted_api_key = encrypt_value(plain_key); self.message_user(request, "La clé API a été chiffrée et sauvegardée.", messages.SUCCESS)
             except ValueError as e: self.message_user(request, f"Erreur lors du chiffrement : {e}", messages.ERROR); return
         super().save_model(request, obj, form, change)
+        # Configuration corrigée : le client est retenté dès la prochaine extraction, sans attendre son backoff
+        if change: reset_client_backoff(obj)
 
 
 # --- Indicateurs Historiques ---
@@ -109,13 +111,86 @@ class IndicateursHistoriquesAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None): return True
 
 
+# --- Annuaire des collaborateurs du cabinet (synchronisé : sync_collaborators) ---
+@admin.register(CollaborateurCabinet)
+class CollaborateurCabinetAdmin(admin.ModelAdmin):
+    list_display = ('name', 'odoo_partner_id', 'synced_at')
+    search_fields = ('name', 'odoo_partner_id')
+    readonly_fields = ('odoo_partner_id', 'name', 'synced_at')
+    list_per_page = 50
+    def has_add_permission(self, request): return False
+
+
+@admin.register(ClientReferenceCache)
+class ClientReferenceCacheAdmin(admin.ModelAdmin):
+    # Supprimer une entrée force la résolution des références lors de la prochaine extraction
+    list_display = ('client', 'company_id', 'cached_at')
+    search_fields = ('client__client_name',)
+    readonly_fields = ('client', 'company_id', 'journal_ids', 'account_prefixes', 'account_codes', 'cached_at')
+    list_per_page = 50
+    def has_add_permission(self, request): return False
+
+
+@admin.register(OdooCapabilityCache)
+class OdooCapabilityCacheAdmin(admin.ModelAdmin):
+    # Supprimer une entrée force un nouveau sondage (ir.model, fields_get) lors de la prochaine extraction
+    list_display = ('odoo_url', 'odoo_db', 'odoo_version', 'probed_at')
+    search_fields = ('odoo_url', 'odoo_db')
+    readonly_fields = ('odoo_url', 'odoo_db', 'odoo_version', 'available_models', 'available_fields', 'probed_at')
+    list_per_page = 50
+    def has_add_permission(self, request): return False
+
+
+@admin.register(ClientIncrementalState)
+class ClientIncrementalStateAdmin(admin.ModelAdmin):
+    # Supprimer une entrée force le recalcul de tous les indicateurs lors de la prochaine exécution
+    list_display = ('client', 'updated_at')
+    search_fields = ('client__client_name',)
+    readonly_fields = ('client', 'watermarks', 'indicator_values', 'refreshed_at', 'updated_at')
+    list_per_page = 50
+    def has_add_permission(self, request): return False
+
+
+@admin.register(ExtractionJob)
+class ExtractionJobAdmin(admin.ModelAdmin):
+    # Les extractions se lancent depuis le bouton de l'accueil de l'admin ; l'avancement est sur la page de suivi
+    list_display = ('created_at', 'status', 'requested_by', 'processed_clients', 'total_clients', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('status', 'is_active', 'requested_by', 'created_at', 'started_at', 'finished_at', 'heartbeat_at',
+                       'total_clients', 'processed_clients', 'client_progress', 'output', 'error_message')
+    list_per_page = 25
+    def has_add_permission(self, request): return False
+
+
+@admin.register(ExtractionRun)
+class ExtractionRunAdmin(admin.ModelAdmin):
+    list_display = ('run_key', 'status', 'extraction_timestamp', 'started_at', 'finished_at', 'duration', 'client_count',
+                    'failed_client_count', 'indicator_count')
+    list_filter = ('status',)
+    search_fields = ('run_key',)
+    readonly_fields = ('run_key', 'status', 'extraction_timestamp', 'started_at', 'finished_at', 'duration', 'client_count',
+                       'failed_client_count', 'indicator_count')
+    list_per_page = 25
+    def has_add_permission(self, request): return False
+
+
+@admin.register(ExtractionLease)
+class ExtractionLeaseAdmin(admin.ModelAdmin):
+    list_display = ('client', 'run', 'worker', 'leased_until', 'attempts', 'completed_at')
+    list_filter = ('run',)
+    search_fields = ('client__client_name', 'worker')
+    readonly_fields = ('run', 'client', 'worker', 'leased_until', 'attempts', 'completed_at')
+    list_per_page = 50
+    def has_add_permission(self, request): return False
+
+
 # --- CLASSE ADMIN POUR ClientOdooStatus ---
 @admin.register(ClientOdooStatus)
 class ClientOdooStatusAdmin(admin.ModelAdmin):
-    list_display = ('get_client_name', 'connection_successful', 'last_connection_attempt', 'last_error_message_summary')
-    list_filter = ('connection_successful', 'last_connection_attempt', 'client__client_name')
+    list_display = ('get_client_name', 'connection_successful', 'interruption_reason', 'consecutive_failures', 'next_attempt_at', 'latency_estimate', 'last_duration', 'last_connection_attempt', 'last_error_message_summary')
+    list_filter = ('connection_successful', 'interruption_reason', 'last_connection_attempt', 'client__client_name')
     search_fields = ('client__client_name', 'last_error_message')
-    readonly_fields = ('client', 'connection_successful', 'last_connection_attempt', 'last_error_message')
+    readonly_fields = ('client', 'connection_successful', 'interruption_reason', 'consecutive_failures', 'next_attempt_at', 'latency_estimate', 'last_duration', 'last_connection_attempt', 'last_error_message')
     list_per_page = 25
 
     @admin.display(description='Client Odoo', ordering='client__client_name')
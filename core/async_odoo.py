@@ -0,0 +1,154 @@
+# core/async_odoo.py
+"""
+Client Odoo XML-RPC / JSON-RPC non bloquant, pour le moteur asyncio de fetch_indicators.
+
+Mêmes appels que core.utils.connect_odoo (common.version, authenticate, execute_kw),
+mêmes exceptions (xmlrpc.client.Fault), mais sur un httpx.AsyncClient partagé :
+un seul processus peut garder des centaines d'appels en vol sans un thread par client.
+"""
+import logging
+import xmlrpc.client
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .utils import (
+    version_from_common_info, refine_version_with_base_module, resolve_rpc_protocol,
+    jsonrpc_payload, jsonrpc_result, get_cached_odoo_session, store_odoo_session,
+    BASE_MODULE_VERSION_DOMAIN, BASE_MODULE_VERSION_OPTIONS, ODOO_TIMEOUT_ERROR_PREFIX,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOdooProxy:
+    """Équivalent asynchrone d'un ServerProxy sur /xmlrpc/2/<service> (ou d'un JsonRpcProxy)."""
+
+    def __init__(self, http_client, url, service, protocol=None):
+        self._http_client = http_client
+        self._service = service
+        self._jsonrpc = resolve_rpc_protocol(protocol) == 'jsonrpc'
+        self._endpoint = f'{url}/jsonrpc' if self._jsonrpc else f'{url}/xmlrpc/2/{service}'
+        self._request_id = 0
+
+    async def call(self, method, *params):
+        if self._jsonrpc:
+            self._request_id += 1
+            request_body = jsonrpc_payload(self._service, method, params, self._request_id)
+            content_type = 'application/json'
+        else:
+            request_body = xmlrpc.client.dumps(params, method).encode('utf-8')
+            content_type = 'text/xml'
+        response = await self._http_client.post(
+            self._endpoint, content=request_body, headers={'Content-Type': content_type}
+        )
+        if response.status_code != 200:
+            raise xmlrpc.client.ProtocolError(
+                self._endpoint, response.status_code, response.reason_phrase, dict(response.headers)
+            )
+        if self._jsonrpc:
+            return jsonrpc_result(response.content)
+        # loads() lève xmlrpc.client.Fault si Odoo renvoie une erreur, comme ServerProxy
+        result, _ = xmlrpc.client.loads(response.content)
+        return result[0]
+
+    async def version(self):
+        return await self.call('version')
+
+    async def authenticate(self, db, username, password, user_agent_env):
+        return await self.call('authenticate', db, username, password, user_agent_env)
+
+    async def execute_kw(self, db, uid, password, model, method, args, kwargs=None):
+        return await self.call('execute_kw', db, uid, password, model, method, args, kwargs or {})
+
+
+async def async_open_odoo_session(http_client, url, db, username, password, protocol=None, use_session_cache=False,
+                                  store_session=True):
+    """
+    Version asynchrone de core.utils.open_odoo_session (même cache de session, même store_session).
+    Retourne uid, common_proxy, object_proxy, full_version_str, error_message, from_cache.
+    """
+    full_version_str = "Inconnue"
+    try:
+        if use_session_cache:
+            try:
+                cached_session = await sync_to_async(get_cached_odoo_session, thread_sensitive=True)(
+                    url, db, username, password)
+            except Exception as e:
+                logger.warning(f"Lecture du cache de session Odoo impossible ({url}): {e}")
+                cached_session = None
+            if cached_session:
+                uid, full_version_str = cached_session
+                logger.info(f"Session Odoo en cache pour {username} (UID: {uid}) sur {url}")
+                return (uid, AsyncOdooProxy(http_client, url, 'common', protocol),
+                        AsyncOdooProxy(http_client, url, 'object', protocol), full_version_str, None, True)
+
+        common_proxy = AsyncOdooProxy(http_client, url, 'common', protocol)
+        version_info_dict = await common_proxy.version()
+        full_version_str = version_from_common_info(version_info_dict, url)
+
+        uid = await common_proxy.authenticate(db, username, password, {})
+        if not uid:
+            error_message = f"Échec de l'authentification Odoo pour {username} sur {db}@{url}"
+            logger.error(error_message)
+            return None, None, None, full_version_str, error_message, False
+
+        object_proxy = AsyncOdooProxy(http_client, url, 'object', protocol)
+        logger.info(f"Authentification réussie pour {username} (UID: {uid}) sur {url}")
+
+        try:
+            base_module_data = await object_proxy.execute_kw(
+                db, uid, password,
+                'ir.module.module', 'search_read',
+                [BASE_MODULE_VERSION_DOMAIN],
+                BASE_MODULE_VERSION_OPTIONS
+            )
+            full_version_str = refine_version_with_base_module(full_version_str, base_module_data)
+        except Exception as e_mod:
+            logger.warning(f"Impossible de récupérer la version depuis ir.module.module: {e_mod}. Utilisation de la version API: {full_version_str}")
+
+        if store_session:
+            await sync_to_async(store_odoo_session, thread_sensitive=True)(
+                url, db, username, password, uid, full_version_str)
+        return uid, common_proxy, object_proxy, full_version_str, None, False
+
+    except xmlrpc.client.Fault as e:
+        error_message = f"Erreur XML-RPC Odoo ({url}): {e.faultCode} - {e.faultString}"
+        logger.error(error_message)
+        return None, None, None, full_version_str, error_message, False
+    except (httpx.ConnectError, ConnectionRefusedError) as e:
+        error_message = f"Connexion refusée par le serveur Odoo ({url}): {e}"
+        logger.error(error_message)
+        return None, None, None, "Inconnue", error_message, False
+    except httpx.TimeoutException as e:
+        error_message = f"{ODOO_TIMEOUT_ERROR_PREFIX} ({url}): {e}"
+        logger.error(error_message)
+        return None, None, None, full_version_str, error_message, False
+    except Exception as e:
+        error_message = f"Erreur de connexion Odoo inattendue ({url}): {e}"
+        logger.error(error_message, exc_info=True)
+        return None, None, None, full_version_str, error_message, False
+
+
+async def async_connect_odoo(http_client, url, db, username, password, protocol=None, use_session_cache=False,
+                             store_session=True):
+    """
+    Version asynchrone de core.utils.connect_odoo (même cache de session).
+    Retourne uid, common_proxy, object_proxy, full_version_str, error_message.
+    """
+    return (await async_open_odoo_session(http_client, url, db, username, password, protocol, use_session_cache,
+                                          store_session))[:5]
+
+
+def make_http_client(max_connections=100, timeout=None):
+    """
+    AsyncClient partagé par tous les clients Odoo d'une exécution (keep-alive, gzip).
+    Délais par défaut : ODOO_RPC_TIMEOUT, et ODOO_RPC_CONNECT_TIMEOUT pour l'établissement de la connexion.
+    """
+    if timeout is None:
+        timeout = httpx.Timeout(settings.ODOO_RPC_TIMEOUT, connect=settings.ODOO_RPC_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=timeout,
+    )
@@ -0,0 +1,1331 @@
+# core/indicators.py
+"""
+Registre déclaratif des indicateurs et planificateur d'appels Odoo.
+
+Chaque indicateur est décrit par un IndicatorSpec (modèle, méthode, domaine, champs,
+agrégation, formatage). Pour un client, le planificateur (plan_indicators) regroupe les
+appels compatibles — lectures d'un même enregistrement, search_read identiques, comptages
+identiques — en un seul RPC, puis redistribue le résultat à chaque indicateur.
+
+Le plan est un générateur qui émet des vagues d'OdooCall (``results = yield [calls]``) :
+run_plan les exécute l'une après l'autre (moteur synchrone), run_plan_async exécute
+simultanément les appels d'une même vague (moteur asyncio).
+"""
+import asyncio
+import logging
+import time
+import urllib.parse
+import xmlrpc.client
+from datetime import date, datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class OdooCall:
+    """Un appel execute_kw à effectuer : modèle, méthode, arguments positionnels et nommés."""
+
+    __slots__ = ('model', 'method', 'args', 'kwargs')
+
+    def __init__(self, model, method, args, kwargs=None):
+        self.model = model
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs or {}
+
+    def __repr__(self):
+        return f"OdooCall({self.model}.{self.method})"
+
+
+class _BufferedStream:
+    """Flux compatible avec OutputWrapper.write() qui accumule les messages au lieu de les écrire."""
+
+    def __init__(self, lines, is_error):
+        self._lines = lines
+        self._is_error = is_error
+
+    def write(self, msg):
+        self._lines.append((self._is_error, msg))
+
+
+class ClientOutput:
+    """
+    Sortie tamponnée d'un client traité en parallèle.
+    Les messages sont restitués d'un bloc, dans l'ordre, pour ne pas s'entrelacer avec les autres.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.stdout = _BufferedStream(self.lines, is_error=False)
+        self.stderr = _BufferedStream(self.lines, is_error=True)
+
+    def replay(self, stdout, stderr):
+        for is_error, msg in self.lines:
+            (stderr if is_error else stdout).write(msg)
+
+
+class ExtractionContext:
+    """État partagé par les étapes d'extraction d'un client (références résolues, indicateurs calculés)."""
+
+    def __init__(self, client_conf, uid, out, err, style):
+        self.client_conf = client_conf
+        self.uid = uid
+        self.out = out
+        self.err = err
+        self.style = style
+        self.company_id = 1
+        self.journals = {}  # type de journal -> liste d'IDs
+        self.accounts = {}  # ID de compte -> code, pour les préfixes demandés par les indicateurs
+        # Références en cache fournies par l'appelant (company_id, journals, account_prefixes, accounts),
+        # et références résolues auprès d'Odoo par le plan, à mettre en cache par l'appelant
+        self.references = None
+        self.resolved_references = None
+        # Version Odoo détectée, capacités en cache fournies par l'appelant (OdooCapabilities)
+        # et capacités sondées par le plan, à mettre en cache par l'appelant
+        self.odoo_version = None
+        self.capabilities = None
+        self.probed_capabilities = None
+        # État de l'exécution précédente (watermarks, valeurs, dates de rafraîchissement) fourni par l'appelant,
+        # et état de cette exécution, à conserver par l'appelant.
+        # scheduled : les indicateurs dont refresh_interval n'est pas écoulé sont reportés ;
+        # incremental : ceux dont les modèles sources n'ont pas changé aussi.
+        self.scheduled = False
+        self.incremental = False
+        self.previous_state = None
+        self.extraction_state = None
+        self.indicators = {}
+        self.abandoned = []  # indicateurs abandonnés (délai du client dépassé ou disjoncteur ouvert)
+        self.rpc_count = 0
+
+    def journal_ids(self, journal_type):
+        return self.journals.get(journal_type, [])
+
+
+class OdooCapabilities:
+    """
+    Modèles et champs disponibles sur un Odoo, d'après ir.model et fields_get (voir capability_probe_calls).
+    Une capacité est un couple (modèle, champ), ou (modèle, None) pour la seule présence du modèle.
+
+    - models : modèle -> présent (bool)
+    - fields : modèle présent -> noms de ses champs
+    """
+
+    def __init__(self, models=None, fields=None):
+        self.models = dict(models or {})
+        self.fields = {model: set(names) for model, names in (fields or {}).items()}
+
+    def covers(self, needs):
+        """Vrai si toutes les capacités `needs` ont déjà été sondées."""
+        return all(model in self.models and (field is None or not self.models[model] or model in self.fields)
+                   for model, field in needs)
+
+    def missing(self, needs):
+        """Capacités de `needs` absentes de cet Odoo."""
+        return [(model, field) for model, field in needs
+                if not self.models.get(model) or (field is not None and field not in self.fields.get(model, ()))]
+
+    def update(self, other):
+        """Complète ces capacités avec celles, plus récentes, de `other`."""
+        self.models.update(other.models)
+        self.fields.update(other.fields)
+
+    def as_dict(self):
+        return {'models': self.models, 'fields': {model: sorted(names) for model, names in self.fields.items()}}
+
+
+class IndicatorNotice(Exception):
+    """
+    Levée par un domaine ou une agrégation pour signaler un cas attendu (donnée absente, aucun journal...).
+    Le message est affiché en avertissement et `value` est enregistrée comme valeur de l'indicateur.
+    """
+
+    def __init__(self, message, value=None):
+        super().__init__(message)
+        self.value = value
+
+
+# Modèles Odoo dont proviennent les références résolues par le planificateur
+REFERENCE_MODELS = {'journals': 'account.journal', 'accounts': 'account.account'}
+
+
+class IndicatorSpec:
+    """
+    Description déclarative d'un indicateur.
+
+    - model, method : appel Odoo ('search_count', 'search_read', 'read' ou 'read_group')
+    - domain : liste, ou callable(ctx) -> liste (peut lever IndicatorNotice)
+    - ids : callable(ctx) -> IDs à lire (méthode 'read')
+    - fields, groupby, options : champs lus/agrégés, regroupement (read_group), options execute_kw
+    - aggregate : callable(résultat brut, ctx) -> valeur (par défaut le résultat brut)
+    - formatter : callable(valeur) -> valeur enregistrée
+    - requires : références nécessaires au domaine ('company', 'journals', 'accounts')
+    - journal_types : types de journaux dont les IDs doivent être résolus (ctx.journal_ids)
+    - capabilities : modèles/champs qui peuvent manquer selon la version ou les modules installés,
+      ((modèle, champ ou None), ...) : l'appel n'est pas émis s'ils sont absents
+    - fallback : IndicatorSpec de même nom utilisé à la place quand ces capacités sont absentes
+    - sources : modèles lus en plus de `model` (mode incrémental : la valeur est reportée tant qu'aucun
+      modèle source n'a changé)
+    - volatile : valeur dépendant d'autre chose que des données Odoo (date du jour...), jamais reportée
+      par le mode incrémental
+    - refresh_interval : timedelta, délai pendant lequel la dernière valeur calculée est reportée sans appel
+      (None : recalculée à chaque exécution)
+    """
+
+    def __init__(self, name, model, method, domain=None, ids=None, fields=None, groupby=None, options=None,
+                 aggregate=None, formatter=None, requires=(), journal_types=(), capabilities=(), fallback=None,
+                 sources=(), volatile=False, refresh_interval=None):
+        self.name = name
+        self.model = model
+        self.method = method
+        self.domain = domain if domain is not None else []
+        self.ids = ids
+        self.fields = list(fields or [])
+        self.groupby = list(groupby or [])
+        self.options = dict(options or {})
+        self.aggregate = aggregate
+        self.formatter = formatter
+        self.journal_types = tuple(journal_types)
+        self.requires = set(requires) | ({'company', 'journals'} if self.journal_types else set())
+        self.capabilities = tuple(capabilities)
+        self.fallback = fallback
+        if self.capabilities:
+            self.requires.add('capabilities')
+        self.sources = tuple(sources)
+        self.volatile = volatile
+        self.refresh_interval = refresh_interval
+
+    def source_models(self):
+        """Modèles dont une modification peut changer la valeur de l'indicateur (variantes et références comprises)."""
+        models = set(self.sources)
+        spec = self
+        while spec is not None:
+            models.add(spec.model)
+            spec = spec.fallback
+        models.update(REFERENCE_MODELS[name] for name in self.requires if name in REFERENCE_MODELS)
+        return models
+
+    def capability_needs(self):
+        """Capacités à sonder pour cet indicateur et ses variantes de repli."""
+        spec, needs = self, []
+        while spec is not None:
+            needs.extend(need for need in spec.capabilities if need not in needs)
+            spec = spec.fallback
+        return needs
+
+    def route(self, capabilities):
+        """
+        Variante à exécuter sur un Odoo offrant `capabilities` (None : capacités inconnues, l'indicateur
+        est tenté tel quel). Lève IndicatorNotice si aucune variante n'est disponible.
+        """
+        if capabilities is None:
+            return self
+        spec = self
+        while spec is not None:
+            missing = capabilities.missing(spec.capabilities)
+            if not missing:
+                return spec
+            spec = spec.fallback
+        missing_names = ', '.join(f"{model}.{field}" if field else model
+                                  for model, field in capabilities.missing(self.capabilities))
+        raise IndicatorNotice(f"Non disponible sur cet Odoo ({missing_names}) : appel ignoré.")
+
+    def build_call(self, ctx):
+        domain = self.domain(ctx) if callable(self.domain) else self.domain
+        if self.method == 'read':
+            return OdooCall(self.model, 'read', [self.ids(ctx)], {'fields': self.fields})
+        if self.method == 'search_count':
+            return OdooCall(self.model, 'search_count', [domain])
+        if self.method == 'read_group':
+            return OdooCall(self.model, 'read_group', [domain, self.fields, self.groupby], dict(self.options))
+        return OdooCall(self.model, self.method, [domain], dict(self.options, fields=self.fields))
+
+    def compute(self, raw, ctx):
+        value = self.aggregate(raw, ctx) if self.aggregate else raw
+        if self.formatter and value is not None:
+            value = self.formatter(value)
+        return value
+
+
+class LedgerSpec(IndicatorSpec):
+    """
+    Indicateur calculé sur l'agrégation commune de account.move.line (voir ledger_calls).
+
+    - measure : 'unreconciled_count' (lignes validées non lettrées) ou 'balance' (solde des lignes validées)
+    - account_prefixes : préfixes des comptes à résoudre (ctx.accounts) avant l'agrégation
+    - account_match : callable(code du compte) -> bool, sélection des comptes parmi ceux résolus
+    - line_filter : callable(groupe, ctx) -> bool, filtre complémentaire (journal, société...)
+    - group_dimensions : champs de regroupement supplémentaires utilisés par line_filter
+    - check : callable(ctx), peut lever IndicatorNotice avant toute agrégation
+    """
+
+    def __init__(self, name, measure, account_prefixes, account_match, line_filter=None, group_dimensions=(),
+                 check=None, formatter=None, requires=(), journal_types=()):
+        super().__init__(name, 'account.move.line', 'read_group', formatter=formatter,
+                         requires=set(requires) | {'accounts'}, journal_types=journal_types,
+                         sources=('account.move',))  # état des pièces (move_id.state)
+        self.measure = measure
+        self.account_prefixes = tuple(account_prefixes)
+        self.account_match = account_match
+        self.line_filter = line_filter
+        self.group_dimensions = tuple(group_dimensions)
+        self.check = check
+
+    def compute(self, groups, ctx):
+        if self.check:
+            self.check(ctx)
+        total = 0
+        for group in groups:
+            if not self.account_match(group_account_code(group, ctx.accounts)):
+                continue
+            if self.line_filter and not self.line_filter(group, ctx):
+                continue
+            if self.measure == 'balance':
+                total += group.get('balance') or 0.0
+            else:
+                total += group.get('__count', 0)
+        if self.formatter:
+            total = self.formatter(total)
+        return total
+
+
+class PeriodBalanceSpec(IndicatorSpec):
+    """
+    Indicateur calculé sur les soldes d'une période, par préfixe de compte, en un seul read_group
+    (voir period_balance_call) : un RPC quel que soit le nombre de comptes ou de préfixes.
+
+    - account_prefixes : préfixes de comptes agrégés, ex. ('6', '7') pour le compte de résultat
+    - period : callable(ctx) -> (date_from, date_to) au format 'AAAA-MM-JJ'
+    - aggregate : callable({préfixe: solde}, ctx) -> valeur
+    """
+
+    def __init__(self, name, account_prefixes, period, aggregate, formatter=None):
+        # Volatile : la période dépend de la date du jour
+        super().__init__(name, 'account.move.line', 'read_group', aggregate=aggregate, formatter=formatter,
+                         requires=('company', 'accounts'), sources=('account.move',), volatile=True)
+        self.account_prefixes = tuple(account_prefixes)
+        self.period = period
+
+    def build_call(self, ctx):
+        date_from, date_to = self.period(ctx)
+        account_ids = sorted(account_id for account_id, code in ctx.accounts.items()
+                             if code.startswith(self.account_prefixes))
+        return period_balance_call(account_ids, date_from, date_to, ctx.company_id)
+
+    def compute(self, raw, ctx):
+        return super().compute(balances_by_prefix(raw, self.account_prefixes, ctx.accounts), ctx)
+
+
+INDICATOR_REGISTRY = []
+
+
+def register(spec):
+    INDICATOR_REGISTRY.append(spec)
+    return spec
+
+
+# --- Exécution des plans ---
+
+def run_plan(plan, execute):
+    """
+    Moteur synchrone : exécute les appels de chaque vague l'un après l'autre.
+    Une exception levée par execute(call) est renvoyée au plan à la place du résultat.
+    """
+    try:
+        wave = next(plan)
+        while True:
+            results = []
+            for call in wave:
+                try:
+                    results.append(execute(call))
+                except Exception as e:
+                    results.append(e)
+            wave = plan.send(results)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def run_plan_async(plan, execute):
+    """Moteur asyncio : les appels d'une même vague sont émis simultanément (execute est une coroutine)."""
+    try:
+        wave = next(plan)
+        while True:
+            results = await asyncio.gather(*(execute(call) for call in wave), return_exceptions=True)
+            wave = plan.send(list(results))
+    except StopIteration as stop:
+        return stop.value
+
+
+class ClientCallAborted(Exception):
+    """Appel non émis : délai du client dépassé (reason 'deadline') ou disjoncteur ouvert ('breaker')."""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+class ClientCallGuard:
+    """
+    Délai global et disjoncteur des appels d'un client, pour une exécution.
+
+    - deadline : secondes accordées au client à partir de la création du garde (0 : sans limite). Une fois
+      écoulées, plus aucun appel n'est émis ; un appel en cours reste borné par ODOO_RPC_TIMEOUT (moteur
+      synchrone) ou est interrompu à l'échéance (moteur asyncio).
+    - breaker_threshold : nombre d'échecs de transport consécutifs (délai de réponse, connexion, erreur HTTP ;
+      pas les erreurs renvoyées par Odoo) après lequel le client n'est plus appelé (0 : désactivé).
+
+    Un appel refusé lève ClientCallAborted : le plan enregistre les indicateurs concernés comme abandonnés.
+    """
+
+    def __init__(self, deadline=0, breaker_threshold=0, timeout_errors=(TimeoutError,)):
+        self.deadline = deadline
+        self.breaker_threshold = breaker_threshold
+        self.timeout_errors = timeout_errors
+        self._expires_at = time.monotonic() + deadline if deadline else None
+        self.consecutive_failures = 0
+        self.timeouts = 0
+        self.reason = None
+        self._message = None
+
+    def remaining(self):
+        """Secondes restantes avant l'échéance, ou None sans délai global."""
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - time.monotonic())
+
+    def check(self):
+        """Lève ClientCallAborted si le client ne doit plus être appelé."""
+        if self.reason is None and self.remaining() == 0:
+            self.reason = 'deadline'
+            self._message = f"délai de {self.deadline} s dépassé pour ce client"
+        if self.reason is not None:
+            raise ClientCallAborted(self.reason, self._message)
+
+    def record(self, error=None):
+        """Enregistre l'issue d'un appel émis (error=None : succès)."""
+        if error is None or isinstance(error, xmlrpc.client.Fault):
+            # Odoo a répondu, même par une erreur : l'instance est joignable
+            self.consecutive_failures = 0
+            return
+        if isinstance(error, ClientCallAborted):
+            return
+        if isinstance(error, self.timeout_errors):
+            self.timeouts += 1
+        self.consecutive_failures += 1
+        if self.reason is None and self.breaker_threshold and self.consecutive_failures >= self.breaker_threshold:
+            self.reason = 'breaker'
+            self._message = (f"disjoncteur ouvert après {self.consecutive_failures} échecs consécutifs "
+                             f"(dernier : {str(error) or error.__class__.__name__})")
+
+    def wrap(self, execute):
+        """execute(call) protégé par le garde, pour run_plan."""
+        def guarded(call):
+            self.check()
+            try:
+                result = execute(call)
+            except Exception as e:
+                self.record(e)
+                raise
+            self.record()
+            return result
+        return guarded
+
+    def wrap_async(self, execute):
+        """Coroutine execute(call) protégée par le garde et interrompue à l'échéance, pour run_plan_async."""
+        async def guarded(call):
+            self.check()
+            try:
+                result = await asyncio.wait_for(execute(call), self.remaining())
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError) and self.remaining() == 0:
+                    self.check()
+                self.record(e)
+                raise
+            self.record()
+            return result
+        return guarded
+
+    def interruption_reason(self):
+        """'deadline', 'breaker', 'timeout' (des appels sont restés sans réponse) ou None."""
+        if self.reason is not None:
+            return self.reason
+        return 'timeout' if self.timeouts else None
+
+    def summary(self, abandoned_count):
+        """Message de statut du client, ou None si l'extraction n'a pas été perturbée."""
+        if self.reason is not None:
+            return f"Extraction interrompue : {self._message}, {abandoned_count} indicateur(s) abandonné(s)."
+        if self.timeouts:
+            return f"{self.timeouts} appel(s) Odoo sans réponse dans le délai imparti."
+        return None
+
+
+def single_call(call):
+    """Sous-plan d'un seul appel : retourne son résultat ou relève son exception."""
+    [result] = yield [call]
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+# --- Planificateur ---
+
+# Méthodes dont les appels identiques à la liste de champs près peuvent être fusionnés
+FIELD_MERGEABLE_METHODS = ('read', 'search_read')
+
+
+def _merge_key(call):
+    """Clé de fusion : deux appels de même clé peuvent être servis par un seul RPC."""
+    kwargs = call.kwargs
+    if call.method in FIELD_MERGEABLE_METHODS:
+        kwargs = {k: v for k, v in kwargs.items() if k != 'fields'}
+    return call.model, call.method, repr(call.args), repr(sorted(kwargs.items()))
+
+
+def merge_calls(entries):
+    """
+    Regroupe des (spec, call) en appels fusionnés : union des champs pour read/search_read,
+    déduplication des appels identiques pour les autres méthodes.
+    Retourne une liste de (appel fusionné, [(spec, call), ...]) dans l'ordre de première apparition.
+    """
+    groups = {}
+    for spec, call in entries:
+        groups.setdefault(_merge_key(call), []).append((spec, call))
+    merged = []
+    for members in groups.values():
+        first_call = members[0][1]
+        if len(members) == 1 or first_call.method not in FIELD_MERGEABLE_METHODS:
+            merged.append((first_call, members))
+            continue
+        fields = []
+        for _, call in members:
+            fields.extend(f for f in call.kwargs.get('fields', []) if f not in fields)
+        merged.append((OdooCall(first_call.model, first_call.method, first_call.args,
+                                dict(first_call.kwargs, fields=fields)), members))
+    return merged
+
+
+def _run_wave(ctx, specs, outcomes, extra_calls=()):
+    """
+    Sous-plan : exécute les indicateurs `specs` (appels fusionnés) et les appels de référence `extra_calls`
+    dans une même vague. Un appel fusionné en échec est rejoué indicateur par indicateur, pour qu'un champ
+    absent ne fasse pas échouer les autres indicateurs servis par le même RPC.
+    Retourne les résultats (ou exceptions) des extra_calls.
+    """
+    entries = []
+    for spec in specs:
+        try:
+            entries.append((spec, spec.build_call(ctx)))
+        except IndicatorNotice as notice:
+            outcomes[spec.name] = ('notice', notice.value, str(notice))
+        except Exception as e:
+            outcomes[spec.name] = ('error', None, e)
+    merged = merge_calls(entries)
+    calls = [call for call, _ in merged] + list(extra_calls)
+    if not calls:
+        return []
+    ctx.rpc_count += len(calls)
+    results = yield calls
+
+    retry = []
+    for (call, members), raw in zip(merged, results):
+        if isinstance(raw, BaseException) and len(members) > 1:
+            retry.extend(members)
+            continue
+        for spec, _ in members:
+            _record_outcome(spec, raw, ctx, outcomes)
+    if retry:
+        ctx.rpc_count += len(retry)
+        retry_results = yield [call for _, call in retry]
+        for (spec, _), raw in zip(retry, retry_results):
+            _record_outcome(spec, raw, ctx, outcomes)
+    return results[len(merged):]
+
+
+def _failure_outcome(error):
+    if isinstance(error, ClientCallAborted):
+        return 'abandoned', None, str(error)
+    return 'error', None, error
+
+
+def _record_outcome(spec, raw, ctx, outcomes):
+    if isinstance(raw, BaseException):
+        outcomes[spec.name] = _failure_outcome(raw)
+        return
+    try:
+        outcomes[spec.name] = ('ok', spec.compute(raw, ctx), None)
+    except IndicatorNotice as notice:
+        outcomes[spec.name] = ('notice', notice.value, str(notice))
+    except Exception as e:
+        outcomes[spec.name] = ('error', None, e)
+
+
+# --- Capacités du serveur Odoo ---
+
+def _probed_field_models(needs):
+    return sorted({model for model, field in needs if field})
+
+
+def capability_probe_calls(needs):
+    """
+    Appels de sondage des capacités `needs` : un search_read sur ir.model pour la présence des modèles,
+    puis un fields_get par modèle dont des champs sont nécessaires. Tous peuvent partir dans la même vague.
+    """
+    calls = [OdooCall('ir.model', 'search_read', [[('model', 'in', sorted({model for model, _ in needs}))]],
+                      {'fields': ['model']})]
+    calls.extend(OdooCall(model, 'fields_get', [], {'attributes': ['type']}) for model in _probed_field_models(needs))
+    return calls
+
+
+def capabilities_from_probe(needs, results):
+    """OdooCapabilities à partir des résultats de capability_probe_calls ; relève l'erreur d'un sondage non concluant."""
+    models_result, fields_results = results[0], results[1:]
+    if isinstance(models_result, BaseException):
+        raise models_result
+    present = {record['model'] for record in models_result}
+    models = {model: model in present for model, _ in needs}
+    fields = {}
+    for model, raw in zip(_probed_field_models(needs), fields_results):
+        if not models[model]:
+            continue  # fields_get échoue sur un modèle absent : attendu
+        if isinstance(raw, BaseException):
+            raise raw
+        fields[model] = list(raw)
+    return OdooCapabilities(models, fields)
+
+
+def plan_capability_probe(needs):
+    """Plan d'une seule vague : sonde les capacités `needs` et retourne un OdooCapabilities."""
+    results = yield capability_probe_calls(needs)
+    return capabilities_from_probe(needs, results)
+
+
+# --- Mode incrémental ---
+
+def watermark_call(model):
+    """read_group sans regroupement : nombre d'enregistrements (archivés compris) et write_date la plus récente."""
+    return OdooCall(model, 'read_group', [[], ['write_date:max'], []],
+                    {'lazy': False, 'context': {'active_test': False}})
+
+
+def watermark_from(result):
+    """
+    Watermark [nombre, write_date max] d'un résultat de watermark_call, ou None si l'appel a échoué.
+    Le nombre détecte les suppressions, qui ne changent pas la write_date maximale.
+    """
+    if isinstance(result, BaseException) or not result:
+        return None
+    return [result[0].get('__count', 0), result[0].get('write_date') or False]
+
+
+def _carry_forward(ctx, specs, outcomes):
+    """
+    Sous-plan du mode incrémental : une vague de watermark_call (un par modèle source des indicateurs),
+    puis report des valeurs de l'exécution précédente (ctx.previous_state) pour les indicateurs dont
+    aucun modèle source n'a changé. Initialise ctx.extraction_state avec les watermarks observés.
+    """
+    models = sorted(set().union(*(spec.source_models() for spec in specs)))
+    results = yield from _run_wave(ctx, [], outcomes, [watermark_call(model) for model in models])
+    watermarks = {model: watermark_from(raw) for model, raw in zip(models, results)}
+    previous = ctx.previous_state or {}
+    previous_watermarks, previous_values = previous.get('watermarks', {}), previous.get('values', {})
+    changed = {model for model, watermark in watermarks.items()
+               if watermark is None or previous_watermarks.get(model) != watermark}
+    carried = 0
+    for spec in specs:
+        if spec.volatile or spec.name not in previous_values or spec.source_models() & changed:
+            continue
+        outcomes[spec.name] = ('carried', previous_values[spec.name], None)
+        carried += 1
+    ctx.out.write(f"   - Mode incrémental : {len(changed)} modèle(s) modifié(s) sur {len(models)}, "
+                  f"{carried} indicateur(s) reporté(s) sans appel.")
+    ctx.extraction_state['watermarks'] = {
+        model: watermark for model, watermark in watermarks.items() if watermark is not None}
+
+
+def _schedule_refreshes(ctx, specs, outcomes, now):
+    """
+    Reporte sans appel la dernière valeur calculée des indicateurs dont le refresh_interval n'est pas écoulé
+    depuis leur dernier calcul (ctx.previous_state) : seuls les indicateurs dus sont planifiés.
+    """
+    previous = ctx.previous_state or {}
+    previous_values, refreshed_at = previous.get('values', {}), previous.get('refreshed_at', {})
+    postponed = 0
+    for spec in specs:
+        if not spec.refresh_interval or spec.name not in previous_values or not refreshed_at.get(spec.name):
+            continue
+        last_refresh = datetime.fromisoformat(refreshed_at[spec.name])
+        if now - last_refresh < spec.refresh_interval:
+            outcomes[spec.name] = ('scheduled', previous_values[spec.name], last_refresh)
+            postponed += 1
+    if postponed:
+        ctx.out.write(f"   - {postponed} indicateur(s) non dû(s) (cadence de rafraîchissement), "
+                      f"{len(specs) - postponed} à rafraîchir.")
+
+
+# --- Agrégation commune de account.move.line ---
+
+def or_domains(domains):
+    """Combine des domaines (listes de feuilles, implicitement en ET) par un OU, en notation préfixée."""
+    terms = []
+    for domain in domains:
+        terms.extend(['&'] * (len(domain) - 1) + list(domain))
+    return ['|'] * (len(domains) - 1) + terms
+
+
+def group_account_code(group, accounts=None):
+    """
+    Code du compte d'un groupe read_group : lu dans `accounts` (ID -> code) si le compte y est,
+    sinon dans le libellé du many2one, de la forme « code nom ».
+    """
+    account = group.get('account_id')
+    if not account:
+        return ''
+    if accounts and account[0] in accounts:
+        return accounts[account[0]]
+    return str(account[1]).split(' ', 1)[0]
+
+
+def group_many2one_id(group, field_name):
+    value = group.get(field_name)
+    return value[0] if value else False
+
+
+def account_codes_call(account_prefixes):
+    """search_read des comptes (ID, code) commençant par l'un des préfixes : un seul appel pour tous les indicateurs."""
+    domain = or_domains([[('code', '=like', f'{prefix}%')] for prefix in account_prefixes])
+    return OdooCall('account.account', 'search_read', [domain], {'fields': ['code']})
+
+
+def ledger_calls(ledger_specs, accounts):
+    """
+    Construit au plus deux read_group sur account.move.line pour tous les LedgerSpec :
+      - 'unreconciled_count' : lignes validées non lettrées, comptées par compte (et dimensions demandées) ;
+      - 'balance' : solde des lignes validées, par compte (et dimensions demandées).
+    Les comptes sont filtrés par ID (account_id in [...]) d'après `accounts` (ID -> code) : pas de jointure
+    sur account_id.code côté Odoo. Retourne un dict mesure -> OdooCall, ou None si aucun compte ne correspond.
+    """
+    calls = {}
+    for measure, base_domain, fields in (
+            ('unreconciled_count', [('move_id.state', '=', 'posted'), ('full_reconcile_id', '=', False)],
+             ['account_id']),
+            ('balance', [('move_id.state', '=', 'posted')], ['balance']),
+    ):
+        specs = [spec for spec in ledger_specs if spec.measure == measure]
+        if not specs:
+            continue
+        account_ids = sorted(account_id for account_id, code in accounts.items()
+                             if any(spec.account_match(code) for spec in specs))
+        if not account_ids:
+            calls[measure] = None
+            continue
+        groupby = ['account_id']
+        for spec in specs:
+            groupby.extend(g for g in spec.group_dimensions if g not in groupby)
+        domain = base_domain + [('account_id', 'in', account_ids)]
+        calls[measure] = OdooCall('account.move.line', 'read_group', [domain, fields, groupby], {'lazy': False})
+    return calls
+
+
+# --- Soldes de période ---
+
+def period_balance_call(account_ids, date_from, date_to, company_id):
+    """read_group des soldes des lignes validées de la période, par compte, limité aux comptes donnés."""
+    domain = [
+        ('move_id.state', '=', 'posted'),
+        ('company_id', '=', company_id),
+        ('date', '>=', date_from),
+        ('date', '<=', date_to),
+        ('account_id', 'in', list(account_ids)),
+    ]
+    return OdooCall('account.move.line', 'read_group', [domain, ['balance'], ['account_id']], {'lazy': False})
+
+
+def balances_by_prefix(groups, account_prefixes, accounts=None):
+    """Répartit les soldes par compte d'un read_group entre les préfixes (le plus long préfixe l'emporte)."""
+    prefixes = sorted(account_prefixes, key=len, reverse=True)
+    balances = dict.fromkeys(account_prefixes, 0.0)
+    for group in groups or []:
+        code = group_account_code(group, accounts)
+        for prefix in prefixes:
+            if code.startswith(prefix):
+                balances[prefix] += group.get('balance') or 0.0
+                break
+    return balances
+
+
+# Taille des pages de search_read quand read_group n'est pas disponible
+LEDGER_CHUNK_SIZE = 2000
+
+# Fautes Odoo de droits d'accès : jamais un read_group indisponible, même si la trace le mentionne
+ACCESS_FAULT_MARKERS = ('access denied', 'accessdenied', 'accesserror', 'not allowed to access')
+# Fautes Odoo indiquant que read_group (ou la forme d'appel utilisée) n'est pas pris en charge par le serveur
+READ_GROUP_UNAVAILABLE_MARKERS = ('read_group', 'not implemented', 'notimplementederror', 'aggregat',
+                                  "unexpected keyword argument 'lazy'")
+
+
+def read_group_unavailable(error):
+    """
+    Vrai si l'erreur du read_group de ledger_calls signifie que read_group n'est pas disponible sur ce serveur :
+    seul ce cas justifie le repli par search_read. Les autres erreurs (droits, délai, session...) sont gardées
+    telles quelles : relire tout le grand livre par lots ne ferait que les répéter, en plus lent.
+    """
+    if not isinstance(error, xmlrpc.client.Fault):
+        return False
+    fault_string = str(error.faultString).lower()
+    # Code de faute 3 : AccessDenied
+    if error.faultCode == 3 or any(marker in fault_string for marker in ACCESS_FAULT_MARKERS):
+        return False
+    return any(marker in fault_string for marker in READ_GROUP_UNAVAILABLE_MARKERS)
+
+
+def stream_ledger_groups(ctx, call, chunk_size=LEDGER_CHUNK_SIZE):
+    """
+    Sous-plan de repli quand le read_group de ledger_calls échoue : reconstitue les mêmes groupes
+    (__count et balance = débit - crédit) en parcourant les lignes par pages de `chunk_size`, triées par id.
+    La mémoire reste bornée par le nombre de groupes, quelle que soit la taille du grand livre.
+    """
+    domain, fields, groupby = call.args
+    with_balance = 'balance' in fields
+    read_fields = list(groupby) + (['debit', 'credit'] if with_balance else [])
+    groups = {}
+    last_id = 0
+    while True:
+        ctx.rpc_count += 1
+        lines = yield from single_call(OdooCall(
+            'account.move.line', 'search_read', [domain + [('id', '>', last_id)]],
+            {'fields': read_fields, 'order': 'id', 'limit': chunk_size}))
+        for line in lines:
+            key = tuple(group_many2one_id(line, name) for name in groupby)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = dict({name: line.get(name) for name in groupby}, __count=0)
+                if with_balance:
+                    group['balance'] = 0.0
+            group['__count'] += 1
+            if with_balance:
+                group['balance'] += (line.get('debit') or 0.0) - (line.get('credit') or 0.0)
+        if len(lines) < chunk_size:
+            return list(groups.values())
+        last_id = lines[-1]['id']
+
+
+def _apply_cached_references(ctx, journal_types, account_prefixes):
+    """
+    Reprend les références en cache (ctx.references) si elles couvrent les types de journaux
+    et les préfixes de comptes demandés. Retourne True si elles ont été appliquées.
+    """
+    cached = ctx.references
+    if not cached:
+        return False
+    if not set(journal_types) <= set(cached['journals']) or not set(account_prefixes) <= set(cached['account_prefixes']):
+        return False
+    ctx.company_id = cached['company_id']
+    ctx.journals = {journal_type: list(cached['journals'][journal_type]) for journal_type in journal_types}
+    ctx.accounts = {account_id: code for account_id, code in cached['accounts'].items()
+                    if code.startswith(tuple(account_prefixes))}
+    return True
+
+
+def _route_specs(specs, ctx, outcomes):
+    """Remplace chaque indicateur par sa variante disponible (IndicatorSpec.route) ; les autres sont écartés."""
+    routed = []
+    for spec in specs:
+        if not spec.capabilities:
+            routed.append(spec)
+            continue
+        try:
+            routed.append(spec.route(ctx.capabilities))
+        except IndicatorNotice as notice:
+            outcomes[spec.name] = ('notice', notice.value, str(notice))
+    return routed
+
+
+def plan_indicators(ctx, specs=None):
+    """
+    Plan d'extraction d'un client, en vagues. Chaque vague émet les appels de référence dont les dépendances
+    sont résolues — société de l'utilisateur API, comptes des préfixes demandés (un search_read), puis journaux
+    de la société (un search_read pour tous les types) — avec les indicateurs dont les références sont connues.
+    Sans cache : 1. société, comptes, indicateurs sans référence ; 2. journaux, indicateurs de la société,
+    agrégations de account.move.line ; 3. indicateurs des journaux.
+    Avec des références en cache (ctx.references), tout part dans la première vague.
+    Les indicateurs dépendant de modèles ou champs optionnels attendent le sondage des capacités
+    (ir.model, fields_get), sauf si ctx.capabilities les couvre déjà : ils sont alors routés vers
+    leur variante disponible, ou écartés sans appel.
+    Les compteurs et soldes de account.move.line (LedgerSpec) sont servis par au plus deux read_group,
+    filtrés par IDs de comptes puis répartis entre les indicateurs.
+    Avec ctx.scheduled, les indicateurs qui ne sont pas dus (refresh_interval) sont reportés sans appel.
+    En mode incrémental (ctx.incremental), une vague préalable de watermarks permet de reporter sans appel
+    les valeurs des indicateurs dont les modèles sources n'ont pas changé (voir _carry_forward).
+    L'état de l'exécution (valeurs, dates de calcul, watermarks) est laissé dans ctx.extraction_state.
+    Les indicateurs dont un appel a été refusé par le garde du client (ClientCallGuard) sont abandonnés
+    et listés dans ctx.abandoned.
+    Les valeurs sont écrites dans ctx.indicators et journalisées dans l'ordre du registre ; les références
+    résolues auprès d'Odoo sont laissées dans ctx.resolved_references pour être mises en cache.
+    """
+    specs = INDICATOR_REGISTRY if specs is None else specs
+    out, err, style = ctx.out, ctx.err, ctx.style
+    outcomes = {}
+    now = datetime.now(timezone.utc)
+    previous = ctx.previous_state or {}
+    ctx.extraction_state = {'watermarks': dict(previous.get('watermarks', {})), 'values': {}, 'refreshed_at': {}}
+    if ctx.scheduled:
+        _schedule_refreshes(ctx, specs, outcomes, now)
+    if ctx.incremental:
+        yield from _carry_forward(ctx, [spec for spec in specs if spec.name not in outcomes], outcomes)
+    planned = [spec for spec in specs if spec.name not in outcomes]
+
+    needed = set().union(*(spec.requires for spec in planned))
+    journal_types = sorted({t for spec in planned for t in spec.journal_types})
+    account_prefixes = sorted({p for spec in planned for p in getattr(spec, 'account_prefixes', ())})
+    capability_needs = []
+    for spec in planned:
+        capability_needs.extend(need for need in spec.capability_needs() if need not in capability_needs)
+    ledger_specs = [s for s in planned if isinstance(s, LedgerSpec)]
+    pending = [s for s in planned if not isinstance(s, LedgerSpec)]
+
+    resolved, failed = set(), {}
+    from_cache = _apply_cached_references(ctx, journal_types, account_prefixes)
+    if from_cache:
+        resolved = needed & {'company', 'journals', 'accounts'}
+        out.write("   - Références Odoo (société, journaux, comptes) lues depuis le cache local.")
+    company_found = from_cache
+    if 'capabilities' in needed and ctx.capabilities is not None and ctx.capabilities.covers(capability_needs):
+        resolved.add('capabilities')
+        pending = _route_specs(pending, ctx, outcomes)
+    ledger = None
+    ledger_results = {}
+
+    while True:
+        reference_calls = {}  # référence -> appels qui la résolvent
+        if 'company' in needed and 'company' not in resolved:
+            reference_calls['company'] = [OdooCall('res.users', 'read', [[ctx.uid]], {'fields': ['company_id']})]
+        if 'accounts' in needed and 'accounts' not in resolved and 'accounts' not in failed:
+            reference_calls['accounts'] = [account_codes_call(account_prefixes)]
+        if 'journals' in needed and 'journals' not in resolved and 'journals' not in failed and 'company' in resolved:
+            reference_calls['journals'] = [OdooCall(
+                'account.journal', 'search_read',
+                [[('type', 'in', journal_types), ('company_id', '=', ctx.company_id)]], {'fields': ['type']})]
+        if 'capabilities' in needed and 'capabilities' not in resolved:
+            reference_calls['capabilities'] = capability_probe_calls(capability_needs)
+        ready = [s for s in pending if s.requires <= resolved]
+        ledger_wave = {}
+        if ledger is None and ledger_specs and 'accounts' in resolved:
+            ledger = ledger_calls(ledger_specs, ctx.accounts)
+            ledger_wave = {measure: call for measure, call in ledger.items() if call is not None}
+            ledger_results = {measure: [] for measure in ledger}  # aucun compte concerné : aucune ligne
+        if not (reference_calls or ready or ledger_wave):
+            break
+        pending = [s for s in pending if s not in ready]
+
+        reference_wave = [call for calls in reference_calls.values() for call in calls]
+        wave_results = yield from _run_wave(ctx, ready, outcomes, reference_wave + list(ledger_wave.values()))
+        reference_results, position = {}, 0
+        for name, calls in reference_calls.items():
+            reference_results[name] = wave_results[position:position + len(calls)]
+            position += len(calls)
+        ledger_results.update(zip(ledger_wave, wave_results[len(reference_wave):]))
+
+        if 'company' in reference_results:
+            [user_info] = reference_results['company']
+            if not isinstance(user_info, BaseException) and user_info and user_info[0].get('company_id'):
+                ctx.company_id = user_info[0]['company_id'][0]
+                company_found = True
+            else:
+                logger.warning(
+                    f"Impossible de récupérer company_id pour client {ctx.client_conf.client_name}, utilisation de l'ID 1 par défaut.")
+            resolved.add('company')
+        if 'accounts' in reference_results:
+            [accounts] = reference_results['accounts']
+            if isinstance(accounts, BaseException):
+                failed['accounts'] = accounts
+            else:
+                ctx.accounts = {account['id']: account['code'] for account in accounts if account.get('code')}
+                resolved.add('accounts')
+        if 'journals' in reference_results:
+            [journals] = reference_results['journals']
+            if isinstance(journals, BaseException):
+                failed['journals'] = journals
+            else:
+                for journal in journals:
+                    ctx.journals.setdefault(journal['type'], []).append(journal['id'])
+                for journal_type in journal_types:
+                    out.write(f"     - Journaux '{journal_type}' trouvés (IDs: {ctx.journal_ids(journal_type)}).")
+                resolved.add('journals')
+        if 'capabilities' in reference_results:
+            try:
+                probed = capabilities_from_probe(capability_needs, reference_results['capabilities'])
+                if ctx.capabilities is not None:
+                    ctx.capabilities.update(probed)
+                    probed = ctx.capabilities
+                ctx.capabilities = ctx.probed_capabilities = probed
+            except Exception as e:
+                # Capacités inconnues : les indicateurs sont tentés tels quels
+                logger.warning(f"Sondage des capacités Odoo impossible pour client {ctx.client_conf.client_name}: {e}")
+                ctx.capabilities = None
+            resolved.add('capabilities')
+            pending = _route_specs(pending, ctx, outcomes)
+
+        # Repli : agrégation en flux si read_group n'est pas disponible sur ce serveur
+        for measure in ledger_wave:
+            raw = ledger_results[measure]
+            if read_group_unavailable(raw):
+                logger.warning(
+                    f"read_group indisponible sur account.move.line pour client {ctx.client_conf.client_name} ({raw}), "
+                    f"agrégation par lots de {LEDGER_CHUNK_SIZE} lignes.")
+                try:
+                    ledger_results[measure] = yield from stream_ledger_groups(ctx, ledger[measure])
+                except Exception as e:
+                    ledger_results[measure] = e
+
+    # Indicateurs dont une référence n'a pas pu être résolue
+    for spec in pending + ledger_specs:
+        missing = [failed[name] for name in sorted(spec.requires) if name in failed]
+        if missing:
+            outcomes[spec.name] = _failure_outcome(missing[0])
+        elif isinstance(spec, LedgerSpec):
+            # Répartition de l'agrégation des écritures entre les indicateurs
+            _record_outcome(spec, ledger_results[spec.measure], ctx, outcomes)
+
+    if not from_cache and company_found and not failed and needed:
+        ctx.resolved_references = {
+            'company_id': ctx.company_id,
+            'journals': {journal_type: ctx.journal_ids(journal_type) for journal_type in journal_types},
+            'account_prefixes': account_prefixes,
+            'accounts': ctx.accounts,
+        }
+
+    # Valeurs reportables à la prochaine exécution : uniquement celles obtenues sans erreur.
+    # Une valeur reportée par la cadence garde sa date de calcul ; une valeur vérifiée par les watermarks
+    # est à jour.
+    previous_refreshed_at = previous.get('refreshed_at', {})
+    for name, (kind, value, _) in outcomes.items():
+        if kind in ('error', 'abandoned') or value is None:
+            continue
+        ctx.extraction_state['values'][name] = value
+        ctx.extraction_state['refreshed_at'][name] = (
+            previous_refreshed_at.get(name) if kind == 'scheduled' else now.isoformat())
+
+    for spec in specs:
+        kind, value, detail = outcomes.get(spec.name, ('error', None, "indicateur non planifié"))
+        ctx.indicators[spec.name] = value
+        if kind == 'ok':
+            out.write(style.SUCCESS(f"   - {spec.name}: OK ({value})"))
+        elif kind == 'carried':
+            out.write(style.SUCCESS(f"   - {spec.name}: inchangé ({value})"))
+        elif kind == 'scheduled':
+            out.write(style.SUCCESS(
+                f"   - {spec.name}: non dû ({value}, calculé le {detail.strftime('%d/%m/%Y %H:%M')} UTC)"))
+        elif kind == 'notice':
+            out.write(style.WARNING(f"   - {spec.name}: {detail}"))
+        elif kind == 'abandoned':
+            ctx.abandoned.append(spec.name)
+            err.write(style.WARNING(f"   - {spec.name}: abandonné ({detail})"))
+        else:
+            err.write(style.ERROR(f"   - Erreur extraction '{spec.name}': {detail}"))
+    out.write(f"   - {len(specs)} indicateur(s) extrait(s) en {ctx.rpc_count} appel(s) Odoo.")
+
+
+# --- Étape cabinet ---
+
+# Champs de la fiche partenaire du client dans l'Odoo cabinet
+CLIENT_URL_FIELD = 'x_odoo_database'
+COLLABORATOR_FIELD = 'x_collaborateur_1'
+
+
+def normalize_odoo_url(url):
+    """Forme canonique d'une URL Odoo pour la comparaison : sans schéma, hôte en minuscules, sans '/' final."""
+    url = (url or '').strip()
+    parts = urllib.parse.urlsplit(url if '://' in url else f'//{url}')
+    return parts.netloc.lower() + parts.path.rstrip('/')
+
+
+def _url_variants(url):
+    """Écritures possibles d'une même URL sur la fiche partenaire (schéma, '/' final), pour le domaine 'in'."""
+    canonical = normalize_odoo_url(url)
+    variants = {url.strip()}
+    for scheme in ('https://', 'http://', ''):
+        variants.update({f'{scheme}{canonical}', f'{scheme}{canonical}/'})
+    return sorted(variants)
+
+
+def plan_collaborator_index(client_urls):
+    """
+    Plan exécuté sur l'Odoo du cabinet : un seul search_read des fiches partenaires de tous les clients
+    (domaine 'in' sur leurs URLs). Retourne un index URL normalisée -> (id partenaire, collaborateur).
+    """
+    urls = sorted({variant for url in client_urls for variant in _url_variants(url)})
+    partners = yield from single_call(OdooCall(
+        'res.partner', 'search_read', [[(CLIENT_URL_FIELD, 'in', urls)]],
+        {'fields': [CLIENT_URL_FIELD, COLLABORATOR_FIELD], 'order': 'id'}))
+    index = {}
+    for partner in partners:
+        # Comme le search limit=1 d'origine : la première fiche trouvée pour une URL l'emporte
+        index.setdefault(normalize_odoo_url(partner.get(CLIENT_URL_FIELD)),
+                         (partner['id'], partner.get(COLLABORATOR_FIELD)))
+    return index
+
+
+def lookup_collaborator(ctx, index):
+    """
+    Retrouve dans l'index (plan_collaborator_index) la fiche partenaire du client et le collaborateur
+    qui lui est assigné. Retourne (id partenaire du collaborateur en str, nom affiché).
+    """
+    out, style = ctx.out, ctx.style
+    out.write(
+        f"   - Recherche du partenaire client '{ctx.client_conf.client_name}' dans l'Odoo cabinet via son URL...")
+    partner = index.get(normalize_odoo_url(ctx.client_conf.client_odoo_url))
+    if not partner:
+        out.write(style.WARNING(
+            f"   - Partenaire client avec URL '{ctx.client_conf.client_odoo_url}' (via champ '{CLIENT_URL_FIELD}') non trouvé dans l'Odoo cabinet."))
+        return "0", "N/A"
+    partner_id, collaborator_info = partner
+    out.write(f"   - Partenaire client trouvé (ID: {partner_id}). Lecture du champ collaborateur...")
+    if collaborator_info and isinstance(collaborator_info, (list, tuple)) and len(collaborator_info) >= 1:
+        assigned_collab_id, collaborator_display_name = collaborator_info[0], collaborator_info[1]
+        out.write(style.SUCCESS(
+            f"   - Collaborateur (partenaire) lié trouvé (ID: {assigned_collab_id}, Nom: {collaborator_display_name})"))
+        return str(assigned_collab_id), collaborator_display_name
+    out.write(style.WARNING(
+        f"   - Champ collaborateur '{COLLABORATOR_FIELD}' vide sur la fiche partenaire (ID: {partner_id})."))
+    return "0", "N/A"
+
+
+# --- Agrégations et formats ---
+
+def format_amount(value):
+    return f"{value:,.2f}"
+
+
+def _first_record(records):
+    return records[0] if records else {}
+
+
+def _fiscal_closing(records, ctx):
+    record = _first_record(records)
+    day_str = record.get('fiscalyear_last_day')
+    month_str = record.get('fiscalyear_last_month')
+    if not day_str or not month_str:
+        raise IndicatorNotice(
+            f"Champs jour/mois ('fiscalyear_last_day'/'month') non trouvés ou vides sur res.company ID {ctx.company_id}.")
+    try:
+        day = int(day_str)
+        month = int(month_str)
+    except (ValueError, TypeError) as conversion_error:
+        raise ValueError(
+            f"Erreur conversion jour/mois : {conversion_error} (valeurs reçues: jour='{day_str}', mois='{month_str}')")
+    return f"{day:02d}/{month:02d}"
+
+
+# Odoo retourne la clé pour les champs 'selection' : libellés affichés en français
+VAT_PERIODICITY_LABELS = {
+    'monthly': 'Mensuel',
+    'quarterly': 'Trimestriel',
+    'yearly': 'Annuel',
+}
+# !!! VÉRIFIEZ ET ADAPTEZ 'account_tax_periodicity' au vrai nom technique du champ sur res.company !!!
+VAT_PERIODICITY_FIELD = 'account_tax_periodicity'  # Hypothèse basée sur res.config.settings
+
+
+def _vat_periodicity(records, ctx):
+    record = _first_record(records)
+    value = record.get(VAT_PERIODICITY_FIELD, False)
+    if value is False:
+        raise IndicatorNotice(
+            f"Champ '{VAT_PERIODICITY_FIELD}' non trouvé ou non défini sur res.company ID {ctx.company_id}.",
+            value="Non définie")
+    display_value = VAT_PERIODICITY_LABELS.get(value, value)  # Fallback sur la valeur brute
+    if not display_value:
+        raise IndicatorNotice(f"Champ '{VAT_PERIODICITY_FIELD}' vide sur res.company ID {ctx.company_id}.",
+                              value="Non définie")
+    return str(display_value)
+
+
+def _first_field(field_name, missing_message):
+    def aggregate(records, ctx):
+        value = _first_record(records).get(field_name)
+        if not value:
+            raise IndicatorNotice(missing_message)
+        return value
+    return aggregate
+
+
+def _activation_date(records, ctx):
+    activation_date_str = _first_record(records).get('create_date')
+    if not activation_date_str:
+        raise IndicatorNotice(
+            "Date de création du premier module non trouvée ou champ 'create_date' manquant/vide.")
+    if not isinstance(activation_date_str, str):
+        raise IndicatorNotice(
+            f"create_date n'est pas une chaîne de caractères attendue ({activation_date_str}).")
+    try:
+        return datetime.strptime(activation_date_str, '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y')
+    except ValueError as ve:
+        raise IndicatorNotice(
+            f"Format de date inattendu ('{activation_date_str}'), erreur: {ve}. Stockage brut.",
+            value=activation_date_str)
+
+
+def _current_year_to_date(ctx):
+    today = date.today()
+    return today.replace(month=1, day=1).isoformat(), today.isoformat()
+
+
+def _provisional_result(balances, ctx):
+    total_income = -balances['7']  # Les produits sont créditeurs
+    total_expense = balances['6']
+    ctx.out.write(f"     - Total Produits (Classe 7): {total_income:,.2f} (solde brut: {balances['7']:,.2f})")
+    ctx.out.write(f"     - Total Charges (Classe 6): {total_expense:,.2f} (solde brut: {balances['6']:,.2f})")
+    return total_income - total_expense
+
+
+def _purchase_journals_domain(ctx):
+    journal_ids = ctx.journal_ids('purchase')
+    if not journal_ids:
+        raise IndicatorNotice("Aucun journal d'achat trouvé.", value=0)
+    return [
+        ('journal_id', 'in', journal_ids),
+        ('state', '=', 'draft'),
+        ('move_type', '=', 'in_invoice')
+    ]
+
+
+def _require_bank_journals(ctx):
+    if not ctx.journal_ids('bank'):
+        raise IndicatorNotice("Aucun journal de banque trouvé.", value=0)
+
+
+def _in_bank_journal(group, ctx):
+    return group_many2one_id(group, 'journal_id') in ctx.journal_ids('bank')
+
+
+def _in_current_company(group, ctx):
+    return group_many2one_id(group, 'company_id') == ctx.company_id
+
+
+# --- Registre ---
+# L'ordre du registre est l'ordre d'affichage des indicateurs.
+
+# Cadences de rafraîchissement des indicateurs qui changent rarement (paramétrage, modules, utilisateurs)
+REFRESH_DAILY = timedelta(days=1)
+REFRESH_WEEKLY = timedelta(days=7)
+
+register(IndicatorSpec(
+    "date cloture annuelle", 'res.company', 'read',
+    ids=lambda ctx: [ctx.company_id],
+    fields=['fiscalyear_last_day', 'fiscalyear_last_month'],
+    aggregate=_fiscal_closing,
+    requires=('company',),
+    refresh_interval=REFRESH_WEEKLY,
+))
+register(LedgerSpec(
+    "operations à qualifier", 'unreconciled_count',
+    # à modifier pour inclure tous les comptes commencant par 47
+    account_prefixes=('47',),
+    account_match=lambda code: '47%' <= code <= '475%',  # prend aussi le 4755 (opérations bancaires à valider)
+))
+register(IndicatorSpec(
+    "achats à traiter", 'account.move', 'search_count',
+    domain=_purchase_journals_domain,
+    journal_types=('purchase',),
+))
+register(LedgerSpec(
+    "paiements orphelins", 'unreconciled_count',
+    # Comptes fournisseurs (40) ou clients (41) des journaux de banque, hors réconciliations partielles
+    account_prefixes=('40', '41'),
+    account_match=lambda code: code.startswith(('40', '41')),
+    line_filter=_in_bank_journal,
+    group_dimensions=('journal_id',),
+    check=_require_bank_journals,
+    journal_types=('bank',),
+))
+register(LedgerSpec(
+    "virements internes non soldés", 'unreconciled_count',
+    account_prefixes=('58',),  # Comptes commençant par 58
+    account_match=lambda code: code.startswith('58'),
+))
+register(LedgerSpec(
+    "pivot encaissement", 'balance',
+    account_prefixes=('478',),  # Comptes commençant par 478
+    account_match=lambda code: code.startswith('478'),
+    formatter=format_amount,
+))
+register(IndicatorSpec(
+    "derniere cloture fiscale", 'res.company', 'read',
+    ids=lambda ctx: [ctx.company_id],
+    fields=['fiscalyear_lock_date'],
+    aggregate=_first_field('fiscalyear_lock_date',
+                           "Aucune date de clôture globale (fiscalyear_lock_date) trouvée ou champ vide."),
+    requires=('company',),
+    capabilities=[('res.company', 'fiscalyear_lock_date')],
+    # Odoo sans date de verrouillage sur la société : assistant de modification des dates de verrouillage
+    fallback=IndicatorSpec(
+        "derniere cloture fiscale", 'account.change.lock.date', 'search_read',
+        fields=['fiscalyear_lock_date'],
+        options={'limit': 1},
+        aggregate=_first_field('fiscalyear_lock_date',
+                               "Aucune date de clôture globale (fiscalyear_lock_date) trouvée ou champ vide."),
+        capabilities=[('account.change.lock.date', 'fiscalyear_lock_date')],
+    ),
+    refresh_interval=REFRESH_DAILY,
+))
+register(LedgerSpec(
+    "solde virements internes", 'balance',
+    account_prefixes=('58',),  # Comptes commençant par 58
+    account_match=lambda code: code.startswith('58'),
+    line_filter=_in_current_company,  # Filtrer par compagnie
+    group_dimensions=('company_id',),
+    formatter=format_amount,
+    requires=('company',),
+))
+register(IndicatorSpec(
+    "periodicite tva", 'res.company', 'read',
+    ids=lambda ctx: [ctx.company_id],
+    fields=[VAT_PERIODICITY_FIELD],
+    aggregate=_vat_periodicity,
+    requires=('company',),
+    capabilities=[('res.company', VAT_PERIODICITY_FIELD)],
+    refresh_interval=REFRESH_WEEKLY,
+))
+register(IndicatorSpec(
+    "nb modeles personnalises (indicatif)", 'ir.model', 'search_count',
+    domain=[('model', '=like', 'x_%')],  # Modèles dont le nom technique commence par 'x_'
+    refresh_interval=REFRESH_DAILY,
+))
+register(IndicatorSpec(
+    "nb actions automatisées", 'ir.actions.server', 'search_count',
+    refresh_interval=REFRESH_DAILY,
+))
+register(IndicatorSpec(
+    "nb utilisateurs actifs", 'res.users', 'search_count',
+    domain=[
+        ('active', '=', True),
+        ('share', '=', False)  # Exclut les utilisateurs portail/publics
+    ],
+    refresh_interval=REFRESH_DAILY,
+))
+register(IndicatorSpec(
+    "nb utilisateurs lpde", 'res.users', 'search_count',
+    domain=[('login', '=like', '%@lpde.pro')],  # Tous les utilisateurs (actifs ou non) en @lpde.pro
+    refresh_interval=REFRESH_DAILY,
+))
+register(IndicatorSpec(
+    "nb modules actifs", 'ir.module.module', 'search_count',
+    domain=[
+        ('state', '=', 'installed'),
+        ('application', '=', True)  # Filtre pour ne compter que les applications
+    ],
+    refresh_interval=REFRESH_DAILY,
+))
+register(IndicatorSpec(
+    "date activation base", 'ir.module.module', 'search_read',
+    fields=['create_date'],
+    options={'limit': 1, 'order': 'create_date asc'},  # Le plus ancien module installé
+    aggregate=_activation_date,
+    refresh_interval=REFRESH_WEEKLY,
+))
+register(PeriodBalanceSpec(
+    "resultat_provisoire_annee_courante",
+    account_prefixes=('6', '7'),  # Charges (classe 6) et produits (classe 7)
+    period=_current_year_to_date,
+    aggregate=_provisional_result,
+    formatter=format_amount,
+))
@@ -0,0 +1,116 @@
+# core/ingestion.py
+"""
+Écriture groupée des résultats d'extraction.
+
+fetch_indicators ne fait plus un INSERT (et un commit) par indicateur ni un update_or_create par client :
+les lignes IndicateursHistoriques, les statuts ClientOdooStatus et les états d'extraction ClientIncrementalState
+sont mis en tampon, puis écrits par lots, chaque lot dans une seule transaction (bulk_create, upsert des statuts
+et des états, compteurs de l'ExtractionRun) : l'état d'un client, dont les valeurs sont reportées aux exécutions
+suivantes, n'est jamais enregistré sans ses indicateurs. Sur PostgreSQL, les indicateurs peuvent être chargés
+par COPY (use_copy=True).
+"""
+import csv
+import io
+import logging
+import uuid
+
+from django.db import connection
+from django.utils import timezone
+from django.db.models import F
+
+from .models import IndicateursHistoriques, ClientOdooStatus, ClientIncrementalState, ExtractionRun
+from .utils import write_transaction
+
+logger = logging.getLogger(__name__)
+
+STATUS_UPDATE_FIELDS = ['last_connection_attempt', 'connection_successful', 'last_error_message', 'interruption_reason',
+                        'consecutive_failures', 'next_attempt_at', 'last_duration', 'latency_estimate']
+STATE_UPDATE_FIELDS = ['watermarks', 'indicator_values', 'refreshed_at', 'updated_at']
+
+
+class IndicatorIngestor:
+    """
+    Tampon d'écriture des indicateurs et statuts d'une exécution (`run`, à laquelle les indicateurs sont rattachés).
+
+    add_status / add_indicator / add_state ne touchent pas la base ; flush() écrit le tampon en une transaction.
+    should_flush() indique que le tampon a atteint batch_size lignes.
+    """
+
+    def __init__(self, run, batch_size=1000, use_copy=False):
+        self.run = run
+        self.batch_size = batch_size
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self._rows = []
+        self._statuses = {}
+        self._states = {}
+        # Une requête pour toute l'exécution, au lieu d'un SELECT par update_or_create
+        self._known_status_ids = set(ClientOdooStatus.objects.values_list('client_id', flat=True))
+
+    def add_status(self, client, **fields):
+        """Met en tampon le statut de connexion du client. Retourne True si le statut n'existait pas encore."""
+        created = client.pk not in self._known_status_ids
+        self._statuses[client.pk] = ClientOdooStatus(client=client, **fields)
+        return created
+
+    def add_indicator(self, client, name, value, extraction_timestamp, collaborator_id, collaborator_name):
+        self._rows.append(IndicateursHistoriques(
+            client=client, indicator_name=name, indicator_value=value,
+            extraction_timestamp=extraction_timestamp, run=self.run,
+            assigned_odoo_collaborator_id=collaborator_id,
+            assigned_collaborator_name=collaborator_name))
+
+    def add_state(self, client, state):
+        """Met en tampon l'état d'extraction du client (valeurs reportables, dates de calcul, watermarks)."""
+        self._states[client.pk] = ClientIncrementalState(
+            client=client, watermarks=state['watermarks'], indicator_values=state['values'],
+            refreshed_at=state['refreshed_at'], updated_at=timezone.now())
+
+    def should_flush(self):
+        return len(self._rows) >= self.batch_size
+
+    def flush(self):
+        """
+        Écrit le tampon en une transaction et le vide, même en cas d'erreur (le lot est alors perdu).
+        Retourne (nombre d'indicateurs, nombre de statuts) écrits.
+        """
+        rows, statuses, states = self._rows, list(self._statuses.values()), list(self._states.values())
+        self._rows, self._statuses, self._states = [], {}, {}
+        if not rows and not statuses and not states:
+            return 0, 0
+        with write_transaction():
+            if statuses:
+                ClientOdooStatus.objects.bulk_create(
+                    statuses, update_conflicts=True, unique_fields=['client'], update_fields=STATUS_UPDATE_FIELDS)
+            if states:
+                ClientIncrementalState.objects.bulk_create(
+                    states, update_conflicts=True, unique_fields=['client'], update_fields=STATE_UPDATE_FIELDS)
+            if rows:
+                if self.use_copy:
+                    self._copy_rows(rows)
+                else:
+                    IndicateursHistoriques.objects.bulk_create(rows, batch_size=self.batch_size)
+            ExtractionRun.objects.filter(pk=self.run.pk).update(
+                indicator_count=F('indicator_count') + len(rows),
+                failed_client_count=F('failed_client_count') + sum(
+                    1 for status in statuses if not status.connection_successful))
+        self._known_status_ids.update(status.client_id for status in statuses)
+        return len(rows), len(statuses)
+
+    def _copy_rows(self, rows):
+        """Chargement PostgreSQL par COPY ... FROM STDIN (CSV) : un seul aller-retour pour tout le lot."""
+        fields = [f for f in IndicateursHistoriques._meta.concrete_fields]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            if row.id is None:
+                row.id = uuid.uuid4()
+            writer.writerow([_copy_value(f.get_db_prep_value(f.pre_save(row, True), connection)) for f in fields])
+        buffer.seek(0)
+        columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+        table = connection.ops.quote_name(IndicateursHistoriques._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+
+
+def _copy_value(value):
+    return '\\N' if value is None else value
@@ -0,0 +1,149 @@
+# core/jobs.py
+"""
+Extractions des indicateurs lancées depuis l'admin, exécutées en arrière-plan.
+
+La vue ne fait plus call_command('fetch_indicators') dans la requête : elle crée un ExtractionJob
+(enqueue_extraction_job) et rend la main ; un thread local au processus web exécute la commande avec
+--job <id>, qui renseigne l'avancement client par client (JobProgress). L'état vit en base : la page de
+statut le lit, quel que soit le worker qui sert la requête.
+"""
+import io
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .models import ExtractionJob
+
+logger = logging.getLogger(__name__)
+
+# Sortie de la commande conservée sur le job (la fin, la plus utile pour diagnostiquer un échec)
+JOB_OUTPUT_MAX_LENGTH = 20000
+
+
+class ExtractionJobActive(Exception):
+    """Une extraction est déjà en attente ou en cours."""
+
+    def __init__(self, job):
+        super().__init__(f"Une extraction est déjà {job.get_status_display().lower()} (lancée le "
+                         f"{timezone.localtime(job.created_at).strftime('%d/%m/%Y %H:%M')}).")
+        self.job = job
+
+
+def active_extraction_job():
+    return ExtractionJob.objects.filter(is_active=True).first()
+
+
+def enqueue_extraction_job(user=None):
+    """
+    Crée un job d'extraction et démarre son exécution en arrière-plan, après le commit.
+    Lève ExtractionJobActive si une extraction est déjà active (contrainte unique_active_extraction_job) ;
+    un job actif sans signe de vie depuis EXTRACTION_JOB_STALE_AFTER secondes (processus web redémarré
+    pendant l'extraction) est d'abord marqué en échec.
+    """
+    _fail_stale_job()
+    try:
+        with transaction.atomic():
+            job = ExtractionJob.objects.create(requested_by=user)
+    except IntegrityError:
+        job = active_extraction_job()
+        if job is None:
+            # Le job actif vient de se terminer : la demande peut être refaite
+            raise
+        raise ExtractionJobActive(job)
+    transaction.on_commit(lambda: start_extraction_job(job.pk))
+    return job
+
+
+def start_extraction_job(job_id):
+    thread = threading.Thread(target=run_extraction_job, args=(job_id,), name=f'extraction-job-{job_id}',
+                              daemon=True)
+    thread.start()
+    return thread
+
+
+def run_extraction_job(job_id):
+    """Exécute fetch_indicators pour le job (dans le thread d'arrière-plan) et enregistre son issue."""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    try:
+        now = timezone.now()
+        updated = ExtractionJob.objects.filter(pk=job_id, status=ExtractionJob.STATUS_QUEUED).update(
+            status=ExtractionJob.STATUS_RUNNING, started_at=now, heartbeat_at=now)
+        if not updated:
+            logger.warning(f"Job d'extraction {job_id} introuvable ou déjà démarré.")
+            return
+        logger.info(f"Début du job d'extraction {job_id}.")
+        try:
+            call_command('fetch_indicators', job=job_id, stdout=stdout, stderr=stderr)
+        except BaseException as e:
+            logger.error(f"Erreur lors du job d'extraction {job_id}: {e}", exc_info=True)
+            _finish_job(job_id, ExtractionJob.STATUS_FAILED, stdout, stderr, str(e) or e.__class__.__name__)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            logger.info(f"Fin du job d'extraction {job_id}.")
+            _finish_job(job_id, ExtractionJob.STATUS_SUCCEEDED, stdout, stderr)
+    finally:
+        # Thread hors du cycle requête/réponse : Django ne ferme pas ses connexions base
+        connections.close_all()
+
+
+def _finish_job(job_id, status, stdout, stderr, error_message=None):
+    output = stdout.getvalue()
+    errors = stderr.getvalue()
+    if errors:
+        output = f"{output}\n--- Erreurs ---\n{errors}"
+    now = timezone.now()
+    ExtractionJob.objects.filter(pk=job_id).update(
+        status=status, is_active=False, finished_at=now, heartbeat_at=now,
+        output=output[-JOB_OUTPUT_MAX_LENGTH:], error_message=error_message)
+
+
+def _fail_stale_job():
+    stale_before = timezone.now() - timedelta(seconds=settings.EXTRACTION_JOB_STALE_AFTER)
+    stale_count = ExtractionJob.objects.filter(is_active=True, heartbeat_at__lt=stale_before).update(
+        status=ExtractionJob.STATUS_FAILED, is_active=False, finished_at=timezone.now(),
+        error_message="Extraction interrompue : aucun signe de vie (processus arrêté ?).")
+    if stale_count:
+        logger.warning(f"{stale_count} job(s) d'extraction sans signe de vie marqué(s) en échec.")
+
+
+class JobProgress:
+    """
+    Avancement d'un job d'extraction, renseigné par fetch_indicators --job (thread d'écriture de la commande) :
+    une écriture par client terminé, qui sert aussi de signe de vie. Les entrées sont indexées par l'id du
+    client, stable même s'il est renommé pendant le job, et portent son nom pour l'affichage.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self._progress = {}
+
+    def start(self, clients_config, deferred=()):
+        """Clients à extraire, et clients reportés par leur backoff (comptés comme traités)."""
+        self._progress = {
+            str(client_conf.pk): {'name': client_conf.client_name, 'status': 'pending', 'message': ''}
+            for client_conf in clients_config}
+        self._progress.update({
+            str(client_conf.pk): {'name': client_conf.client_name, 'status': 'deferred',
+                                  'message': "Reporté : échecs consécutifs (backoff)."}
+            for client_conf in deferred})
+        ExtractionJob.objects.filter(pk=self.job_id).update(
+            total_clients=len(self._progress), processed_clients=len(deferred), client_progress=self._progress,
+            heartbeat_at=timezone.now())
+
+    def client_done(self, client_conf, result):
+        status = result['status']
+        self._progress[str(client_conf.pk)] = {
+            'name': client_conf.client_name,
+            'status': 'ok' if status.get('connection_successful') else 'error',
+            'message': status.get('last_error_message') or '',
+            'finished_at': timezone.now().isoformat(),
+        }
+        processed = sum(1 for entry in self._progress.values() if entry['status'] != 'pending')
+        ExtractionJob.objects.filter(pk=self.job_id).update(
+            processed_clients=processed, client_progress=self._progress, heartbeat_at=timezone.now())
@@ -0,0 +1,229 @@
+# core/leases.py
+"""
+Exécutions de fetch_indicators (ExtractionRun) : points de reprise par client, reprise et finalisation,
+répartition entre plusieurs processus, sur une ou plusieurs machines.
+
+Chaque exécution enregistre un ExtractionLease par client, terminé (completed_at) dans la transaction qui écrit
+ses indicateurs. Une exécution interrompue est reprise avec --resume (ou son --run-id) : seuls les clients non
+terminés sont extraits, sous le même extraction_timestamp. Elle n'est finalisée, donc visible sur le tableau de
+bord, qu'une fois tous ses clients terminés. --resume ne reprend pas une exécution encore active ailleurs
+(signe de vie ou bail non expiré) et la réclame par un UPDATE conditionnel, comme un bail.
+
+La seule coordination est la base de données du projet (SQLite ou PostgreSQL) :
+- les processus lancés avec le même --run-id rejoignent le même ExtractionRun, donc le même extraction_timestamp ;
+- --shard i/n : chaque processus traite une part fixe des clients (répartition déterministe, sans bail) ;
+- --lease : les processus réclament les clients un lot à la fois (ExtractionLease). Une réclamation est
+  un UPDATE conditionnel (bail libre ou expiré), atomique sur les deux moteurs de base : deux processus
+  ne peuvent pas obtenir le même bail. Les baux d'un processus arrêté expirent et sont repris par les autres.
+"""
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import ExtractionRun, ExtractionLease, IndicateursHistoriques
+from .utils import write_transaction
+
+
+def parse_shard(value):
+    """'i/n' -> (i, n), avec 0 <= i < n ; lève ValueError sinon."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except (AttributeError, ValueError):
+        raise ValueError(f"'{value}' n'est pas de la forme i/n.")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"'{value}' : il faut 0 <= i < n.")
+    return index, count
+
+
+def shard_clients(clients_config, index, count):
+    """Part `index` sur `count` des clients, identique dans tous les processus (répartition par ID)."""
+    ordered = sorted(clients_config, key=lambda client_conf: str(client_conf.pk))
+    return ordered[index::count]
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def new_extraction_run():
+    """Nouvelle exécution, avec un identifiant généré (horodatage et suffixe aléatoire)."""
+    now = timezone.now()
+    return ExtractionRun.objects.create(
+        run_key=f"{timezone.localtime(now):%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}", extraction_timestamp=now)
+
+
+def _interrupted_runs(now):
+    """Exécutions non finalisées sans signe de vie ni bail en cours depuis EXTRACTION_LEASE_TTL secondes."""
+    stale_before = now - timedelta(seconds=settings.EXTRACTION_LEASE_TTL)
+    live_leases = ExtractionLease.objects.filter(run=OuterRef('pk'), completed_at__isnull=True, leased_until__gte=now)
+    return ExtractionRun.objects.filter(status=ExtractionRun.STATUS_RUNNING, heartbeat_at__lt=stale_before) \
+        .exclude(Exists(live_leases))
+
+
+def resumable_extraction_run(run_key=None):
+    """
+    Exécution à reprendre, réclamée par ce processus (son signe de vie est renouvelé), ou None.
+    Sans run_key : la dernière exécution interrompue ; une exécution encore en cours ailleurs n'est pas reprise
+    et, si deux processus reprennent en même temps, un seul l'obtient.
+    Avec run_key : cette exécution si elle n'est pas finalisée, même si elle paraît encore active (l'opérateur
+    sait que son processus est arrêté, juste après un plantage par exemple).
+    """
+    if run_key is not None:
+        run = ExtractionRun.objects.filter(run_key=run_key, status=ExtractionRun.STATUS_RUNNING).first()
+        if run is not None:
+            touch_extraction_run(run)
+        return run
+    while True:
+        now = timezone.now()
+        run = _interrupted_runs(now).order_by('-started_at').first()
+        if run is None:
+            return None
+        if _interrupted_runs(now).filter(pk=run.pk).update(heartbeat_at=now):
+            run.heartbeat_at = now
+            return run
+
+
+def active_extraction_runs():
+    """Exécutions non finalisées encore actives (signe de vie ou bail récent), que --resume seul ne reprend pas."""
+    interrupted = _interrupted_runs(timezone.now()).values('pk')
+    return ExtractionRun.objects.filter(status=ExtractionRun.STATUS_RUNNING).exclude(pk__in=interrupted) \
+        .order_by('-started_at')
+
+
+def touch_extraction_run(run):
+    """Signe de vie de l'exécution (processus toujours au travail)."""
+    ExtractionRun.objects.filter(pk=run.pk).update(heartbeat_at=timezone.now())
+
+
+def join_extraction_run(run_key):
+    """Retourne l'ExtractionRun `run_key`, créé (avec son extraction_timestamp) par le premier processus arrivé."""
+    try:
+        run, _ = ExtractionRun.objects.get_or_create(
+            run_key=run_key, defaults={'extraction_timestamp': timezone.now()})
+    except IntegrityError:
+        # Créé par un autre processus entre la lecture et l'insertion
+        run = ExtractionRun.objects.get(run_key=run_key)
+    return run
+
+
+def register_clients(run, clients_config):
+    """Crée les points de reprise manquants (chaque processus le fait : les clients ajoutés entre-temps sont inclus)."""
+    ExtractionLease.objects.bulk_create(
+        [ExtractionLease(run=run, client=client_conf) for client_conf in clients_config], ignore_conflicts=True)
+
+
+def complete_clients(run, client_ids, worker=None):
+    """Marque les clients terminés dans l'exécution ; avec `worker`, seulement ceux dont il détient le bail."""
+    if client_ids:
+        leases = ExtractionLease.objects.filter(run=run, client_id__in=client_ids, completed_at__isnull=True)
+        if worker is not None:
+            leases = leases.filter(worker=worker)
+        leases.update(completed_at=timezone.now(), leased_until=None)
+
+
+def carry_forward_clients(run, client_ids):
+    """
+    Clients reportés par leur backoff : leurs indicateurs de la dernière exécution finalisée sont recopiés dans
+    `run` (sous son timestamp) pour qu'ils restent sur le tableau de bord, et leur point de reprise est posé,
+    en une transaction. Un client déjà terminé (reporté aussi par un autre processus) n'est pas recopié deux fois.
+    Retourne le nombre d'indicateurs recopiés.
+    """
+    copied = 0
+    with write_transaction():
+        for client_id in client_ids:
+            # Le point de reprise sert de verrou : seul le processus qui le pose recopie les indicateurs
+            if not ExtractionLease.objects.filter(run=run, client_id=client_id, completed_at__isnull=True).update(
+                    completed_at=timezone.now(), leased_until=None):
+                continue
+            client_rows = IndicateursHistoriques.objects.filter(client_id=client_id)
+            previous_run = ExtractionRun.objects.filter(status=ExtractionRun.STATUS_FINALIZED) \
+                .filter(Exists(client_rows.filter(run=OuterRef('pk')))) \
+                .order_by('-extraction_timestamp').first()
+            if previous_run is None:
+                continue
+            rows = [
+                IndicateursHistoriques(
+                    client_id=client_id, indicator_name=row.indicator_name, indicator_value=row.indicator_value,
+                    extraction_timestamp=run.extraction_timestamp, run=run,
+                    assigned_odoo_collaborator_id=row.assigned_odoo_collaborator_id,
+                    assigned_collaborator_name=row.assigned_collaborator_name)
+                for row in client_rows.filter(run=previous_run)
+            ]
+            IndicateursHistoriques.objects.bulk_create(rows)
+            copied += len(rows)
+        if copied:
+            ExtractionRun.objects.filter(pk=run.pk).update(indicator_count=F('indicator_count') + copied)
+    return copied
+
+
+def pending_client_ids(run):
+    return set(ExtractionLease.objects.filter(run=run, completed_at__isnull=True).values_list('client_id', flat=True))
+
+
+def finalize_extraction_run(run):
+    """
+    Finalise l'exécution si tous ses clients sont terminés ; retourne True si elle l'est (par cet appel ou un
+    autre processus). Avec plusieurs processus, le dernier à terminer la finalise.
+    """
+    if ExtractionLease.objects.filter(run=run, completed_at__isnull=True).exists():
+        return False
+    now = timezone.now()
+    ExtractionRun.objects.filter(pk=run.pk, status=ExtractionRun.STATUS_RUNNING).update(
+        status=ExtractionRun.STATUS_FINALIZED, finished_at=now, duration=(now - run.started_at).total_seconds(),
+        client_count=run.leases.count())
+    return True
+
+
+class LeaseQueue:
+    """Baux des clients d'une exécution, réclamés par un processus (worker)."""
+
+    def __init__(self, run, worker=None, ttl=None):
+        self.run = run
+        self.worker = worker or default_worker_id()
+        self.ttl = timedelta(seconds=settings.EXTRACTION_LEASE_TTL if ttl is None else ttl)
+
+    @staticmethod
+    def _available(now):
+        return Q(completed_at__isnull=True) & (Q(leased_until__isnull=True) | Q(leased_until__lt=now))
+
+    def claim(self, limit):
+        """Réclame jusqu'à `limit` clients libres ou dont le bail a expiré ; retourne leurs IDs."""
+        claimed = []
+        while len(claimed) < limit:
+            now = timezone.now()
+            # Les clients les plus longs d'abord (durée estimée), ceux sans historique en tête
+            candidates = list(
+                ExtractionLease.objects.filter(self._available(now), run=self.run)
+                .order_by(F('client__clientodoostatus__latency_estimate').desc(nulls_first=True), 'client__client_name')
+                .values_list('pk', 'client_id')[:limit - len(claimed)])
+            if not candidates:
+                break
+            for lease_id, client_id in candidates:
+                # Perdu si un autre processus l'a réclamé depuis la lecture : on passe au suivant
+                if ExtractionLease.objects.filter(self._available(now), pk=lease_id).update(
+                        worker=self.worker, leased_until=now + self.ttl, attempts=F('attempts') + 1):
+                    claimed.append(client_id)
+        return claimed
+
+    def live_holders(self):
+        """Nombre de processus détenant un bail non expiré dans l'exécution (au moins 1 : celui-ci)."""
+        holders = set(ExtractionLease.objects.filter(
+            run=self.run, completed_at__isnull=True, leased_until__gte=timezone.now())
+            .values_list('worker', flat=True).distinct())
+        holders.add(self.worker)
+        return len(holders)
+
+    def renew(self):
+        """Prolonge les baux en cours de ce processus."""
+        ExtractionLease.objects.filter(run=self.run, worker=self.worker, completed_at__isnull=True).update(
+            leased_until=timezone.now() + self.ttl)
+
+    def complete(self, client_ids):
+        """Libère les baux des clients dont les indicateurs sont écrits."""
+        complete_clients(self.run, client_ids, worker=self.worker)
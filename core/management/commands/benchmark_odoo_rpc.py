@@ -0,0 +1,97 @@
+# core/management/commands/benchmark_odoo_rpc.py
+
+import logging
+import statistics
+import time
+import xmlrpc.client
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ClientsOdoo
+from core.utils import decrypt_value, connect_odoo, odoo_http_post, jsonrpc_payload, jsonrpc_result
+from core.indicators import ClientOutput, ExtractionContext, plan_indicators, run_plan
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ("Compare XML-RPC et JSON-RPC sur les appels d'extraction des indicateurs d'un client : "
+            "taille des réponses et temps de décodage.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--client',
+            help="Nom du client Odoo à utiliser (par défaut le premier client configuré)."
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help="Nombre de décodages de chaque réponse pour mesurer le temps de décodage (médiane)."
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat doit être supérieur ou égal à 1.")
+        clients = ClientsOdoo.objects.all()
+        if options['client']:
+            clients = clients.filter(client_name=options['client'])
+        client_conf = clients.first()
+        if not client_conf:
+            raise CommandError("Aucun client Odoo correspondant n'est configuré.")
+
+        api_key = decrypt_value(client_conf.client_odoo_encrypted_api_key)
+        if not api_key:
+            raise CommandError(f"Impossible de déchiffrer la clé API de {client_conf.client_name}.")
+        uid, _, _, version, error_message = connect_odoo(
+            client_conf.client_odoo_url, client_conf.client_odoo_db, client_conf.client_odoo_api_user, api_key,
+            protocol='xmlrpc')
+        if not uid:
+            raise CommandError(f"Connexion impossible à {client_conf.client_name} : {error_message}")
+        self.stdout.write(f"Client {client_conf.client_name} (Odoo {version}), "
+                          f"{options['repeat']} décodage(s) par réponse.")
+
+        url, db = client_conf.client_odoo_url, client_conf.client_odoo_db
+        measures = []
+
+        def execute(call):
+            # Même appel dans les deux protocoles ; le plan continue avec le résultat XML-RPC
+            params = (db, uid, api_key, call.model, call.method, call.args, call.kwargs)
+            xml_body = odoo_http_post(url, '/xmlrpc/2/object', xmlrpc.client.dumps(params, 'execute_kw').encode('utf-8'),
+                                      'text/xml')
+            json_body = odoo_http_post(url, '/jsonrpc', jsonrpc_payload('object', 'execute_kw', params), 'application/json')
+            xml_time = self._parse_time(lambda: xmlrpc.client.loads(xml_body), options['repeat'])
+            json_time = self._parse_time(lambda: jsonrpc_result(json_body), options['repeat'])
+            measures.append((f"{call.model}.{call.method}", len(xml_body), len(json_body), xml_time, json_time))
+            result, _ = xmlrpc.client.loads(xml_body)
+            return result[0]
+
+        output = ClientOutput()
+        run_plan(plan_indicators(ExtractionContext(client_conf, uid, output.stdout, output.stderr, self.style)),
+                 execute)
+
+        self.stdout.write(f"\n{'Appel':<40} {'XML (o)':>10} {'JSON (o)':>10} {'XML (ms)':>10} {'JSON (ms)':>10}")
+        for name, xml_size, json_size, xml_time, json_time in measures:
+            self.stdout.write(
+                f"{name:<40} {xml_size:>10} {json_size:>10} {xml_time * 1000:>10.3f} {json_time * 1000:>10.3f}")
+        total_xml_size = sum(m[1] for m in measures)
+        total_json_size = sum(m[2] for m in measures)
+        total_xml_time = sum(m[3] for m in measures)
+        total_json_time = sum(m[4] for m in measures)
+        self.stdout.write(
+            f"{'Total (' + str(len(measures)) + ' appels)':<40} {total_xml_size:>10} {total_json_size:>10} "
+            f"{total_xml_time * 1000:>10.3f} {total_json_time * 1000:>10.3f}")
+        if total_xml_size and total_xml_time:
+            self.stdout.write(self.style.SUCCESS(
+                f"JSON-RPC : {total_json_size / total_xml_size:.0%} de la taille XML-RPC, "
+                f"{total_json_time / total_xml_time:.0%} du temps de décodage."))
+
+    @staticmethod
+    def _parse_time(parse, repeat):
+        """Temps médian (secondes) d'un décodage de réponse."""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parse()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
@@ -1,25 +1,259 @@
 # core/management/commands/fetch_indicators.py
 
-import xmlrpc.client
+import asyncio
 import logging
+import signal
+import threading
+import time
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
 from django.utils import timezone
-from django.conf import settings  # Pour accéder à FERNET_KEY
-from datetime import datetime
 
 # Importer les modèles Django
-from core.models import ConfigurationCabinet, ClientsOdoo, IndicateursHistoriques, ClientOdooStatus
+from core.models import ConfigurationCabinet, ClientsOdoo, ClientOdooStatus
 # Importer les fonctions de chiffrement/déchiffrement et connect_odoo
-from core.utils import decrypt_value, connect_odoo  # connect_odoo est dans utils
+from core.utils import (  # connect_odoo est dans utils
+    decrypt_value, connect_odoo, open_odoo_session, is_auth_fault, store_odoo_session, invalidate_odoo_session,
+    get_cached_client_references,
+    store_client_references, get_cached_capabilities, store_capabilities, get_incremental_state,
+    get_client_backoff, write_transaction, client_backoff_delay, get_client_latency_estimates,
+    ODOO_TIMEOUT_ERROR_PREFIX,
+)
+from core.async_odoo import async_connect_odoo, async_open_odoo_session, make_http_client
+from core.ingestion import IndicatorIngestor
+from core.jobs import JobProgress
+from core.ratelimit import HostLimiterRegistry
+from core.leases import (
+    LeaseQueue, active_extraction_runs, carry_forward_clients, complete_clients, finalize_extraction_run, join_extraction_run, new_extraction_run, parse_shard,
+    pending_client_ids, register_clients, resumable_extraction_run, shard_clients, touch_extraction_run,
+)
+from core.scheduling import estimated_durations, longest_first, lpt_makespan, update_latency_estimate
+from core.indicators import (
+    CLIENT_URL_FIELD, COLLABORATOR_FIELD, ClientCallGuard, ClientOutput, ExtractionContext, OdooCapabilities,
+    lookup_collaborator, plan_capability_probe, plan_collaborator_index, plan_indicators, run_plan, run_plan_async,
+)
 
 # Configuration du logging (optionnel mais recommandé)
 logger = logging.getLogger(__name__)
 
+# Exceptions d'un appel Odoo resté sans réponse dans ODOO_RPC_TIMEOUT (moteur synchrone, moteur asyncio)
+RPC_TIMEOUT_ERRORS = (TimeoutError, httpx.TimeoutException)
+
 
 class Command(BaseCommand):
     help = 'Extrait les indicateurs depuis les instances Odoo configurées et les sauvegarde en base de données.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help="Nombre de clients extraits en parallèle (threads, ou clients en cours avec --engine async). "
+                 "Par défaut 1 : traitement séquentiel."
+        )
+        parser.add_argument(
+            '--engine',
+            choices=['sync', 'async'],
+            default='sync',
+            help="Moteur d'extraction : 'sync' (XML-RPC bloquant, pool de threads si --workers > 1) ou "
+                 "'async' (asyncio, appels d'un même client émis simultanément)."
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Nombre d'indicateurs mis en tampon avant une écriture groupée en base (une transaction par lot)."
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help="Sur PostgreSQL, charge les indicateurs par COPY au lieu de INSERT groupés."
+        )
+        parser.add_argument(
+            '--refresh-references',
+            action='store_true',
+            help="Ignore les références Odoo en cache (société, journaux, comptes) et les résout à nouveau."
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help="Ne recalcule que les indicateurs dont les modèles Odoo sources ont changé depuis la dernière "
+                 "exécution incrémentale (nombre et write_date) ; les autres valeurs sont reportées."
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help="Recalcule tous les indicateurs, y compris ceux dont la cadence de rafraîchissement n'est pas écoulée."
+        )
+        parser.add_argument(
+            '--client-deadline',
+            type=int,
+            default=None,
+            help="Temps total en secondes accordé à chaque client ; au-delà, ses indicateurs restants sont abandonnés "
+                 "(par défaut ODOO_CLIENT_DEADLINE, 0 : sans limite)."
+        )
+        parser.add_argument(
+            '--ignore-backoff',
+            action='store_true',
+            help="Tente aussi les clients en échec dont le délai de backoff (prochaine tentative) n'est pas écoulé."
+        )
+        parser.add_argument(
+            '--run-id',
+            help="Identifiant d'une exécution partagée entre plusieurs processus : tous écrivent sous le même "
+                 "timestamp. Obligatoire avec --shard et --lease."
+        )
+        parser.add_argument(
+            '--resume',
+            nargs='?',
+            const=True,
+            metavar='RUN_KEY',
+            help="Reprend la dernière exécution non finalisée (interrompue) : seuls ses clients non terminés sont "
+                 "extraits, sous son timestamp. Une exécution encore active (traitée par un processus depuis "
+                 "moins de EXTRACTION_LEASE_TTL secondes) n'est pas reprise : --resume RUN_KEY reprend cette "
+                 "exécution sans attendre (processus arrêté juste avant). Échoue s'il n'y a rien à reprendre."
+        )
+        parser.add_argument(
+            '--shard',
+            help="Part i/n des clients à traiter (par exemple 0/4), les autres parts étant traitées par d'autres "
+                 "processus lancés avec le même --run-id."
+        )
+        parser.add_argument(
+            '--lease',
+            action='store_true',
+            help="Réclame les clients de l'exécution --run-id par baux en base, un lot de --workers clients à la fois, "
+                 "avec les autres processus de cette exécution ; les baux d'un processus arrêté sont repris."
+        )
+        parser.add_argument(
+            '--daemon',
+            action='store_true',
+            help="Reste résident et relance une extraction toutes les --interval secondes (connexions, sessions et "
+                 "caches gardés d'un cycle à l'autre). SIGTERM / SIGINT terminent proprement le cycle en cours."
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=None,
+            help="Avec --daemon, délai en secondes entre le début de deux cycles (par défaut FETCH_INDICATORS_INTERVAL)."
+        )
+        parser.add_argument(
+            '--cycles',
+            type=int,
+            default=0,
+            help="Avec --daemon, nombre de cycles avant de s'arrêter (par défaut 0 : sans limite)."
+        )
+        parser.add_argument(
+            '--job',
+            type=int,
+            default=None,
+            help="ID de l'ExtractionJob dont renseigner l'avancement client par client (extraction lancée depuis l'admin)."
+        )
+
     def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers doit être supérieur ou égal à 1.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size doit être supérieur ou égal à 1.")
+        interval = options['interval'] if options['interval'] is not None else settings.FETCH_INDICATORS_INTERVAL
+        if interval < 1:
+            raise CommandError("--interval doit être supérieur ou égal à 1.")
+        client_deadline = (options['client_deadline'] if options['client_deadline'] is not None
+                           else settings.ODOO_CLIENT_DEADLINE)
+        if client_deadline < 0:
+            raise CommandError("--client-deadline doit être positif ou nul.")
+        if options['job'] is not None and options['daemon']:
+            raise CommandError("--job ne s'utilise pas avec --daemon.")
+        shard = None
+        if options['shard']:
+            try:
+                shard = parse_shard(options['shard'])
+            except ValueError as e:
+                raise CommandError(f"--shard : {e}")
+        if (shard or options['lease']) and not options['run_id']:
+            raise CommandError("--shard et --lease nécessitent --run-id (identifiant commun aux processus).")
+        if shard and options['lease']:
+            raise CommandError("--shard et --lease sont exclusifs.")
+        if options['run_id'] and options['daemon']:
+            raise CommandError("--run-id ne s'utilise pas avec --daemon (une exécution par identifiant).")
+        if options['resume'] and options['run_id']:
+            raise CommandError("--resume et --run-id sont exclusifs (--run-id reprend déjà l'exécution donnée).")
+
+        self._refresh_references = options['refresh_references']
+        self._incremental = options['incremental']
+        self._full = options['full']
+        self._client_deadline = client_deadline
+        self._shard = shard
+        # Exécution reprise (--resume) par le premier cycle, réclamée avant tout travail : sans exécution à
+        # reprendre, la commande échoue au lieu d'en commencer une nouvelle
+        self._resume_run = self._resumable_run(options['resume']) if options['resume'] else None
+        self._stop = threading.Event()
+        self._event_loop = None
+        self._http_client = None
+        self._job_progress = JobProgress(options['job']) if options['job'] is not None else None
+
+        if options['daemon']:
+            self._run_daemon(options, interval)
+        else:
+            self._run_cycle(options)
+
+    # --- Mode résident ---
+
+    def _run_daemon(self, options, interval):
+        """
+        Enchaîne les cycles d'extraction dans le même processus, sans chevauchement : un cycle plus long que
+        `interval` est suivi immédiatement du suivant. Le pool de connexions HTTP (et, avec --engine async, la
+        boucle asyncio et son client HTTP) est conservé d'un cycle à l'autre.
+        """
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._request_stop)
+        if options['engine'] == 'async':
+            self._event_loop = asyncio.new_event_loop()
+        self.stdout.write(self.style.SUCCESS(
+            f"Mode résident : une extraction toutes les {interval} seconde(s). SIGTERM pour arrêter."))
+        cycle = 0
+        try:
+            while not self._stop.is_set():
+                cycle += 1
+                started = time.monotonic()
+                self.stdout.write(self.style.NOTICE(f"\n=== Cycle {cycle} ({timezone.now()}) ==="))
+                try:
+                    self._run_cycle(options)
+                except Exception as e:
+                    # Un cycle en échec (configuration absente, base indisponible...) n'arrête pas le démon
+                    logger.error(f"Erreur lors du cycle d'extraction {cycle}: {e}", exc_info=True)
+                    self.stderr.write(self.style.ERROR(f">>> Erreur lors du cycle {cycle} : {e}"))
+                finally:
+                    # Connexion base ouverte pendant tout le cycle : elle est recyclée selon CONN_MAX_AGE
+                    close_old_connections()
+                if options['cycles'] and cycle >= options['cycles']:
+                    break
+                remaining = interval - (time.monotonic() - started)
+                if remaining > 0:
+                    self.stdout.write(f"Prochain cycle dans {remaining:.0f} seconde(s).")
+                    self._stop.wait(remaining)
+        finally:
+            if self._event_loop is not None:
+                if self._http_client is not None:
+                    self._event_loop.run_until_complete(self._http_client.aclose())
+                self._event_loop.close()
+        self.stdout.write(self.style.SUCCESS("Mode résident arrêté."))
+
+    def _request_stop(self, signum, frame):
+        if not self._stop.is_set():
+            self.stderr.write(self.style.WARNING(
+                f"Signal {signal.Signals(signum).name} reçu : arrêt après les clients en cours."))
+        self._stop.set()
+
+    def _stopping(self):
+        return self._stop.is_set()
+
+    def _run_cycle(self, options):
+        """Une extraction complète de tous les clients configurés."""
+        workers = options['workers']
         self.stdout.write(self.style.SUCCESS("--- Début de l'extraction des indicateurs ---"))
 
         # 1. Récupérer la configuration de l'Odoo Cabinet
@@ -36,16 +270,18 @@ class Command(BaseCommand):
         firm_api_key = decrypt_value(config_cabinet.firm_odoo_encrypted_api_key)
         firm_uid = None
         firm_object_proxy = None
+        firm_version = None
         if not firm_api_key:
             self.stderr.write(self.style.WARNING(
                 f"Impossible de déchiffrer la clé API pour la config cabinet. La récupération des collaborateurs échouera."))
         else:
             self.stdout.write(self.style.SUCCESS("Clé API du cabinet déchiffrée avec succès."))
-            firm_uid, _, firm_object_proxy, _, firm_conn_error = connect_odoo(
+            firm_uid, _, firm_object_proxy, firm_version, firm_conn_error = connect_odoo(
                 config_cabinet.firm_odoo_url,
                 config_cabinet.firm_odoo_db,
                 config_cabinet.firm_odoo_api_user,
-                firm_api_key
+                firm_api_key,
+                use_session_cache=True
             )
             if not firm_uid:
                 self.stderr.write(self.style.WARNING(
@@ -54,702 +290,855 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(self.style.SUCCESS("Connecté avec succès à l'Odoo du cabinet."))
 
-        clients_config = ClientsOdoo.objects.all()
+        self._firm_url = config_cabinet.firm_odoo_url
+        self._firm_db = config_cabinet.firm_odoo_db
+        self._firm_api_user = config_cabinet.firm_odoo_api_user
+        self._firm_uid = firm_uid
+        self._firm_api_key = firm_api_key
+        self._firm_version = firm_version
+        self._firm_object_proxy = firm_object_proxy
+        self._firm_session = self._new_session(firm_uid, firm_object_proxy)
+        # Limites d'appels par hôte Odoo (et budget du cabinet), partagées par tous les workers de ce cycle ;
+        # avec --shard, chacun des n processus dispose de 1/n du budget ; avec --lease, le budget est divisé
+        # par le nombre de processus détenant un bail, réévalué à chaque lot réclamé (_share_rate_limits)
+        self._rate_limits = HostLimiterRegistry(share=self._shard[1] if self._shard else 1)
+
+        clients_config = list(ClientsOdoo.objects.all())
         if not clients_config:
             self.stdout.write(self.style.WARNING("Aucun client Odoo n'est configuré."))
             self.stdout.write(self.style.SUCCESS("--- Fin de l'extraction (aucun client) ---"))
             return
 
-        self.stdout.write(f"Traitement de {clients_config.count()} client(s) Odoo configuré(s)...")
-        current_extraction_run_timestamp = timezone.now()
+        all_clients = clients_config
+        # Part fixe de ce processus, découpée dans la liste stable de tous les clients (par ID) : elle ne dépend
+        # ni des clients déjà terminés ni du backoff, identiques pour tous les processus de l'exécution
+        if self._shard:
+            clients_config = shard_clients(all_clients, *self._shard)
+            self.stdout.write(f"Part {self._shard[0]}/{self._shard[1]} : {len(clients_config)} client(s).")
+
+        # Clients en échec lors des exécutions précédentes : retentés seulement une fois leur backoff écoulé
+        self._client_backoff = get_client_backoff()
+        deferred = [] if options['ignore_backoff'] else self._deferred_clients(clients_config)
+        if deferred:
+            clients_config = [client_conf for client_conf in clients_config if client_conf not in deferred]
+            self.stdout.write(self.style.WARNING(
+                f"{len(deferred)} client(s) en échec reporté(s) (backoff), --ignore-backoff pour les tenter."))
+        # Exécution nouvelle, partagée (--run-id) ou reprise (--resume) : les clients déjà terminés sont sautés.
+        # Tous les clients y sont inscrits, quelle que soit la part : l'exécution n'est finalisée qu'une fois
+        # toutes les parts terminées.
+        self._run = self._open_run(options)
+        register_clients(self._run, all_clients)
+        # Les clients reportés gardent leurs dernières valeurs dans cette exécution (ils restent sur le tableau
+        # de bord) et ne bloquent pas sa finalisation
+        carried_count = carry_forward_clients(self._run, [client_conf.pk for client_conf in deferred])
+        if carried_count:
+            self.stdout.write(f"{carried_count} indicateur(s) des clients reportés repris de leur dernière exécution.")
+        pending = pending_client_ids(self._run)
+        completed_count = sum(1 for client_conf in clients_config if client_conf.pk not in pending)
+        if completed_count:
+            self.stdout.write(f"{completed_count} client(s) déjà terminé(s) dans cette exécution, sauté(s).")
+            clients_config = [client_conf for client_conf in clients_config if client_conf.pk in pending]
+        # Les clients les plus longs (durée estimée d'après les exécutions précédentes) partent en premier
+        self._latency_estimates = get_client_latency_estimates()
+        clients_config = longest_first(clients_config, self._latency_estimates)
+        if self._job_progress:
+            self._job_progress.start(clients_config, deferred)
+        if not clients_config:
+            self._report_run()
+            self.stdout.write(self.style.SUCCESS("--- Fin de l'extraction (aucun client à tenter) ---"))
+            return
+
+        # 3. Collaborateurs assignés de tous les clients, en un seul appel à l'Odoo cabinet
+        self._collaborator_index = self._load_collaborator_index(clients_config)
+        # L'Odoo cabinet n'est plus appelé après cette recherche (thread principal) : session renouvelée enregistrée
+        self._apply_session_cache(self._firm_session.pop('cache_update', None))
+
+        self.stdout.write(f"Traitement de {len(clients_config)} client(s) Odoo configuré(s)...")
+        self._lease_queue = None
+        if options['lease']:
+            self._lease_queue = LeaseQueue(self._run)
+            self.stdout.write(f"Baux réclamés en tant que {self._lease_queue.worker}.")
+        current_extraction_run_timestamp = self._run.extraction_timestamp
         self.stdout.write(f"Timestamp pour cette exécution : {current_extraction_run_timestamp}")
 
-        for client_conf in clients_config:
-            self.stdout.write(self.style.NOTICE(f"\n--- Traitement du client : {client_conf.client_name} ---"))
-            client_api_key = decrypt_value(client_conf.client_odoo_encrypted_api_key)
-            last_attempt_time = timezone.now()
-            client_odoo_version_str = "Inconnue"  # Valeur par défaut
-
-            if not client_api_key:
-                error_msg = "Impossible de déchiffrer la clé API."
-                self.stderr.write(self.style.ERROR(f"{error_msg} pour {client_conf.client_name}. Skipping..."))
-                ClientOdooStatus.objects.update_or_create(
-                    client=client_conf,
-                    defaults={
-                        'last_connection_attempt': last_attempt_time,
-                        'connection_successful': False,
-                        'last_error_message': error_msg
-                    }
-                )
-                continue
-            self.stdout.write(f"Clé API déchiffrée pour {client_conf.client_name}.")
+        self._ingestor = IndicatorIngestor(self._run, batch_size=options['batch_size'], use_copy=options['copy'])
+        self._unflushed_clients = []
+        if options['copy'] and not self._ingestor.use_copy:
+            self.stderr.write(self.style.WARNING("--copy n'est disponible que sur PostgreSQL : écriture par INSERT groupés."))
+        self._durations = {}
+        dispatch_started = time.monotonic()
+        try:
+            if self._lease_queue is None:
+                self._extract_clients(clients_config, options, current_extraction_run_timestamp)
+            else:
+                clients_by_id = {client_conf.pk: client_conf for client_conf in clients_config}
+                while not self._stopping():
+                    claimed = [clients_by_id[client_id] for client_id in self._lease_queue.claim(workers)
+                               if client_id in clients_by_id]
+                    if not claimed:
+                        break
+                    self._share_rate_limits()
+                    self._extract_clients(claimed, options, current_extraction_run_timestamp)
+                    # Lot écrit : ses baux sont libérés avant d'en réclamer un autre
+                    self._flush_ingestor()
+        finally:
+            # Écrit ce qui reste en tampon, y compris si l'extraction a été interrompue
+            self._flush_ingestor()
+        self._report_run()
 
-            self.stdout.write(
-                f"Tentative de connexion à {client_conf.client_odoo_url} (DB: {client_conf.client_odoo_db})...")
+        self._report_makespan(clients_config, workers, time.monotonic() - dispatch_started)
+        for key, calls, waited in self._rate_limits.throttled():
+            self.stdout.write(f"Limitation d'appels {key} : {calls} appel(s), {waited:.1f} s d'attente cumulée.")
 
-            uid_client, _, object_proxy_client, odoo_server_version_from_util, connection_error_msg = connect_odoo(
-                client_conf.client_odoo_url,
-                client_conf.client_odoo_db,
-                client_conf.client_odoo_api_user,
-                client_api_key
-            )
+        self.stdout.write(self.style.SUCCESS("\n--- Fin de l'extraction des indicateurs ---"))
 
-            if odoo_server_version_from_util:
-                client_odoo_version_str = odoo_server_version_from_util
+    def _share_rate_limits(self):
+        """Avec --lease : divise les limites d'appels par le nombre de processus travaillant sur l'exécution."""
+        holders = self._lease_queue.live_holders()
+        if holders != self._rate_limits.share:
+            self._rate_limits.set_share(holders)
+            self.stdout.write(f"Limites d'appels partagées entre {holders} processus.")
 
-            status_defaults = {
-                'last_connection_attempt': last_attempt_time,
-                'connection_successful': bool(uid_client),
-                'last_error_message': connection_error_msg if connection_error_msg else None
-            }
-            status_obj, created = ClientOdooStatus.objects.update_or_create(
-                client=client_conf,
-                defaults=status_defaults
-            )
-            if created:
-                self.stdout.write(
-                    self.style.SUCCESS(f"   - Statut de connexion initialisé pour {client_conf.client_name}."))
-            else:
+    @staticmethod
+    def _resumable_run(resume):
+        """Exécution désignée par --resume (True : la dernière interrompue) ; CommandError s'il n'y en a pas."""
+        run_key = None if resume is True else resume
+        run = resumable_extraction_run(run_key)
+        if run is not None:
+            return run
+        if run_key is not None:
+            raise CommandError(f"--resume : aucune exécution non finalisée '{run_key}'.")
+        active = [run.run_key for run in active_extraction_runs()[:5]]
+        message = "--resume : aucune exécution interrompue à reprendre."
+        if active:
+            message += (f" Exécution(s) encore active(s) (signe de vie depuis moins de "
+                        f"{settings.EXTRACTION_LEASE_TTL} s) : {', '.join(active)} ; si son processus est arrêté, "
+                        f"--resume RUN_KEY la reprend.")
+        raise CommandError(message)
+
+    def _open_run(self, options):
+        """ExtractionRun de ce cycle : celui de --run-id, celui de --resume (premier cycle), sinon un nouveau."""
+        if options['run_id']:
+            run = join_extraction_run(options['run_id'])
+            touch_extraction_run(run)
+            self.stdout.write(f"Exécution partagée '{run.run_key}'.")
+            return run
+        run, self._resume_run = self._resume_run, None  # en mode résident, seul le premier cycle reprend
+        if run is not None:
+            self.stdout.write(self.style.WARNING(
+                f"Reprise de l'exécution '{run.run_key}' (timestamp {run.extraction_timestamp})."))
+            return run
+        run = new_extraction_run()
+        self.stdout.write(f"Exécution '{run.run_key}'.")
+        return run
+
+    def _report_run(self):
+        """Finalise l'exécution si tous ses clients sont terminés, sinon indique comment la reprendre."""
+        if finalize_extraction_run(self._run):
+            self.stdout.write(self.style.SUCCESS(
+                f"Exécution '{self._run.run_key}' finalisée : visible sur le tableau de bord."))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"Exécution '{self._run.run_key}' non finalisée : {len(pending_client_ids(self._run))} client(s) "
+                f"restant(s), à reprendre avec --resume {self._run.run_key}."))
+
+    def _extract_clients(self, clients_config, options, current_extraction_run_timestamp):
+        """Extrait `clients_config` avec le moteur choisi et met les résultats en tampon d'écriture."""
+        workers = options['workers']
+        if options['engine'] == 'async':
+            self.stdout.write(f"Extraction asynchrone (asyncio), {workers} client(s) en cours au maximum...")
+            self._run_async(clients_config, workers, current_extraction_run_timestamp)
+        elif workers == 1:
+            for client_conf in clients_config:
+                if self._stopping():
+                    self.stderr.write(self.style.WARNING("Arrêt demandé : clients restants non traités."))
+                    break
+                self.stdout.write(self.style.NOTICE(f"\n--- Traitement du client : {client_conf.client_name} ---"))
+                result = self._timed_extract_client(client_conf, self.stdout, self.stderr)
+                self._save_client_result(client_conf, result, current_extraction_run_timestamp)
+        else:
+            self.stdout.write(f"Extraction parallèle avec {workers} worker(s)...")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(self._extract_client_buffered, client_conf): client_conf
+                    for client_conf in clients_config
+                }
+                # Les écritures en base et l'affichage se font dans le thread principal,
+                # au fil des clients terminés : pas d'écriture concurrente ni de sortie entrelacée.
+                for future in as_completed(futures):
+                    if self._stopping():
+                        # Les clients pas encore démarrés sont abandonnés, ceux en cours se terminent
+                        for pending_future in futures:
+                            pending_future.cancel()
+                    if future.cancelled():
+                        continue
+                    client_conf = futures[future]
+                    self.stdout.write(self.style.NOTICE(f"\n--- Traitement du client : {client_conf.client_name} ---"))
+                    result, output = future.result()
+                    output.replay(self.stdout, self.stderr)
+                    self._save_client_result(client_conf, result, current_extraction_run_timestamp)
+
+    def _timed_extract_client(self, client_conf, out, err):
+        """_extract_client avec sa durée ; une erreur inattendue devient un échec du client (_unexpected_error_result)."""
+        started = time.monotonic()
+        try:
+            result = self._extract_client(client_conf, out, err)
+        except Exception as e:
+            result = self._unexpected_error_result(client_conf, e, err)
+        result['duration'] = time.monotonic() - started
+        return result
+
+    def _unexpected_error_result(self, client_conf, error, err):
+        """
+        Résultat d'un client dont l'extraction a levé une exception inattendue : son statut est écrit en échec et
+        il est terminé comme les autres clients en échec, pour que l'exécution puisse être finalisée.
+        """
+        logger.error(f"Erreur inattendue lors de l'extraction de {client_conf.client_name}: {error}", exc_info=error)
+        err.write(self.style.ERROR(f">>> Erreur inattendue pour {client_conf.client_name}: {error}. Skipping..."))
+        return {
+            'status': {
+                'last_connection_attempt': timezone.now(),
+                'connection_successful': False,
+                'last_error_message': f"Erreur inattendue : {error}",
+            },
+            'authenticated': False,
+            'indicators': {},
+            'collaborator_id': "0",
+            'collaborator_name': "N/A",
+        }
+
+    def _extract_client_buffered(self, client_conf):
+        """Exécute _extract_client dans un worker en mémorisant sa sortie pour l'afficher d'un bloc."""
+        output = ClientOutput()
+        try:
+            result = self._timed_extract_client(client_conf, output.stdout, output.stderr)
+        finally:
+            # Le cache de session passe par l'ORM : fermer la connexion base propre à ce thread
+            connections.close_all()
+        return result, output
+
+    def _deferred_clients(self, clients_config):
+        """Clients dont la prochaine tentative (backoff après des échecs consécutifs) n'est pas encore due."""
+        now = timezone.now()
+        deferred = []
+        for client_conf in clients_config:
+            failures, next_attempt_at = self._client_backoff.get(client_conf.pk, (0, None))
+            if next_attempt_at and next_attempt_at > now:
+                deferred.append(client_conf)
                 self.stdout.write(
-                    self.style.SUCCESS(f"   - Statut de connexion mis à jour pour {client_conf.client_name}."))
+                    f"   - {client_conf.client_name} : {failures} échec(s) consécutif(s), prochaine tentative après "
+                    f"{timezone.localtime(next_attempt_at).strftime('%d/%m/%Y %H:%M')}.")
+        return deferred
 
-            indicators_data = {}
+    def _apply_latency(self, client_conf, result):
+        """Complète le statut du client par la durée de son extraction et sa nouvelle durée estimée."""
+        duration = result['duration']
+        self._durations[client_conf.pk] = duration
+        estimate = update_latency_estimate(
+            self._latency_estimates.get(client_conf.pk), duration, settings.CLIENT_LATENCY_SMOOTHING)
+        result['status'].update(last_duration=round(duration, 3), latency_estimate=round(estimate, 3))
+
+    def _report_makespan(self, clients_config, workers, actual):
+        """Compare la durée de l'extraction à celle prévue par l'ordonnancement LPT des durées estimées."""
+        if self._lease_queue is not None:
+            # Les clients traités dépendent des autres processus : pas de prévision pour ce processus seul
+            self.stdout.write(f"Durée de l'extraction : {actual:.1f} s pour {len(self._durations)} client(s).")
+            return
+        unknown = sum(1 for client_conf in clients_config if self._latency_estimates.get(client_conf.pk) is None)
+        if unknown == len(clients_config):
+            self.stdout.write(f"Durée de l'extraction : {actual:.1f} s (pas encore d'historique pour prévoir).")
+            return
+        predicted = lpt_makespan(estimated_durations(clients_config, self._latency_estimates), workers)
+        gap = f", écart {(actual - predicted) / predicted:+.0%}" if predicted else ""
+        unknown_note = f", {unknown} client(s) sans historique" if unknown else ""
+        self.stdout.write(
+            f"Durée de l'extraction : prévue {predicted:.1f} s (plus longs d'abord sur {workers} worker(s)"
+            f"{unknown_note}), réelle {actual:.1f} s{gap}.")
+        slowest = sorted(self._durations.items(), key=lambda entry: -entry[1])[:3]
+        names = {client_conf.pk: client_conf.client_name for client_conf in clients_config}
+        self.stdout.write("Clients les plus longs : " + ", ".join(
+            f"{names.get(client_id, client_id)} {duration:.1f} s" for client_id, duration in slowest) + ".")
 
-            # Indicateur : Version Odoo Client
+    def _apply_backoff(self, client_conf, result):
+        """
+        Complète le statut du client : un échec (connexion, authentification, disjoncteur) repousse la prochaine
+        tentative (client_backoff_delay) ; un succès rétablit la cadence normale.
+        """
+        status = result['status']
+        failed = (not status['connection_successful']
+                  or status.get('interruption_reason') == ClientOdooStatus.INTERRUPTION_BREAKER)
+        if not failed:
+            status.update(consecutive_failures=0, next_attempt_at=None)
+            return
+        failures = self._client_backoff.get(client_conf.pk, (0, None))[0] + 1
+        next_attempt_at = status['last_connection_attempt'] + client_backoff_delay(failures)
+        status.update(consecutive_failures=failures, next_attempt_at=next_attempt_at)
+        self.stdout.write(self.style.WARNING(
+            f"   - {failures} échec(s) consécutif(s) pour {client_conf.client_name}, prochaine tentative après "
+            f"{timezone.localtime(next_attempt_at).strftime('%d/%m/%Y %H:%M')}."))
+
+    def _save_client_result(self, client_conf, result, extraction_timestamp):
+        """
+        Met en tampon le statut de connexion et les indicateurs d'un client, depuis le thread d'écriture : le thread
+        principal (moteurs synchrones), ou l'unique thread de sync_to_async (moteur asyncio), jamais deux à la fois.
+        """
+        self._apply_backoff(client_conf, result)
+        self._apply_latency(client_conf, result)
+        if result.get('cache'):
+            self._store_client_cache(client_conf, result['cache'])
+        self._apply_session_cache(result.get('session_cache'))
+        created = self._ingestor.add_status(client_conf, **result['status'])
+        if created:
+            self.stdout.write(
+                self.style.SUCCESS(f"   - Statut de connexion initialisé pour {client_conf.client_name}."))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"   - Statut de connexion mis à jour pour {client_conf.client_name}."))
+        if not result['authenticated']:
+            # Échec de déchiffrement ou d'authentification : seule la version Odoo peut être conservée
             indicator_name_odoo_version = "version odoo"
-            if client_odoo_version_str and client_odoo_version_str != "Inconnue":
-                indicators_data[indicator_name_odoo_version] = client_odoo_version_str
-                self.stdout.write(
-                    self.style.SUCCESS(f"   - {indicator_name_odoo_version}: OK ({client_odoo_version_str})"))
+            version_value = result['indicators'].get(indicator_name_odoo_version)
+            if version_value and version_value != "Inconnue":
+                self._ingestor.add_indicator(client_conf, indicator_name_odoo_version, version_value,
+                                             extraction_timestamp, "0", "N/A")
+                self.stdout.write(self.style.SUCCESS(
+                    f"   - Indicateur '{indicator_name_odoo_version}' conservé malgré l'échec d'authentification."))
+        else:
+            # 5e. Mettre en tampon les résultats pour l'écriture groupée
+            saved_count = 0
+            for name, value in result['indicators'].items():
+                if value is not None:
+                    self._ingestor.add_indicator(client_conf, name, str(value), extraction_timestamp,
+                                                 result['collaborator_id'], result['collaborator_name'])
+                    saved_count += 1
+            if saved_count > 0:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{saved_count} indicateur(s) à sauvegarder pour {client_conf.client_name}."))
             else:
-                self.stdout.write(self.style.WARNING(f"   - {indicator_name_odoo_version}: Version non récupérée."))
-                indicators_data[indicator_name_odoo_version] = "Inconnue"
-
-            if not uid_client:  # Si l'authentification a échoué
-                self.stderr.write(self.style.ERROR(
-                    f">>> Échec authentification Odoo pour {client_conf.client_name}. {connection_error_msg if connection_error_msg else ''} Skipping autres indicateurs..."))
-                # Sauvegarder uniquement la version Odoo si elle a été trouvée
-                if indicators_data.get(indicator_name_odoo_version) and indicators_data[
-                    indicator_name_odoo_version] != "Inconnue":
-                    try:
-                        IndicateursHistoriques.objects.create(
-                            client=client_conf,
-                            indicator_name=indicator_name_odoo_version,
-                            indicator_value=indicators_data[indicator_name_odoo_version],
-                            extraction_timestamp=current_extraction_run_timestamp,
-                            assigned_odoo_collaborator_id="0",
-                            assigned_collaborator_name="N/A"
-                        )
-                        self.stdout.write(self.style.SUCCESS(
-                            f"   - Indicateur '{indicator_name_odoo_version}' sauvegardé malgré l'échec d'authentification."))
-                    except Exception as e_save:
-                        self.stderr.write(self.style.ERROR(
-                            f"   - Erreur sauvegarde indicateur '{indicator_name_odoo_version}' pour {client_conf.client_name}: {e_save}"))
-                continue  # Passe au client suivant
+                self.stdout.write(self.style.WARNING(
+                    f"Aucun nouvel indicateur trouvé ou à sauvegarder pour {client_conf.client_name}."))
+        self._unflushed_clients.append(client_conf.pk)
+        touch_extraction_run(self._run)
+        if self._lease_queue is not None:
+            # Les autres clients du lot sont toujours en cours : leurs baux ne doivent pas expirer
+            self._lease_queue.renew()
+        if self._ingestor.should_flush():
+            self._flush_ingestor()
+        if self._job_progress:
+            self._job_progress.client_done(client_conf, result)
 
-            self.stdout.write(
+    def _flush_ingestor(self):
+        """Écrit le tampon d'indicateurs et de statuts en une transaction (thread d'écriture, cf. _save_client_result)."""
+        flushed_clients, self._unflushed_clients = self._unflushed_clients, []
+        try:
+            # Points de reprise écrits dans la même transaction que les indicateurs : un lot perdu sera repris,
+            # un lot écrit ne le sera pas deux fois
+            with write_transaction():
+                row_count, status_count = self._ingestor.flush()
+                if self._lease_queue is not None:
+                    self._lease_queue.complete(flushed_clients)
+                else:
+                    complete_clients(self._run, flushed_clients)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'écriture groupée des indicateurs: {e}", exc_info=True)
+            self.stderr.write(self.style.ERROR(f">>> Erreur lors de l'écriture groupée des indicateurs : {e}"))
+            return
+        if row_count or status_count:
+            self.stdout.write(self.style.SUCCESS(
+                f"Sauvegarde groupée : {row_count} indicateur(s) et {status_count} statut(s) de connexion enregistrés."))
+
+    def _begin_client(self, client_conf, out, err):
+        """
+        Déchiffre la clé API du client.
+        Retourne (clé, date de tentative, résultat d'échec) ; le résultat d'échec est None si la clé est utilisable.
+        """
+        client_api_key = decrypt_value(client_conf.client_odoo_encrypted_api_key)
+        last_attempt_time = timezone.now()
+
+        if not client_api_key:
+            error_msg = "Impossible de déchiffrer la clé API."
+            err.write(self.style.ERROR(f"{error_msg} pour {client_conf.client_name}. Skipping..."))
+            return client_api_key, last_attempt_time, {
+                'status': {
+                    'last_connection_attempt': last_attempt_time,
+                    'connection_successful': False,
+                    'last_error_message': error_msg
+                },
+                'authenticated': False,
+                'indicators': {},
+                'collaborator_id': "0",
+                'collaborator_name': "N/A",
+            }
+        out.write(f"Clé API déchiffrée pour {client_conf.client_name}.")
+
+        out.write(
+            f"Tentative de connexion à {client_conf.client_odoo_url} (DB: {client_conf.client_odoo_db})...")
+        return client_api_key, last_attempt_time, None
+
+    def _connection_result(self, client_conf, out, err, last_attempt_time, uid_client,
+                           odoo_server_version_from_util, connection_error_msg, from_cache=False):
+        """
+        Traite le résultat de la connexion (indicateur 'version odoo', statut).
+        Retourne le résultat partiel du client ; 'authenticated' indique si l'extraction peut continuer.
+        Une session en cache n'est pas encore une authentification réussie : elle est confirmée (ou non) par
+        les appels de l'extraction (_session_result).
+        """
+        client_odoo_version_str = "Inconnue"  # Valeur par défaut
+        if odoo_server_version_from_util:
+            client_odoo_version_str = odoo_server_version_from_util
+
+        status_defaults = {
+            'last_connection_attempt': last_attempt_time,
+            'connection_successful': bool(uid_client),
+            'last_error_message': connection_error_msg if connection_error_msg else None,
+            'interruption_reason': (ClientOdooStatus.INTERRUPTION_TIMEOUT
+                                    if connection_error_msg and connection_error_msg.startswith(ODOO_TIMEOUT_ERROR_PREFIX)
+                                    else None),
+        }
+
+        indicators_data = {}
+
+        # Indicateur : Version Odoo Client
+        indicator_name_odoo_version = "version odoo"
+        if client_odoo_version_str and client_odoo_version_str != "Inconnue":
+            indicators_data[indicator_name_odoo_version] = client_odoo_version_str
+            out.write(
+                self.style.SUCCESS(f"   - {indicator_name_odoo_version}: OK ({client_odoo_version_str})"))
+        else:
+            out.write(self.style.WARNING(f"   - {indicator_name_odoo_version}: Version non récupérée."))
+            indicators_data[indicator_name_odoo_version] = "Inconnue"
+
+        result = {
+            'status': status_defaults,
+            'authenticated': bool(uid_client),
+            'indicators': indicators_data,
+            'collaborator_id': "0",
+            'collaborator_name': "N/A",
+        }
+        if not uid_client:  # Si l'authentification a échoué
+            # Seule la version Odoo sera sauvegardée si elle a été trouvée
+            err.write(self.style.ERROR(
+                f">>> Échec authentification Odoo pour {client_conf.client_name}. {connection_error_msg if connection_error_msg else ''} Skipping autres indicateurs..."))
+        elif from_cache:
+            out.write(f"Session Odoo en cache pour {client_conf.client_name} (UID: {uid_client}), "
+                      f"vérifiée au premier appel.")
+        else:
+            out.write(
                 self.style.SUCCESS(
                     f"Connecté et authentifié avec succès à Odoo pour {client_conf.client_name} (UID: {uid_client})."))
+        return result
+
+    def _collaborator_result(self, result, out, collaborator):
+        final_assigned_collab_id_str, collaborator_display_name = collaborator
+        result['collaborator_id'] = final_assigned_collab_id_str
+        result['collaborator_name'] = collaborator_display_name
+        out.write(
+            f"Collaborateur assigné -> ID Partenaire: {final_assigned_collab_id_str}, Nom Affiché: {collaborator_display_name}")
+
+    def _load_collaborator_index(self, clients_config):
+        """
+        Récupère en un seul search_read les fiches partenaires de tous les clients dans l'Odoo cabinet.
+        Retourne l'index URL normalisée -> (partenaire, collaborateur), ou None si l'Odoo cabinet est indisponible.
+        """
+        if not (self._firm_uid and self._firm_object_proxy):
+            return None
+
+        firm_limiter = self._rate_limits.firm()
+
+        def execute_on_firm(call):
+            with firm_limiter.slot():
+                return self._execute_with_session(self._firm_session, self._firm_connection_args(), call,
+                                                  "l'Odoo cabinet")
+
+        needs = [('res.partner', CLIENT_URL_FIELD), ('res.partner', COLLABORATOR_FIELD)]
+        capabilities = self._firm_capabilities(needs, execute_on_firm)
+        if capabilities is not None and capabilities.missing(needs):
+            self.stderr.write(self.style.WARNING(
+                f">>> Champs '{CLIENT_URL_FIELD}' / '{COLLABORATOR_FIELD}' absents de res.partner dans l'Odoo cabinet : "
+                f"collaborateurs assignés non recherchés."))
+            return {}
+
+        try:
+            index = run_plan(plan_collaborator_index([c.client_odoo_url for c in clients_config]), execute_on_firm)
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des collaborateurs depuis l'Odoo cabinet: {e}", exc_info=True)
+            self.stderr.write(self.style.ERROR(
+                f">>> Erreur lors de la récupération des collaborateurs depuis l'Odoo cabinet: {e}"))
+            return None
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(index)} fiche(s) partenaire client trouvée(s) dans l'Odoo cabinet."))
+        return index
 
-            assigned_collab_id = None
-            collaborator_display_name = "N/A"
-            final_assigned_collab_id_str = "0"
-            if firm_uid and firm_object_proxy:
+    def _firm_capabilities(self, needs, execute_on_firm):
+        """Capacités de l'Odoo cabinet pour `needs` : en cache pour sa version, sinon sondées. None si inconnues."""
+        cached = get_cached_capabilities(self._firm_url, self._firm_db, self._firm_version)
+        capabilities = OdooCapabilities(**cached) if cached else OdooCapabilities()
+        if cached and capabilities.covers(needs):
+            return capabilities
+        try:
+            capabilities.update(run_plan(plan_capability_probe(needs), execute_on_firm))
+        except Exception as e:
+            logger.warning(f"Sondage des capacités de l'Odoo cabinet impossible: {e}")
+            return None
+        store_capabilities(self._firm_url, self._firm_db, self._firm_version, capabilities.as_dict())
+        return capabilities
+
+    def _collaborator(self, ctx):
+        if self._collaborator_index is None:
+            return self._firm_unavailable(ctx.out)
+        return lookup_collaborator(ctx, self._collaborator_index)
+
+    def _firm_unavailable(self, out):
+        out.write(self.style.WARNING(
+            "   - Connexion à l'Odoo cabinet non disponible, impossible de récupérer le collaborateur assigné."))
+        return "0", "N/A"
+
+    def _extract_client(self, client_conf, out, err):
+        """
+        Extrait les indicateurs d'un client Odoo, sans écrire en base.
+        Les messages sont écrits sur out/err (sortie de la commande ou tampon d'un worker).
+        Retourne un dict : status (defaults de ClientOdooStatus), authenticated, indicators,
+        collaborator_id, collaborator_name.
+        """
+        guard = self._call_guard()
+        client_api_key, last_attempt_time, failed_result = self._begin_client(client_conf, out, err)
+        if failed_result:
+            return failed_result
+
+        (uid_client, _, object_proxy_client, odoo_server_version_from_util, connection_error_msg,
+         from_cache) = open_odoo_session(
+            client_conf.client_odoo_url,
+            client_conf.client_odoo_db,
+            client_conf.client_odoo_api_user,
+            client_api_key,
+            protocol=client_conf.odoo_rpc_protocol or None,
+            use_session_cache=True,
+            store_session=False
+        )
+        result = self._connection_result(client_conf, out, err, last_attempt_time, uid_client,
+                                         odoo_server_version_from_util, connection_error_msg, from_cache)
+        if not result['authenticated']:
+            return result
+
+        ctx = ExtractionContext(client_conf, uid_client, out, err, self.style)
+        ctx.indicators = result['indicators']
+        ctx.odoo_version = odoo_server_version_from_util
+
+        collaborator = self._collaborator(ctx)
+        self._collaborator_result(result, out, collaborator)
+
+        session = self._new_session(uid_client, object_proxy_client, client_conf.odoo_rpc_protocol,
+                                    verified=not from_cache)
+        connection_args = self._client_connection_args(client_conf, client_api_key)
+        if not from_cache:
+            session['cache_update'] = (connection_args, uid_client, odoo_server_version_from_util)
+
+        limiter = self._rate_limits.for_url(client_conf.client_odoo_url)
+
+        @guard.wrap
+        def execute_on_client(call):
+            with limiter.slot():
+                return self._execute_with_session(session, connection_args, call, client_conf.client_name)
+
+        out.write(f"Début extraction autres indicateurs pour {client_conf.client_name}...")
+        self._load_client_cache(ctx)
+        run_plan(plan_indicators(ctx), execute_on_client)
+        result['cache'] = self._client_cache_updates(ctx)
+        result['session_cache'] = session.pop('cache_update', None)
+        self._interruption_result(result, guard, ctx, err)
+        self._session_result(result, session, client_conf, out, err)
+        return result
+
+    def _call_guard(self):
+        """Délai global et disjoncteur des appels d'un client (ODOO_CLIENT_DEADLINE, ODOO_CIRCUIT_BREAKER_THRESHOLD)."""
+        return ClientCallGuard(self._client_deadline, settings.ODOO_CIRCUIT_BREAKER_THRESHOLD, RPC_TIMEOUT_ERRORS)
+
+    def _interruption_result(self, result, guard, ctx, err):
+        """Reporte dans le statut du client un délai dépassé ou un disjoncteur ouvert pendant l'extraction."""
+        message = guard.summary(len(ctx.abandoned))
+        if message is None:
+            return
+        result['status']['interruption_reason'] = guard.interruption_reason()
+        result['status']['last_error_message'] = message
+        err.write(self.style.WARNING(f">>> {ctx.client_conf.client_name} : {message}"))
+
+    def _session_result(self, result, session, client_conf, out, err):
+        """
+        Issue de la session du client : une session en cache refusée par Odoo et dont la nouvelle authentification
+        a échoué (clé API révoquée...) met le client en échec d'authentification, compté par le backoff.
+        """
+        if session['auth_error']:
+            result['authenticated'] = False
+            result['status'].update(connection_successful=False, last_error_message=session['auth_error'],
+                                    interruption_reason=None)
+            err.write(self.style.ERROR(
+                f">>> Échec authentification Odoo pour {client_conf.client_name}. {session['auth_error']}"))
+        elif session['from_cache'] and session['verified']:
+            out.write(self.style.SUCCESS(
+                f"Connecté et authentifié avec succès à Odoo pour {client_conf.client_name} "
+                f"(session en cache, UID: {session['uid']})."))
+        elif session['from_cache']:
+            out.write(self.style.WARNING(
+                f"   - Session en cache non vérifiée pour {client_conf.client_name} : aucun appel à Odoo."))
+
+    # --- Références et capacités Odoo en cache ---
+
+    def _load_client_cache(self, ctx):
+        """
+        Fournit au plan les capacités en cache de la base du client (pour sa version Odoo), ses références
+        en cache (sauf --refresh-references) et l'état de l'exécution précédente (cadences, --incremental).
+        """
+        client_conf = ctx.client_conf
+        try:
+            cached = get_cached_capabilities(client_conf.client_odoo_url, client_conf.client_odoo_db,
+                                             ctx.odoo_version)
+            ctx.capabilities = OdooCapabilities(**cached) if cached else None
+            if not self._refresh_references:
+                ctx.references = get_cached_client_references(client_conf)
+            ctx.scheduled = not self._full
+            ctx.incremental = self._incremental
+            ctx.previous_state = get_incremental_state(client_conf)
+        except Exception as e:
+            logger.warning(f"Lecture du cache de références Odoo impossible pour {client_conf.client_name}: {e}")
+
+    @staticmethod
+    def _client_cache_updates(ctx):
+        """
+        Capacités, références et état d'extraction à enregistrer pour le client. Les workers n'écrivent pas en
+        base : _save_client_result les enregistre depuis le thread d'écriture.
+        """
+        return {
+            'odoo_version': ctx.odoo_version,
+            'capabilities': ctx.probed_capabilities.as_dict() if ctx.probed_capabilities is not None else None,
+            'references': ctx.resolved_references or None,
+            'state': ctx.extraction_state,
+        }
+
+    def _store_client_cache(self, client_conf, cache):
+        """Enregistre les caches du client ; son état d'extraction est écrit avec ses indicateurs (ingestor)."""
+        if cache['capabilities'] is not None:
+            store_capabilities(client_conf.client_odoo_url, client_conf.client_odoo_db, cache['odoo_version'],
+                               cache['capabilities'])
+        if cache['references']:
+            store_client_references(client_conf, cache['references'])
+        if cache['state'] is not None:
+            self._ingestor.add_state(client_conf, cache['state'])
+
+    # --- Sessions en cache ---
+
+    @staticmethod
+    def _new_session(uid, object_proxy, protocol=None, is_async=False, verified=True):
+        """
+        Session d'un Odoo : uid et proxy courants, renouvelés une fois si Odoo refuse la session en cache.
+        verified=False pour une session en cache : elle l'est au premier appel accepté par Odoo ; auth_error
+        retient l'échec de la nouvelle authentification. cache_update, posé par les workers, est la mise à jour
+        du cache de session ((connection_args, uid, version), uid None pour l'invalider) que le thread d'écriture
+        applique (_apply_session_cache).
+        """
+        session = {'uid': uid, 'proxy': object_proxy, 'protocol': protocol or None, 'generation': 0,
+                   'renewed': False, 'from_cache': not verified, 'verified': verified, 'auth_error': None}
+        if is_async:
+            session['lock'] = asyncio.Lock()
+        return session
+
+    @staticmethod
+    def _apply_session_cache(cache_update):
+        """Enregistre (ou invalide, uid None) la session Odoo renouvelée par un worker ; thread d'écriture uniquement."""
+        if cache_update is None:
+            return
+        connection_args, uid, version = cache_update
+        if uid:
+            store_odoo_session(*connection_args, uid, version)
+        else:
+            invalidate_odoo_session(*connection_args)
+
+    @staticmethod
+    def _client_connection_args(client_conf, client_api_key):
+        return (client_conf.client_odoo_url, client_conf.client_odoo_db, client_conf.client_odoo_api_user,
+                client_api_key)
+
+    def _firm_connection_args(self):
+        return self._firm_url, self._firm_db, self._firm_api_user, self._firm_api_key
+
+    def _execute_with_session(self, session, connection_args, call, label):
+        """
+        Exécute `call` avec la session ; sur un refus d'authentification (session en cache périmée),
+        la session est invalidée, une authentification complète est refaite et l'appel rejoué.
+        """
+        _, db, _, password = connection_args
+        generation = session['generation']
+        try:
+            response = session['proxy'].execute_kw(db, session['uid'], password,
+                                                   call.model, call.method, call.args, call.kwargs)
+        except xmlrpc.client.Fault as e:
+            if not is_auth_fault(e) or not self._renew_session(session, connection_args, generation, label):
+                raise
+            response = session['proxy'].execute_kw(db, session['uid'], password,
+                                                   call.model, call.method, call.args, call.kwargs)
+        session['verified'] = True
+        return response
+
+    def _renew_session(self, session, connection_args, generation, label):
+        """Renouvelle la session une seule fois par exécution. Retourne True si l'appel peut être rejoué."""
+        if session['generation'] != generation:
+            return True  # Session déjà renouvelée par un autre appel
+        if session['renewed']:
+            return False
+        session['renewed'] = True
+        logger.warning(f"Session Odoo refusée pour {label}, nouvelle authentification.")
+        uid, _, object_proxy, version, error_message = connect_odoo(
+            *connection_args, protocol=session['protocol'], use_session_cache=False, store_session=False)
+        session['cache_update'] = (connection_args, uid, version)
+        if not uid:
+            session['auth_error'] = error_message or "Session Odoo refusée et nouvelle authentification impossible."
+            return False
+        session.update(uid=uid, proxy=object_proxy, generation=generation + 1)
+        return True
+
+    async def _execute_with_session_async(self, session, connection_args, call, label, http_client):
+        """Équivalent asyncio de _execute_with_session."""
+        _, db, _, password = connection_args
+        generation = session['generation']
+        try:
+            response = await session['proxy'].execute_kw(db, session['uid'], password,
+                                                         call.model, call.method, call.args, call.kwargs)
+        except xmlrpc.client.Fault as e:
+            if not is_auth_fault(e) or not await self._renew_session_async(
+                    session, connection_args, generation, label, http_client):
+                raise
+            response = await session['proxy'].execute_kw(db, session['uid'], password,
+                                                         call.model, call.method, call.args, call.kwargs)
+        session['verified'] = True
+        return response
+
+    async def _renew_session_async(self, session, connection_args, generation, label, http_client):
+        """Équivalent asyncio de _renew_session ; les appels refusés simultanément attendent le même renouvellement."""
+        async with session['lock']:
+            if session['generation'] != generation:
+                return True
+            if session['renewed']:
+                return False
+            session['renewed'] = True
+            logger.warning(f"Session Odoo refusée pour {label}, nouvelle authentification.")
+            uid, _, object_proxy, version, error_message = await async_connect_odoo(
+                http_client, *connection_args, protocol=session['protocol'], use_session_cache=False,
+                store_session=False)
+            session['cache_update'] = (connection_args, uid, version)
+            if not uid:
+                session['auth_error'] = (error_message
+                                         or "Session Odoo refusée et nouvelle authentification impossible.")
+                return False
+            session.update(uid=uid, proxy=object_proxy, generation=generation + 1)
+            return True
+
+    # --- Moteur asyncio ---
+
+    def _run_async(self, clients_config, workers, extraction_timestamp):
+        """
+        Extrait tous les clients dans une boucle asyncio ; au plus `workers` clients en cours à la fois.
+        En mode résident, la boucle (et le client HTTP) est celle du démon, réutilisée à chaque cycle.
+        """
+        coroutine = self._extract_all_async(clients_config, workers, extraction_timestamp)
+        if self._event_loop is not None:
+            self._event_loop.run_until_complete(coroutine)
+        else:
+            asyncio.run(coroutine)
+
+    async def _extract_all_async(self, clients_config, workers, extraction_timestamp):
+        if self._event_loop is not None:
+            # Mode résident : le client HTTP (connexions keep-alive) est conservé d'un cycle à l'autre
+            if self._http_client is None:
+                self._http_client = make_http_client(max_connections=max(workers, 10))
+            await self._extract_all_with_client(clients_config, workers, extraction_timestamp, self._http_client)
+            return
+        async with make_http_client(max_connections=max(workers, 10)) as http_client:
+            await self._extract_all_with_client(clients_config, workers, extraction_timestamp, http_client)
+
+    async def _extract_all_with_client(self, clients_config, workers, extraction_timestamp, http_client):
+        semaphore = asyncio.Semaphore(workers)
+        # L'ORM est synchrone : les lectures et sauvegardes passent par l'unique thread de sync_to_async
+        # (thread_sensitive ; pas le thread principal, faute d'async_to_sync englobant), avec sa propre connexion
+        save_client_result = sync_to_async(self._save_client_result, thread_sensitive=True)
+
+        async def extract(client_conf):
+            async with semaphore:
+                if self._stopping():
+                    return client_conf, None, None
+                output = ClientOutput()
+                started = time.monotonic()
                 try:
-                    self.stdout.write(
-                        f"   - Recherche du partenaire client '{client_conf.client_name}' dans l'Odoo cabinet via son URL...")
-                    technical_field_name_for_client_url = 'x_odoo_database'
-                    partner_domain = [(technical_field_name_for_client_url, '=', client_conf.client_odoo_url)]
-                    partner_ids = firm_object_proxy.execute_kw(config_cabinet.firm_odoo_db, firm_uid, firm_api_key,
-                                                               'res.partner', 'search', [partner_domain], {'limit': 1})
-                    if partner_ids:
-                        partner_id = partner_ids[0]
-                        self.stdout.write(
-                            f"   - Partenaire client trouvé (ID: {partner_id}). Lecture du champ collaborateur...")
-                        partner_data = firm_object_proxy.execute_kw(config_cabinet.firm_odoo_db, firm_uid, firm_api_key,
-                                                                    'res.partner', 'read', [[partner_id]],
-                                                                    {'fields': ['x_collaborateur_1']})
-                        collaborator_info = partner_data[0].get('x_collaborateur_1') if partner_data else None
-                        if collaborator_info and isinstance(collaborator_info, (list, tuple)) and len(
-                                collaborator_info) >= 1:
-                            assigned_collab_id = collaborator_info[0];
-                            collaborator_display_name = collaborator_info[1]
-                            self.stdout.write(self.style.SUCCESS(
-                                f"   - Collaborateur (partenaire) lié trouvé (ID: {assigned_collab_id}, Nom: {collaborator_display_name})"))
-                        else:
-                            self.stdout.write(self.style.WARNING(
-                                f"   - Champ collaborateur 'x_collaborateur_1' vide sur la fiche partenaire (ID: {partner_id})."))
-                    else:
-                        self.stdout.write(self.style.WARNING(
-                            f"   - Partenaire client avec URL '{client_conf.client_odoo_url}' (via champ '{technical_field_name_for_client_url}') non trouvé dans l'Odoo cabinet."))
+                    result = await self._extract_client_async(client_conf, output.stdout, output.stderr, http_client)
                 except Exception as e:
-                    self.stderr.write(self.style.ERROR(
-                        f"   - Erreur lors de la récupération du collaborateur depuis l'Odoo cabinet: {e}"))
-            else:
-                self.stdout.write(self.style.WARNING(
-                    "   - Connexion à l'Odoo cabinet non disponible, impossible de récupérer le collaborateur assigné."))
-            if assigned_collab_id is not None:
-                final_assigned_collab_id_str = str(assigned_collab_id)
-            else:
-                final_assigned_collab_id_str = "0"
-            self.stdout.write(
-                f"Collaborateur assigné -> ID Partenaire: {final_assigned_collab_id_str}, Nom Affiché: {collaborator_display_name}")
+                    result = self._unexpected_error_result(client_conf, e, output.stderr)
+                result['duration'] = time.monotonic() - started
+                return client_conf, result, output
 
-            self.stdout.write(f"Début extraction autres indicateurs pour {client_conf.client_name}...")
-            company_id = 1
-            try:
-                user_info = object_proxy_client.execute_kw(client_conf.client_odoo_db, uid_client, client_api_key,
-                                                           'res.users', 'read', [[uid_client]],
-                                                           {'fields': ['company_id']})
-                if user_info and user_info[0].get('company_id'): company_id = user_info[0]['company_id'][0]
-            except Exception:
-                logger.warning(
-                    f"Impossible de récupérer company_id pour client {client_conf.client_name}, utilisation de l'ID 1 par défaut.")
-
-            # Indicateur : Date de clôture annuelle standard
-            indicator_name_fiscal_closing = "date cloture annuelle"
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_fiscal_closing}' depuis res.company...")
-                company_data_closing = object_proxy_client.execute_kw(client_conf.client_odoo_db, uid_client,
-                                                                      client_api_key, 'res.company', 'read',
-                                                                      [[company_id]], {'fields': ['fiscalyear_last_day',
-                                                                                                  'fiscalyear_last_month']})
-                if company_data_closing and company_data_closing[0].get('fiscalyear_last_day') and company_data_closing[
-                    0].get('fiscalyear_last_month'):
-                    day_str = company_data_closing[0].get('fiscalyear_last_day');
-                    month_str = company_data_closing[0].get('fiscalyear_last_month')
-                    if day_str is not None and month_str is not None and day_str is not False and month_str is not False:
-                        try:
-                            day = int(day_str);
-                            month = int(month_str);
-                            closing_date_str = f"{day:02d}/{month:02d}";
-                            indicators_data[indicator_name_fiscal_closing] = closing_date_str;
-                            self.stdout.write(
-                                self.style.SUCCESS(f"   - {indicator_name_fiscal_closing}: OK ({closing_date_str})"))
-                        except (ValueError, TypeError) as conversion_error:
-                            self.stderr.write(self.style.ERROR(
-                                f"   - Erreur conversion jour/mois pour '{indicator_name_fiscal_closing}': {conversion_error} (valeurs reçues: jour='{day_str}', mois='{month_str}')"));
-                            indicators_data[indicator_name_fiscal_closing] = None
-                    else:
-                        self.stdout.write(self.style.WARNING(
-                            f"   - {indicator_name_fiscal_closing}: Valeurs jour/mois vides ou False reçues de res.company ID {company_id}."));
-                        indicators_data[indicator_name_fiscal_closing] = None
-                else:
-                    self.stdout.write(self.style.WARNING(
-                        f"   - {indicator_name_fiscal_closing}: Champs jour/mois ('fiscalyear_last_day'/'month') non trouvés ou vides sur res.company ID {company_id}."));
-                    indicators_data[indicator_name_fiscal_closing] = None
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"   - Erreur extraction '{indicator_name_fiscal_closing}': {e}"));
-                indicators_data[indicator_name_fiscal_closing] = None
-
-            # Indicateur : Opérations à qualifier
-            indicator_name_pending_reconciliation = "operations à qualifier"
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_pending_reconciliation}'...")
-                # à modifier pour inclure tous les comptes commencant par 47
-                domain_pending_reco = [
-                    ('account_id.code', '>=', '47%'),
-                    ('account_id.code', '<=', '475%'), # prend aussi le 4755 (opérations bancaires à valider)
-                    ('full_reconcile_id', '=', False),
-                    ('move_id.state', '=', 'posted')
-                ]
-                count = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'account.move.line', 'search_count',
-                    [domain_pending_reco]
-                )
-                indicators_data[indicator_name_pending_reconciliation] = count
-                self.stdout.write(self.style.SUCCESS(f"   - {indicator_name_pending_reconciliation}: OK ({count})"))
-            except Exception as e:
-                self.stderr.write(
-                    self.style.ERROR(f"   - Erreur extraction '{indicator_name_pending_reconciliation}': {e}"))
-                indicators_data[indicator_name_pending_reconciliation] = None
-
-            # Indicateur : Achats à Traiter
-            indicator_name_draft_purchases = "achats à traiter"
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_draft_purchases}'...")
-                journal_domain = [('type', '=', 'purchase'), ('company_id', '=', company_id)]
-                journal_ids = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'account.journal', 'search',
-                    [journal_domain]
-                )
-                if not journal_ids:
-                    self.stdout.write(
-                        self.style.WARNING(f"   - {indicator_name_draft_purchases}: Aucun journal d'achat trouvé."))
-                    indicators_data[indicator_name_draft_purchases] = 0
-                else:
-                    self.stdout.write(f"     - Journaux d'achat trouvés (IDs: {journal_ids}).")
-                    draft_moves_domain = [
-                        ('journal_id', 'in', journal_ids),
-                        ('state', '=', 'draft'),
-                        ('move_type', '=', 'in_invoice')
-                    ]
-                    draft_moves_count = object_proxy_client.execute_kw(
-                        client_conf.client_odoo_db, uid_client, client_api_key,
-                        'account.move', 'search_count',
-                        [draft_moves_domain]
-                    )
-                    indicators_data[indicator_name_draft_purchases] = draft_moves_count
-                    self.stdout.write(
-                        self.style.SUCCESS(f"   - {indicator_name_draft_purchases}: OK ({draft_moves_count})"))
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"   - Erreur extraction '{indicator_name_draft_purchases}': {e}"))
-                indicators_data[indicator_name_draft_purchases] = None
-
-            # --- NOUVEL INDICATEUR : Paiements Orphelins ---
-            indicator_name_orphan_payments = "paiements orphelins"
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_orphan_payments}'...")
-                bank_journal_domain = [('type', '=', 'bank'), ('company_id', '=', company_id)]
-                bank_journal_ids = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'account.journal', 'search',
-                    [bank_journal_domain]
-                )
-
-                if not bank_journal_ids:
-                    self.stdout.write(
-                        self.style.WARNING(f"   - {indicator_name_orphan_payments}: Aucun journal de banque trouvé."))
-                    indicators_data[indicator_name_orphan_payments] = 0  # Ou None
-                else:
-                    self.stdout.write(f"     - Journaux de banque trouvés (IDs: {bank_journal_ids}).")
-                    # remplacer account_id.code par account_type (asset_receivable - creance / liability_payable -dette)
-                    # Pour les comptes commençant par '40' (Fournisseurs)
-                    # ne pas inclure les réconciliations partielles
-                    supplier_orphan_domain = [
-                        ('journal_id', 'in', bank_journal_ids),
-                        ('account_id.code', '=like', '40%'),
-                        ('full_reconcile_id', '=', False),
-                        ('move_id.state', '=', 'posted')
-                    ]
-                    supplier_orphan_count = object_proxy_client.execute_kw(
-                        client_conf.client_odoo_db, uid_client, client_api_key,
-                        'account.move.line', 'search_count',
-                        [supplier_orphan_domain]
-                    )
-                    self.stdout.write(f"     - Paiements fournisseurs orphelins: {supplier_orphan_count}")
-
-                    # Pour les comptes commençant par '41' (Clients)
-                    client_orphan_domain = [
-                        ('journal_id', 'in', bank_journal_ids),
-                        ('account_id.code', '=like', '41%'),
-                        ('full_reconcile_id', '=', False),
-                        ('move_id.state', '=', 'posted')
-                    ]
-                    client_orphan_count = object_proxy_client.execute_kw(
-                        client_conf.client_odoo_db, uid_client, client_api_key,
-                        'account.move.line', 'search_count',
-                        [client_orphan_domain]
-                    )
-                    self.stdout.write(f"     - Paiements clients orphelins: {client_orphan_count}")
-
-                    total_orphan_payments = supplier_orphan_count + client_orphan_count
-                    indicators_data[indicator_name_orphan_payments] = total_orphan_payments
-                    self.stdout.write(
-                        self.style.SUCCESS(f"   - {indicator_name_orphan_payments}: OK ({total_orphan_payments})"))
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"   - Erreur extraction '{indicator_name_orphan_payments}': {e}"))
-                indicators_data[indicator_name_orphan_payments] = None
-            # --- FIN NOUVEL INDICATEUR ---
-
-                # --- NOUVEL INDICATEUR : Virements internes non soldés ---
-            indicator_name_unreconciled_internal_transfers = "virements internes non soldés"  # Nom technique
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_unreconciled_internal_transfers}'...")
-                # Compte les lignes d'écriture dans les comptes 58x non lettrées
-                # et appartenant à des pièces validées.
-                domain_internal_transfers = [
-                    ('account_id.code', '=like', '58%'),  # Comptes commençant par 58
-                    ('full_reconcile_id', '=', False),  # Non lettrées/rapprochées
-                    ('move_id.state', '=', 'posted')  # Uniquement des écritures validées
-                    # ('company_id', '=', company_id)     # Filtrer par compagnie si nécessaire
-                ]
-                count = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'account.move.line', 'search_count',
-                    [domain_internal_transfers]
-                )
-                indicators_data[indicator_name_unreconciled_internal_transfers] = count
-                self.stdout.write(
-                    self.style.SUCCESS(f"   - {indicator_name_unreconciled_internal_transfers}: OK ({count})"))
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(
-                    f"   - Erreur extraction '{indicator_name_unreconciled_internal_transfers}': {e}"))
-                indicators_data[indicator_name_unreconciled_internal_transfers] = None
-            # --- FIN NOUVEL INDICATEUR ---
-                # --- NOUVEL INDICATEUR : Pivot Encaissement (Solde des comptes 478*) ---
-            indicator_name_pivot_encaissement = "pivot encaissement"
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_pivot_encaissement}'...")
-                    # Domaine pour récupérer les lignes des comptes commençant par 478,
-                    # et appartenant à des pièces comptables validées.
-                domain_pivot_encaissement = [
-                        ('account_id.code', '=like', '478%'),  # Comptes commençant par 478
-                        ('move_id.state', '=', 'posted')  # Uniquement des écritures validées
-                        # ('company_id', '=', company_id)     # Filtrer par compagnie si nécessaire
-                    ]
-
-                # Récupérer les lignes avec les champs débit et crédit
-                lines = object_proxy_client.execute_kw(
-                        client_conf.client_odoo_db, uid_client, client_api_key,
-                        'account.move.line', 'search_read',
-                        [domain_pivot_encaissement],
-                        {'fields': ['debit', 'credit']}
-                    )
-
-                solde_pivot = 0.0
-                if lines:
-                    for line in lines:
-                        solde_pivot += line.get('debit', 0.0) - line.get('credit', 0.0)
-
-                    # Formatter le solde pour l'affichage
-                formatted_solde_pivot = f"{solde_pivot:,.2f}"
-                indicators_data[indicator_name_pivot_encaissement] = formatted_solde_pivot
-                self.stdout.write(
-                    self.style.SUCCESS(f"   - {indicator_name_pivot_encaissement}: OK ({formatted_solde_pivot})"))
-
-            except Exception as e:
-                self.stderr.write(
-                    self.style.ERROR(f"   - Erreur extraction '{indicator_name_pivot_encaissement}': {e}"))
-                indicators_data[indicator_name_pivot_encaissement] = None
-                # --- FIN NOUVEL INDICATEUR ---
-                # --- INDICATEUR : Dernière clôture fiscale (basée sur account.change.lock.date - fiscalyear_lock_date) ---
-            indicator_name_last_fiscal_lock_date = "derniere cloture fiscale"
-            try:
-                self.stdout.write(
-                    f"   - Recherche '{indicator_name_last_fiscal_lock_date}' depuis account.change.lock.date...")
-
-                # Récupérer la date de clôture globale (fiscalyear_lock_date)
-                lock_info_data = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'account.change.lock.date', 'search_read',
-                    [[]],  # Pas de filtre spécifique, on prend le premier (ou le seul) enregistrement
-                    {
-                        'fields': ['fiscalyear_lock_date'],  # Champ cible
-                        'limit': 1
-                        # 'order': 'id desc' # Optionnel, pour prendre le plus récent si plusieurs enregistrements existent
-                    }
-                )
-
-                if lock_info_data and lock_info_data[0].get('fiscalyear_lock_date'):
-                    fiscalyear_lock_date_value = lock_info_data[0]['fiscalyear_lock_date']
-                    # La date est déjà au format YYYY-MM-DD
-                    indicators_data[indicator_name_last_fiscal_lock_date] = fiscalyear_lock_date_value
-                    self.stdout.write(self.style.SUCCESS(
-                        f"   - {indicator_name_last_fiscal_lock_date}: OK ({fiscalyear_lock_date_value})"))
-                else:
-                    self.stdout.write(self.style.WARNING(
-                        f"   - {indicator_name_last_fiscal_lock_date}: Aucune date de clôture globale (fiscalyear_lock_date) trouvée ou champ vide."))
-                    indicators_data[indicator_name_last_fiscal_lock_date] = None  # Ou une chaîne "N/A"
-            except Exception as e:
-                self.stderr.write(
-                    self.style.ERROR(f"   - Erreur extraction '{indicator_name_last_fiscal_lock_date}': {e}"))
-                indicators_data[indicator_name_last_fiscal_lock_date] = None
-
-                # --- MODIFICATION : Solde des Virements Internes (Comptes 58*) ---
-            indicator_name_internal_transfer_balance = "solde virements internes"
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_internal_transfer_balance}'...")
-                # Domaine pour récupérer les lignes d'écriture des comptes commençant par 58
-                # et appartenant à des pièces validées.
-                domain_internal_transfers_lines = [
-                    ('account_id.code', '=like', '58%'),  # Comptes commençant par 58
-                    ('move_id.state', '=', 'posted'),  # Uniquement des écritures validées
-                    ('company_id', '=', company_id)  # Filtrer par compagnie
-                ]
-
-                # Utiliser read_group pour sommer le champ 'balance' de account.move.line
-                grouped_data = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'account.move.line', 'read_group',
-                    [domain_internal_transfers_lines, ['balance'], []],
-                    # Domaines, champs à agréger, champs de regroupement (aucun ici)
-                    {'lazy': False}  # S'assurer que le calcul est fait
-                )
-
-                total_balance_58 = 0.0
-                if grouped_data and grouped_data[0].get(
-                        'balance') is not None:  # read_group retourne une liste de dictionnaires
-                    total_balance_58 = grouped_data[0]['balance']
-
-                formatted_balance_58 = f"{total_balance_58:,.2f}"  # Formatter avec 2 décimales
-                indicators_data[indicator_name_internal_transfer_balance] = formatted_balance_58
-                self.stdout.write(self.style.SUCCESS(
-                    f"   - {indicator_name_internal_transfer_balance}: OK ({formatted_balance_58})"))
-
-            except Exception as e:
-                self.stderr.write(
-                    self.style.ERROR(f"   - Erreur extraction '{indicator_name_internal_transfer_balance}': {e}"))
-                indicators_data[indicator_name_internal_transfer_balance] = None
-
-                # --- NOUVEL INDICATEUR : Périodicité TVA ---
-            indicator_name_vat_periodicity = "periodicite tva"
-            # !!! VÉRIFIEZ ET ADAPTEZ 'account_tax_periodicity' au vrai nom technique du champ sur res.company !!!
-            technical_field_vat_periodicity_on_company = 'account_tax_periodicity'  # Hypothèse basée sur res.config.settings
-            # -----------------------------------------------------------------------------------------------------
-            try:
-                self.stdout.write(
-                    f"   - Recherche '{indicator_name_vat_periodicity}' depuis res.company (champ: {technical_field_vat_periodicity_on_company})...")
-                company_config_data = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'res.company', 'read',
-                    [[company_id]],  # Utilise l'ID de la compagnie active
-                    {'fields': [technical_field_vat_periodicity_on_company]}
-                )
-                if company_config_data and company_config_data[0].get(
-                        technical_field_vat_periodicity_on_company) is not False:
-                    vat_periodicity_value = company_config_data[0][technical_field_vat_periodicity_on_company]
-
-                    # Odoo retourne souvent la clé pour les champs 'selection'.
-                    # Nous allons créer un petit mapping pour afficher la valeur lisible en français.
-                    vat_periodicity_map = {
-                        'monthly': 'Mensuel',
-                        'quarterly': 'Trimestriel',
-                        'yearly': 'Annuel',
-                        # Ajoutez d'autres clés/valeurs si nécessaire
-                    }
-                    display_value = vat_periodicity_map.get(vat_periodicity_value,
-                                                            vat_periodicity_value)  # Fallback sur la valeur brute
-
-                    if display_value:
-                        indicators_data[indicator_name_vat_periodicity] = str(display_value)
-                        self.stdout.write(
-                            self.style.SUCCESS(f"   - {indicator_name_vat_periodicity}: OK ({display_value})"))
-                    else:
-                        self.stdout.write(self.style.WARNING(
-                            f"   - {indicator_name_vat_periodicity}: Champ '{technical_field_vat_periodicity_on_company}' vide sur res.company ID {company_id}."))
-                        indicators_data[indicator_name_vat_periodicity] = "Non définie"
-                else:
-                    self.stdout.write(self.style.WARNING(
-                        f"   - {indicator_name_vat_periodicity}: Champ '{technical_field_vat_periodicity_on_company}' non trouvé ou non défini sur res.company ID {company_id}."))
-                    indicators_data[indicator_name_vat_periodicity] = "Non définie"
-            except Exception as e:
-                self.stderr.write(
-                    self.style.ERROR(f"   - Erreur extraction '{indicator_name_vat_periodicity}': {e}"))
-                indicators_data[indicator_name_vat_periodicity] = None
-                # --- FIN MODIFICATION ---
-            # --- NOUVEL INDICATEUR : Nombre de Modèles Personnalisés (Workflows) ---
-            indicator_name_custom_models = "nb modeles personnalises (indicatif)"
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_custom_models}'...")
-                # Compte les modèles dont le nom technique commence par 'x_'
-                domain_custom_models = [
-                    ('model', '=like', 'x_%'),
-                    # On pourrait ajouter d'autres filtres si besoin, par exemple pour exclure certains types de modèles x_
-                ]
-                count = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'ir.model', 'search_count',  # Modèle contenant la liste des modèles de la base
-                    [domain_custom_models]
-                )
-                indicators_data[indicator_name_custom_models] = count
-                self.stdout.write(self.style.SUCCESS(f"   - {indicator_name_custom_models}: OK ({count})"))
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"   - Erreur extraction '{indicator_name_custom_models}': {e}"))
-                indicators_data[indicator_name_custom_models] = None
-            # --- NOUVEL INDICATEUR : Nombre d'Actions Automatisées ---
-            indicator_name_automated_actions = "nb actions automatisées"
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_automated_actions}'...")
-                # uniquement du module "règles d'action automatisée : base_automation"
-                # Compte tous les enregistrements dans ir.actions.server.
-                # On pourrait ajouter des filtres si on veut, par exemple, ne compter que celles actives : [('state', '=', 'code')]
-                # ou celles qui ne sont pas des actions de base fournies par Odoo (plus complexe à filtrer).
-                domain_automated_actions = []  # Pas de filtre pour l'instant, compte tout.
-                count = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'ir.actions.server', 'search_count',
-                    [domain_automated_actions]
-                )
-                indicators_data[indicator_name_automated_actions] = count
-                self.stdout.write(self.style.SUCCESS(f"   - {indicator_name_automated_actions}: OK ({count})"))
-            except Exception as e:
-                self.stderr.write(
-                    self.style.ERROR(f"   - Erreur extraction '{indicator_name_automated_actions}': {e}"))
-                indicators_data[indicator_name_automated_actions] = None
-                # --- FIN NOUVEL INDICATEUR ---
-
-            # --- NOUVEL INDICATEUR : Nombre d'Utilisateurs Actifs ---
-            indicator_name_active_users = "nb utilisateurs actifs"
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_active_users}'...")
-                # Compte les utilisateurs actifs et non "partagés" (internes)
-                domain_active_users = [
-                    ('active', '=', True),
-                    ('share', '=', False)  # Exclut les utilisateurs portail/publics
-                ]
-                count = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'res.users', 'search_count',
-                    [domain_active_users]
-                )
-                indicators_data[indicator_name_active_users] = count
-                self.stdout.write(self.style.SUCCESS(f"   - {indicator_name_active_users}: OK ({count})"))
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"   - Erreur extraction '{indicator_name_active_users}': {e}"))
-                indicators_data[indicator_name_active_users] = None
-            # --- FIN NOUVEL INDICATEUR ---
-            # --- NOUVEL INDICATEUR : Nombre TOTAL d'Utilisateurs avec email @lpde.pro (peu importe active/share) ---
-            indicator_name_total_lpde_email_users = "nb utilisateurs lpde"
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_total_lpde_email_users}'...")
-                # Compte tous les utilisateurs (actifs ou non, partagés ou non)
-                # dont l'email se termine par @lpde.pro
-                domain_total_lpde_email_users = [
-                    ('login', '=like', '%@lpde.pro')  # Email se terminant par @lpde.pro
-                ]
-                count = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'res.users', 'search_count',
-                    [domain_total_lpde_email_users]
-                )
-                indicators_data[indicator_name_total_lpde_email_users] = count
-                self.stdout.write(self.style.SUCCESS(f"   - {indicator_name_total_lpde_email_users}: OK ({count})"))
-            except Exception as e:
-                self.stderr.write(
-                    self.style.ERROR(f"   - Erreur extraction '{indicator_name_total_lpde_email_users}': {e}"))
-                indicators_data[indicator_name_total_lpde_email_users] = None
-            # --- FIN NOUVEL INDICATEUR ---
-            # --- MODIFICATION : Nombre de Modules APPLICATIFS Activés ---
-            indicator_name_active_applications = "nb modules actifs"  # Nouveau nom plus spécifique
-            try:
-                self.stdout.write(f"   - Recherche '{indicator_name_active_applications}'...")
-                # Compte les modules installés qui sont des applications principales
-                domain_active_applications = [
-                    ('state', '=', 'installed'),
-                    ('application', '=', True)  # Filtre pour ne compter que les applications
-                ]
-                count = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'ir.module.module', 'search_count',
-                    [domain_active_applications]
-                )
-                indicators_data[indicator_name_active_applications] = count
-                self.stdout.write(self.style.SUCCESS(f"   - {indicator_name_active_applications}: OK ({count})"))
-            except Exception as e:
-                self.stderr.write(
-                    self.style.ERROR(f"   - Erreur extraction '{indicator_name_active_applications}': {e}"))
-                indicators_data[indicator_name_active_applications] = None
-                # --- FIN MODIFICATION ---
-
-            indicator_name_db_activation_date = "date activation base"
-            try:
-                self.stdout.write(
-                    f"   - Recherche '{indicator_name_db_activation_date}' via le premier module installé...")
-                # Recherche le premier module installé en triant par date de création ascendante
-                first_module_data = object_proxy_client.execute_kw(
-                    client_conf.client_odoo_db, uid_client, client_api_key,
-                    'ir.module.module', 'search_read',
-                    [[]],  # Pas de filtre spécifique sur le nom du module
-                    {
-                        'fields': ['create_date'],  # On s'intéresse à la date de création
-                        'limit': 1,
-                        'order': 'create_date asc'  # Tri pour obtenir le plus ancien (premier installé)
-                    }
-                )
-
-                self.stdout.write(f"     - Données brutes pour le premier module: {first_module_data}")
-
-                if first_module_data and first_module_data[0].get('create_date'):
-                    activation_date_str = first_module_data[0]['create_date']
-                    self.stdout.write(
-                        f"     - create_date brute du premier module: {activation_date_str} (type: {type(activation_date_str)})")
-                    try:
-                        if activation_date_str is False:
-                            self.stdout.write(self.style.WARNING(
-                                f"   - {indicator_name_db_activation_date}: create_date est False pour le premier module."))
-                            indicators_data[indicator_name_db_activation_date] = None
-                        elif isinstance(activation_date_str, str):
-                            dt_object = datetime.strptime(activation_date_str, '%Y-%m-%d %H:%M:%S')
-                            formatted_activation_date = dt_object.strftime('%d/%m/%Y')
-                            indicators_data[indicator_name_db_activation_date] = formatted_activation_date
-                            self.stdout.write(self.style.SUCCESS(
-                                f"   - {indicator_name_db_activation_date}: OK ({formatted_activation_date})"))
-                        else:
-                            self.stdout.write(self.style.WARNING(
-                                f"   - {indicator_name_db_activation_date}: create_date n'est pas une chaîne de caractères attendue ({activation_date_str})."))
-                            indicators_data[indicator_name_db_activation_date] = None
-                    except ValueError as ve:
-                        self.stdout.write(self.style.WARNING(
-                            f"   - {indicator_name_db_activation_date}: Format de date inattendu ('{activation_date_str}'), erreur: {ve}. Stockage brut."))
-                        indicators_data[indicator_name_db_activation_date] = activation_date_str
-                    except Exception as e_format:
-                        self.stderr.write(self.style.ERROR(
-                            f"   - Erreur formatage date pour '{indicator_name_db_activation_date}': {e_format}"))
-                        indicators_data[indicator_name_db_activation_date] = None
-                else:
-                    self.stdout.write(self.style.WARNING(
-                        f"   - {indicator_name_db_activation_date}: Date de création du premier module non trouvée ou champ 'create_date' manquant/vide."))
-                    indicators_data[indicator_name_db_activation_date] = None
-            except Exception as e:
-                self.stderr.write(
-                    self.style.ERROR(f"   - Erreur extraction globale '{indicator_name_db_activation_date}': {e}"))
-                indicators_data[indicator_name_db_activation_date] = None
-            # --- FIN MODIFICATION ---
-            # Indicateur : Résultat Provisoire de l'Année en Cours
-            indicator_name_provisional_result = "resultat_provisoire_annee_courante"
-            try:
-                self.stdout.write(
-                    f"   - Recherche '{indicator_name_provisional_result}' (Période: {first_day_of_current_year_str} à {today_str})...")
-                income_account_prefixes = ['70', '71', '72', '73', '74', '75', '76', '77', '78', '79']
-                expense_account_prefixes = ['60', '61', '62', '63', '64', '65', '66', '67', '68', '69']
-
-                total_income_balance = self.get_account_balance_sum_for_period(
-                    object_proxy_client, client_conf.client_odoo_db, uid_client, client_api_key,
-                    income_account_prefixes, company_id, first_day_of_current_year_str, today_str
-                )
-                total_income = -total_income_balance
-                self.stdout.write(
-                    f"     - Total Produits (Classe 7): {total_income:,.2f} (solde brut: {total_income_balance:,.2f})")
+        # Tâches créées dans l'ordre des clients (les plus longs d'abord) : le sémaphore les démarre dans cet ordre
+        tasks = [asyncio.ensure_future(extract(client_conf)) for client_conf in clients_config]
+        stop_reported = False
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                client_conf, result, output = await next_done
+                if result is None:
+                    if not stop_reported:
+                        self.stderr.write(self.style.WARNING("Arrêt demandé : clients restants non traités."))
+                        stop_reported = True
+                    continue
+                self.stdout.write(self.style.NOTICE(f"\n--- Traitement du client : {client_conf.client_name} ---"))
+                output.replay(self.stdout, self.stderr)
+                await save_client_result(client_conf, result, extraction_timestamp)
+        finally:
+            # Ce thread survit au cycle (mode résident) : sa connexion base est fermée ici, close_old_connections()
+            # du démon ne concernant que le thread principal
+            await sync_to_async(connections.close_all, thread_sensitive=True)()
 
-                total_expense_balance = self.get_account_balance_sum_for_period(
-                    object_proxy_client, client_conf.client_odoo_db, uid_client, client_api_key,
-                    expense_account_prefixes, company_id, first_day_of_current_year_str, today_str
-                 )
-                total_expense = total_expense_balance
-                self.stdout.write(
-                    f"     - Total Charges (Classe 6): {total_expense:,.2f} (solde brut: {total_expense_balance:,.2f})")
+    async def _extract_client_async(self, client_conf, out, err, http_client):
+        """Équivalent asyncio de _extract_client : les appels d'une même vague sont émis simultanément."""
+        guard = self._call_guard()
+        client_api_key, last_attempt_time, failed_result = self._begin_client(client_conf, out, err)
+        if failed_result:
+            return failed_result
 
-                provisional_result = total_income - total_expense
-                formatted_result = f"{provisional_result:,.2f}"
+        (uid_client, _, object_proxy_client, odoo_server_version_from_util, connection_error_msg,
+         from_cache) = await async_open_odoo_session(
+            http_client,
+            client_conf.client_odoo_url,
+            client_conf.client_odoo_db,
+            client_conf.client_odoo_api_user,
+            client_api_key,
+            protocol=client_conf.odoo_rpc_protocol or None,
+            use_session_cache=True,
+            store_session=False
+        )
+        result = self._connection_result(client_conf, out, err, last_attempt_time, uid_client,
+                                         odoo_server_version_from_util, connection_error_msg, from_cache)
+        if not result['authenticated']:
+            return result
 
-                indicators_data[indicator_name_provisional_result] = formatted_result
-                self.stdout.write(
-                    self.style.SUCCESS(f"   - {indicator_name_provisional_result}: OK ({formatted_result})"))
+        ctx = ExtractionContext(client_conf, uid_client, out, err, self.style)
+        ctx.indicators = result['indicators']
+        ctx.odoo_version = odoo_server_version_from_util
+        self._collaborator_result(result, out, self._collaborator(ctx))
 
-            except Exception as e:
-                self.stderr.write(
-                    self.style.ERROR(f"   - Erreur extraction '{indicator_name_provisional_result}': {e}"))
-                indicators_data[indicator_name_provisional_result] = None
+        session = self._new_session(uid_client, object_proxy_client, client_conf.odoo_rpc_protocol, is_async=True,
+                                    verified=not from_cache)
+        connection_args = self._client_connection_args(client_conf, client_api_key)
+        if not from_cache:
+            session['cache_update'] = (connection_args, uid_client, odoo_server_version_from_util)
 
+        limiter = self._rate_limits.for_url(client_conf.client_odoo_url)
 
-            # 5e. Sauvegarder les résultats en BDD
-            saved_count = 0;
-            error_count = 0
-            self.stdout.write(f"Sauvegarde des indicateurs trouvés...")
-            for name, value in indicators_data.items():
-                if value is not None:
-                    try:
-                        IndicateursHistoriques.objects.create(
-                            client=client_conf, indicator_name=name, indicator_value=str(value),
-                            extraction_timestamp=current_extraction_run_timestamp,
-                            assigned_odoo_collaborator_id=final_assigned_collab_id_str,
-                            assigned_collaborator_name=collaborator_display_name)
-                        saved_count += 1
-                    except Exception as e:
-                        self.stderr.write(self.style.ERROR(
-                            f"   - Erreur sauvegarde indicateur '{name}' pour {client_conf.client_name}: {e}"));
-                        error_count += 1
-            if error_count > 0:
-                self.stderr.write(self.style.ERROR(
-                    f"{saved_count} indicateur(s) sauvegardé(s), {error_count} erreur(s) de sauvegarde pour {client_conf.client_name}."))
-            elif saved_count > 0:
-                self.stdout.write(self.style.SUCCESS(
-                    f"{saved_count} indicateur(s) sauvegardé(s) avec succès pour {client_conf.client_name}."))
-            else:
-                self.stdout.write(self.style.WARNING(
-                    f"Aucun nouvel indicateur trouvé ou à sauvegarder pour {client_conf.client_name}."))
+        @guard.wrap_async
+        async def execute_on_client(call):
+            async with limiter.async_slot():
+                return await self._execute_with_session_async(session, connection_args, call, client_conf.client_name,
+                                                              http_client)
 
-        self.stdout.write(self.style.SUCCESS("\n--- Fin de l'extraction des indicateurs ---"))
+        out.write(f"Début extraction autres indicateurs pour {client_conf.client_name}...")
+        await sync_to_async(self._load_client_cache, thread_sensitive=True)(ctx)
+        await run_plan_async(plan_indicators(ctx), execute_on_client)
+        result['cache'] = self._client_cache_updates(ctx)
+        result['session_cache'] = session.pop('cache_update', None)
+        self._interruption_result(result, guard, ctx, err)
+        self._session_result(result, session, client_conf, out, err)
+        return result
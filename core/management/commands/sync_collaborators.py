@@ -0,0 +1,17 @@
+# core/management/commands/sync_collaborators.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.utils import sync_cabinet_collaborators
+
+
+class Command(BaseCommand):
+    help = ("Synchronise l'annuaire local des collaborateurs avec l'Odoo du cabinet "
+            "(utilisé par les formulaires de l'admin ; à planifier, par ex. une fois par jour).")
+
+    def handle(self, *args, **options):
+        try:
+            count = sync_cabinet_collaborators()
+        except Exception as e:
+            raise CommandError(f"Erreur lors de la synchronisation des collaborateurs: {e}")
+        self.stdout.write(self.style.SUCCESS(f"{count} collaborateur(s) synchronisé(s) depuis l'Odoo cabinet."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_clientodoostatus_alter_userprofile_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientsodoo',
+            name='odoo_rpc_protocol',
+            field=models.CharField(blank=True, choices=[('xmlrpc', 'XML-RPC'), ('jsonrpc', 'JSON-RPC')], default='', help_text='Laisser vide pour utiliser le protocole global (ODOO_RPC_PROTOCOL).', max_length=10, verbose_name="Protocole d'appel Odoo"),
+        ),
+    ]
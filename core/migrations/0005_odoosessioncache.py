@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_clientsodoo_odoo_rpc_protocol'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OdooSessionCache',
+            fields=[
+                ('cache_key', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Clé de Session (empreinte URL/BDD/utilisateur/clé API)')),
+                ('encrypted_session', models.TextField(verbose_name='Session (Chiffrée)')),
+                ('cached_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de Mise en Cache')),
+            ],
+            options={
+                'verbose_name': 'Session Odoo en Cache',
+                'verbose_name_plural': 'Sessions Odoo en Cache',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 03:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_odoosessioncache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollaborateurCabinet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('odoo_partner_id', models.CharField(max_length=255, unique=True, verbose_name='ID Partenaire Odoo Cabinet')),
+                ('name', models.CharField(max_length=255, verbose_name='Nom')),
+                ('synced_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de Synchronisation')),
+            ],
+            options={
+                'verbose_name': 'Collaborateur Cabinet',
+                'verbose_name_plural': 'Collaborateurs Cabinet',
+                'ordering': ['name'],
+            },
+        ),
+    ]
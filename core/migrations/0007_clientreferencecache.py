@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_collaborateurcabinet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientReferenceCache',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reference_cache', serialize=False, to='core.clientsodoo', verbose_name='Client Odoo Associé')),
+                ('company_id', models.IntegerField(verbose_name='ID Société')),
+                ('journal_ids', models.JSONField(default=dict, verbose_name='IDs des Journaux par Type')),
+                ('account_prefixes', models.JSONField(default=list, verbose_name='Préfixes de Comptes Résolus')),
+                ('account_codes', models.JSONField(default=dict, verbose_name='Codes des Comptes par ID')),
+                ('cached_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de Mise en Cache')),
+            ],
+            options={
+                'verbose_name': 'Références Odoo en Cache',
+                'verbose_name_plural': 'Références Odoo en Cache',
+            },
+        ),
+    ]
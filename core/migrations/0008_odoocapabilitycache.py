@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_clientreferencecache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OdooCapabilityCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('odoo_url', models.CharField(max_length=255, verbose_name='URL Odoo')),
+                ('odoo_db', models.CharField(max_length=100, verbose_name='Base de Données Odoo')),
+                ('odoo_version', models.CharField(max_length=100, verbose_name='Version Odoo Sondée')),
+                ('available_models', models.JSONField(default=dict, verbose_name='Modèles (présent ou non)')),
+                ('available_fields', models.JSONField(default=dict, verbose_name='Champs par Modèle')),
+                ('probed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date du Sondage')),
+            ],
+            options={
+                'verbose_name': 'Capacités Odoo en Cache',
+                'verbose_name_plural': 'Capacités Odoo en Cache',
+                'unique_together': {('odoo_url', 'odoo_db')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_odoocapabilitycache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientIncrementalState',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='incremental_state', serialize=False, to='core.clientsodoo', verbose_name='Client Odoo Associé')),
+                ('watermarks', models.JSONField(default=dict, verbose_name='Watermarks par Modèle')),
+                ('indicator_values', models.JSONField(default=dict, verbose_name='Valeurs des Indicateurs')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de Mise à Jour')),
+            ],
+            options={
+                'verbose_name': 'État Incrémental Client',
+                'verbose_name_plural': 'États Incrémentaux Clients',
+            },
+        ),
+    ]
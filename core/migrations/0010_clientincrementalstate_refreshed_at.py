@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_clientincrementalstate'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='clientincrementalstate',
+            options={'verbose_name': "État d'Extraction Client", 'verbose_name_plural': "États d'Extraction Clients"},
+        ),
+        migrations.AddField(
+            model_name='clientincrementalstate',
+            name='refreshed_at',
+            field=models.JSONField(default=dict, verbose_name='Date de Calcul des Indicateurs'),
+        ),
+    ]
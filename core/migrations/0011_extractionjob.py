@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_clientincrementalstate_refreshed_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'En attente'), ('running', 'En cours'), ('succeeded', 'Terminée'), ('failed', 'En échec')], default='queued', max_length=10, verbose_name='Statut')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Active')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de Demande')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de Début')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de Fin')),
+                ('heartbeat_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Dernier Signe de Vie')),
+                ('total_clients', models.PositiveIntegerField(default=0, verbose_name='Nombre de Clients')),
+                ('processed_clients', models.PositiveIntegerField(default=0, verbose_name='Clients Traités')),
+                ('client_progress', models.JSONField(default=dict, verbose_name='Avancement par Client')),
+                ('output', models.TextField(blank=True, verbose_name='Sortie de la Commande')),
+                ('error_message', models.TextField(blank=True, null=True, verbose_name="Message d'Erreur")),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='extraction_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Demandée par')),
+            ],
+            options={
+                'verbose_name': 'Extraction des Indicateurs',
+                'verbose_name_plural': 'Extractions des Indicateurs',
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='unique_active_extraction_job')],
+            },
+        ),
+    ]
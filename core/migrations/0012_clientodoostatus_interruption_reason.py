@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_extractionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientodoostatus',
+            name='interruption_reason',
+            field=models.CharField(blank=True, choices=[('timeout', 'Délai de réponse dépassé'), ('deadline', 'Délai du client dépassé (indicateurs abandonnés)'), ('breaker', 'Disjoncteur ouvert (échecs répétés)')], max_length=10, null=True, verbose_name="Motif d'Interruption"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_clientodoostatus_interruption_reason'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientodoostatus',
+            name='consecutive_failures',
+            field=models.PositiveIntegerField(default=0, verbose_name='Échecs Consécutifs'),
+        ),
+        migrations.AddField(
+            model_name='clientodoostatus',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Prochaine Tentative Après'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_clientodoostatus_backoff'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_key', models.CharField(max_length=100, unique=True, verbose_name="Identifiant d'Exécution")),
+                ('extraction_timestamp', models.DateTimeField(verbose_name="Timestamp d'Extraction")),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de Création')),
+            ],
+            options={
+                'verbose_name': "Exécution d'Extraction",
+                'verbose_name_plural': "Exécutions d'Extraction",
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExtractionLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker', models.CharField(blank=True, max_length=255, verbose_name='Processus Titulaire')),
+                ('leased_until', models.DateTimeField(blank=True, null=True, verbose_name="Bail Valide Jusqu'à")),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Nombre de Réclamations')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de Fin')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extraction_leases', to='core.clientsodoo', verbose_name='Client Odoo')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leases', to='core.extractionrun', verbose_name='Exécution')),
+            ],
+            options={
+                'verbose_name': "Bail d'Extraction",
+                'verbose_name_plural': "Baux d'Extraction",
+                'unique_together': {('run', 'client')},
+            },
+        ),
+    ]
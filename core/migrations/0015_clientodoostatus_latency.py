@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_extractionrun_extractionlease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientodoostatus',
+            name='last_duration',
+            field=models.FloatField(blank=True, null=True, verbose_name="Dernière Durée d'Extraction (s)"),
+        ),
+        migrations.AddField(
+            model_name='clientodoostatus',
+            name='latency_estimate',
+            field=models.FloatField(blank=True, null=True, verbose_name="Durée d'Extraction Estimée (s)"),
+        ),
+    ]
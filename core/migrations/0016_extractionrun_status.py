@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_clientodoostatus_latency'),
+    ]
+
+    operations = [
+        # Les exécutions existantes restent visibles sur le tableau de bord : elles sont considérées finalisées
+        migrations.AddField(
+            model_name='extractionrun',
+            name='status',
+            field=models.CharField(choices=[('running', 'En cours ou interrompue'), ('finalized', 'Finalisée')], default='finalized', max_length=10, verbose_name='Statut'),
+        ),
+        migrations.AlterField(
+            model_name='extractionrun',
+            name='status',
+            field=models.CharField(choices=[('running', 'En cours ou interrompue'), ('finalized', 'Finalisée')], default='running', max_length=10, verbose_name='Statut'),
+        ),
+        migrations.AddField(
+            model_name='extractionrun',
+            name='finalized_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Date de Finalisation'),
+        ),
+    ]
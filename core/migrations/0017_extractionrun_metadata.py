@@ -0,0 +1,69 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_extractionrun_status'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='extractionrun',
+            old_name='created_at',
+            new_name='started_at',
+        ),
+        migrations.RenameField(
+            model_name='extractionrun',
+            old_name='finalized_at',
+            new_name='finished_at',
+        ),
+        migrations.AlterModelOptions(
+            name='extractionrun',
+            options={'ordering': ['-started_at'], 'verbose_name': "Exécution d'Extraction", 'verbose_name_plural': "Exécutions d'Extraction"},
+        ),
+        migrations.AlterField(
+            model_name='extractionrun',
+            name='started_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Début'),
+        ),
+        migrations.AlterField(
+            model_name='extractionrun',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fin (Finalisation)'),
+        ),
+        migrations.AddField(
+            model_name='extractionrun',
+            name='client_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Nombre de Clients'),
+        ),
+        migrations.AddField(
+            model_name='extractionrun',
+            name='failed_client_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Clients en Échec'),
+        ),
+        migrations.AddField(
+            model_name='extractionrun',
+            name='indicator_count',
+            field=models.PositiveIntegerField(default=0, verbose_name="Nombre d'Indicateurs"),
+        ),
+        migrations.AddField(
+            model_name='extractionrun',
+            name='duration',
+            field=models.FloatField(blank=True, null=True, verbose_name='Durée (secondes)'),
+        ),
+        migrations.AddIndex(
+            model_name='extractionrun',
+            index=models.Index(fields=['status', '-extraction_timestamp'], name='core_extrac_status_76ef78_idx'),
+        ),
+        # Nullable le temps du remplissage (0018), rendue obligatoire ensuite (0019)
+        migrations.AddField(
+            model_name='indicateurshistoriques',
+            name='run',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='indicators', to='core.extractionrun', verbose_name='Exécution'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:40
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_indicator_runs(apps, schema_editor):
+    """
+    Rattache chaque indicateur existant à l'exécution de son extraction_timestamp : celle enregistrée par
+    fetch_indicators si elle existe, sinon une exécution finalisée créée pour ce timestamp.
+    """
+    ExtractionRun = apps.get_model('core', 'ExtractionRun')
+    IndicateursHistoriques = apps.get_model('core', 'IndicateursHistoriques')
+    runs = {run.extraction_timestamp: run for run in ExtractionRun.objects.all()}
+    timestamps = IndicateursHistoriques.objects.filter(run__isnull=True).order_by().values('extraction_timestamp') \
+        .annotate(indicator_count=Count('id'), client_count=Count('client', distinct=True))
+    for entry in timestamps:
+        timestamp = entry['extraction_timestamp']
+        run = runs.get(timestamp)
+        if run is None:
+            run = ExtractionRun.objects.create(
+                run_key=f"historique-{timestamp:%Y%m%d-%H%M%S-%f}", extraction_timestamp=timestamp,
+                started_at=timestamp, finished_at=timestamp, status='finalized', client_count=entry['client_count'])
+        elif run.status == 'finalized':
+            run.client_count = run.leases.count() or entry['client_count']
+            if run.finished_at:
+                run.duration = (run.finished_at - run.started_at).total_seconds()
+        run.indicator_count = entry['indicator_count']
+        run.save()
+        IndicateursHistoriques.objects.filter(extraction_timestamp=timestamp, run__isnull=True).update(run=run)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_extractionrun_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_indicator_runs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_backfill_indicator_runs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='indicateurshistoriques',
+            name='run',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='indicators', to='core.extractionrun', verbose_name='Exécution'),
+        ),
+        migrations.AddIndex(
+            model_name='indicateurshistoriques',
+            index=models.Index(fields=['run', 'client'], name='core_indica_run_id_1847e4_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_indicateurshistoriques_run_required'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='extractionrun',
+            name='heartbeat_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Dernier Signe de Vie'),
+        ),
+    ]
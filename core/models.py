@@ -62,6 +62,18 @@ class ClientsOdoo(models.Model):
     client_odoo_db = models.CharField(max_length=255, null=False, blank=False, verbose_name="Nom BDD Odoo Client")
     client_odoo_api_user = models.CharField(max_length=255, null=False, blank=False, verbose_name="Utilisateur API Odoo Client")
     client_odoo_encrypted_api_key = models.TextField(null=False, blank=False, verbose_name="Clé API Odoo Client (Chiffrée)")
+    RPC_PROTOCOL_CHOICES = [
+        ('xmlrpc', 'XML-RPC'),
+        ('jsonrpc', 'JSON-RPC'),
+    ]
+    odoo_rpc_protocol = models.CharField(
+        max_length=10,
+        choices=RPC_PROTOCOL_CHOICES,
+        blank=True,
+        default='',
+        verbose_name="Protocole d'appel Odoo",
+        help_text="Laisser vide pour utiliser le protocole global (ODOO_RPC_PROTOCOL)."
+    )
 
     def __str__(self):
         return self.client_name
@@ -84,6 +96,14 @@ class IndicateursHistoriques(models.Model):
     indicator_name = models.CharField(max_length=255, null=False, blank=False, verbose_name="Nom Indicateur")
     indicator_value = models.TextField(null=True, blank=True, verbose_name="Valeur Indicateur")
     extraction_timestamp = models.DateTimeField(null=False, blank=False, verbose_name="Date/Heure Extraction")
+    # Indexé avec le client (index composite ci-dessous) : pas d'index propre à la clé étrangère
+    run = models.ForeignKey(
+        'ExtractionRun',
+        on_delete=models.PROTECT,
+        related_name='indicators',
+        db_index=False,
+        verbose_name="Exécution"
+    )
     assigned_odoo_collaborator_id = models.CharField(max_length=255, null=True, blank=True, verbose_name="ID Partenaire Collaborateur (Odoo Cabinet)")
     assigned_collaborator_name = models.CharField(max_length=255, null=True, blank=True, verbose_name="Nom Collaborateur Assigné (Odoo Cabinet)")
 
@@ -95,6 +115,7 @@ class IndicateursHistoriques(models.Model):
         verbose_name_plural = "Indicateurs Historiques"
         indexes = [
             models.Index(fields=['client', '-extraction_timestamp']),
+            models.Index(fields=['run', 'client']),
             models.Index(fields=['assigned_odoo_collaborator_id']),
             models.Index(fields=['indicator_name']),
         ]
@@ -121,6 +142,44 @@ class ClientOdooStatus(models.Model):
         blank=True,
         verbose_name="Dernier Message d'Erreur"
     )
+    INTERRUPTION_TIMEOUT = 'timeout'
+    INTERRUPTION_DEADLINE = 'deadline'
+    INTERRUPTION_BREAKER = 'breaker'
+    INTERRUPTION_CHOICES = [
+        (INTERRUPTION_TIMEOUT, "Délai de réponse dépassé"),
+        (INTERRUPTION_DEADLINE, "Délai du client dépassé (indicateurs abandonnés)"),
+        (INTERRUPTION_BREAKER, "Disjoncteur ouvert (échecs répétés)"),
+    ]
+    interruption_reason = models.CharField(
+        max_length=10,
+        choices=INTERRUPTION_CHOICES,
+        null=True,
+        blank=True,
+        verbose_name="Motif d'Interruption"
+    )
+    # Échecs consécutifs (connexion, authentification, disjoncteur) et date avant laquelle le client n'est pas
+    # retenté (backoff exponentiel) ; remis à zéro au premier succès
+    consecutive_failures = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Échecs Consécutifs"
+    )
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Prochaine Tentative Après"
+    )
+    # Durée de la dernière extraction du client et moyenne glissante (CLIENT_LATENCY_SMOOTHING), qui sert à lancer
+    # les clients les plus longs en premier
+    last_duration = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="Dernière Durée d'Extraction (s)"
+    )
+    latency_estimate = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="Durée d'Extraction Estimée (s)"
+    )
     # On pourrait ajouter un last_success_timestamp si besoin
 
     def __str__(self):
@@ -132,3 +191,228 @@ class ClientOdooStatus(models.Model):
         verbose_name_plural = "Statuts Connexion Clients Odoo"
         ordering = ['-last_connection_attempt']
 # --- FIN NOUVEAU MODÈLE ---
+
+
+class CollaborateurCabinet(models.Model):
+    """Annuaire local des collaborateurs (partenaires internes) de l'Odoo cabinet, synchronisé en bloc."""
+    odoo_partner_id = models.CharField(max_length=255, unique=True, verbose_name="ID Partenaire Odoo Cabinet")
+    name = models.CharField(max_length=255, verbose_name="Nom")
+    synced_at = models.DateTimeField(default=timezone.now, verbose_name="Date de Synchronisation")
+
+    def __str__(self):
+        return f"{self.name} ({self.odoo_partner_id})"
+
+    class Meta:
+        verbose_name = "Collaborateur Cabinet"
+        verbose_name_plural = "Collaborateurs Cabinet"
+        ordering = ['name']
+
+
+class OdooSessionCache(models.Model):
+    """Session Odoo (uid, version) conservée d'une exécution à l'autre, chiffrée, pour éviter de se ré-authentifier."""
+    cache_key = models.CharField(
+        max_length=64,
+        primary_key=True,
+        verbose_name="Clé de Session (empreinte URL/BDD/utilisateur/clé API)"
+    )
+    encrypted_session = models.TextField(verbose_name="Session (Chiffrée)")
+    cached_at = models.DateTimeField(default=timezone.now, verbose_name="Date de Mise en Cache")
+
+    def __str__(self):
+        return f"Session Odoo {self.cache_key[:12]}... (le {self.cached_at.strftime('%d/%m/%Y %H:%M')})"
+
+    class Meta:
+        verbose_name = "Session Odoo en Cache"
+        verbose_name_plural = "Sessions Odoo en Cache"
+
+
+class ClientReferenceCache(models.Model):
+    """
+    Références Odoo d'un client (société, journaux par type, comptes par préfixe) conservées d'une exécution
+    à l'autre : les domaines des indicateurs filtrent directement sur ces IDs.
+    """
+    client = models.OneToOneField(
+        ClientsOdoo,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='reference_cache',
+        verbose_name="Client Odoo Associé"
+    )
+    company_id = models.IntegerField(verbose_name="ID Société")
+    journal_ids = models.JSONField(default=dict, verbose_name="IDs des Journaux par Type")
+    account_prefixes = models.JSONField(default=list, verbose_name="Préfixes de Comptes Résolus")
+    account_codes = models.JSONField(default=dict, verbose_name="Codes des Comptes par ID")
+    cached_at = models.DateTimeField(default=timezone.now, verbose_name="Date de Mise en Cache")
+
+    def __str__(self):
+        return f"Références {self.client.client_name} (le {self.cached_at.strftime('%d/%m/%Y %H:%M')})"
+
+    class Meta:
+        verbose_name = "Références Odoo en Cache"
+        verbose_name_plural = "Références Odoo en Cache"
+
+
+class OdooCapabilityCache(models.Model):
+    """
+    Modèles et champs disponibles sur une base Odoo (sondés par ir.model et fields_get), valables tant que
+    la version détectée ne change pas : les appels qui ne peuvent pas aboutir ne sont plus émis.
+    """
+    odoo_url = models.CharField(max_length=255, verbose_name="URL Odoo")
+    odoo_db = models.CharField(max_length=100, verbose_name="Base de Données Odoo")
+    odoo_version = models.CharField(max_length=100, verbose_name="Version Odoo Sondée")
+    available_models = models.JSONField(default=dict, verbose_name="Modèles (présent ou non)")
+    available_fields = models.JSONField(default=dict, verbose_name="Champs par Modèle")
+    probed_at = models.DateTimeField(default=timezone.now, verbose_name="Date du Sondage")
+
+    def __str__(self):
+        return f"Capacités {self.odoo_db}@{self.odoo_url} (Odoo {self.odoo_version})"
+
+    class Meta:
+        verbose_name = "Capacités Odoo en Cache"
+        verbose_name_plural = "Capacités Odoo en Cache"
+        unique_together = ('odoo_url', 'odoo_db')
+
+
+class ClientIncrementalState(models.Model):
+    """
+    État d'extraction d'un client : dernière valeur calculée et date de calcul de chaque indicateur (reportées
+    tant que l'indicateur n'est pas dû), et watermark (nombre d'enregistrements, write_date max) de chaque
+    modèle Odoo source pour le mode incrémental.
+    """
+    client = models.OneToOneField(
+        ClientsOdoo,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='incremental_state',
+        verbose_name="Client Odoo Associé"
+    )
+    watermarks = models.JSONField(default=dict, verbose_name="Watermarks par Modèle")
+    indicator_values = models.JSONField(default=dict, verbose_name="Valeurs des Indicateurs")
+    refreshed_at = models.JSONField(default=dict, verbose_name="Date de Calcul des Indicateurs")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="Date de Mise à Jour")
+
+    def __str__(self):
+        return f"État incrémental {self.client.client_name} (le {self.updated_at.strftime('%d/%m/%Y %H:%M')})"
+
+    class Meta:
+        verbose_name = "État d'Extraction Client"
+        verbose_name_plural = "États d'Extraction Clients"
+
+
+class ExtractionJob(models.Model):
+    """
+    Extraction des indicateurs lancée depuis l'admin et exécutée en arrière-plan (core.jobs).
+    Au plus une extraction active (en attente ou en cours) à la fois : garanti par une contrainte d'unicité
+    partielle sur is_active, pas seulement par la vue.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "En attente"),
+        (STATUS_RUNNING, "En cours"),
+        (STATUS_SUCCEEDED, "Terminée"),
+        (STATUS_FAILED, "En échec"),
+    ]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED, verbose_name="Statut")
+    is_active = models.BooleanField(default=True, verbose_name="Active")
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='extraction_jobs',
+        verbose_name="Demandée par"
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Date de Demande")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Date de Début")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Date de Fin")
+    heartbeat_at = models.DateTimeField(default=timezone.now, verbose_name="Dernier Signe de Vie")
+    total_clients = models.PositiveIntegerField(default=0, verbose_name="Nombre de Clients")
+    processed_clients = models.PositiveIntegerField(default=0, verbose_name="Clients Traités")
+    client_progress = models.JSONField(default=dict, verbose_name="Avancement par Client")
+    output = models.TextField(blank=True, verbose_name="Sortie de la Commande")
+    error_message = models.TextField(blank=True, null=True, verbose_name="Message d'Erreur")
+
+    def __str__(self):
+        return f"Extraction du {self.created_at.strftime('%d/%m/%Y %H:%M')} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Extraction des Indicateurs"
+        verbose_name_plural = "Extractions des Indicateurs"
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['is_active'], condition=models.Q(is_active=True), name='unique_active_extraction_job'),
+        ]
+
+
+class ExtractionRun(models.Model):
+    """
+    Exécution de fetch_indicators : tous ses clients sont écrits sous le même extraction_timestamp, y compris
+    quand elle est partagée par plusieurs processus (--run-id) ou reprise après une interruption (--resume).
+    Ses indicateurs (IndicateursHistoriques.run) ne sont visibles sur le tableau de bord qu'une fois l'exécution
+    finalisée (tous ses clients terminés, cf. ExtractionLease.completed_at).
+    Les compteurs d'indicateurs et de clients en échec sont incrémentés à chaque écriture groupée ; le nombre de
+    clients et la durée (de started_at à finished_at, interruptions comprises) le sont à la finalisation.
+    heartbeat_at est mis à jour à chaque client traité : une exécution sans signe de vie depuis
+    EXTRACTION_LEASE_TTL secondes est considérée comme interrompue (--resume).
+    """
+    STATUS_RUNNING = 'running'
+    STATUS_FINALIZED = 'finalized'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, "En cours ou interrompue"),
+        (STATUS_FINALIZED, "Finalisée"),
+    ]
+
+    run_key = models.CharField(max_length=100, unique=True, verbose_name="Identifiant d'Exécution")
+    extraction_timestamp = models.DateTimeField(verbose_name="Timestamp d'Extraction")
+    started_at = models.DateTimeField(default=timezone.now, verbose_name="Début")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin (Finalisation)")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING, verbose_name="Statut")
+    client_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de Clients")
+    failed_client_count = models.PositiveIntegerField(default=0, verbose_name="Clients en Échec")
+    indicator_count = models.PositiveIntegerField(default=0, verbose_name="Nombre d'Indicateurs")
+    duration = models.FloatField(null=True, blank=True, verbose_name="Durée (secondes)")
+    heartbeat_at = models.DateTimeField(default=timezone.now, verbose_name="Dernier Signe de Vie")
+
+    def __str__(self):
+        return f"Exécution {self.run_key} ({self.extraction_timestamp.strftime('%d/%m/%Y %H:%M')})"
+
+    class Meta:
+        verbose_name = "Exécution d'Extraction"
+        verbose_name_plural = "Exécutions d'Extraction"
+        ordering = ['-started_at']
+        indexes = [
+            # Dernière exécution finalisée (tableau de bord)
+            models.Index(fields=['status', '-extraction_timestamp']),
+        ]
+
+
+class ExtractionLease(models.Model):
+    """
+    Point de reprise d'un client dans une exécution : completed_at est renseigné dans la transaction qui écrit
+    ses indicateurs (ou dès le début pour un client reporté par son backoff), --resume saute donc exactement
+    les clients déjà écrits.
+    Avec --lease, c'est aussi le bail du client : un processus le réclame jusqu'à leased_until, prolonge le bail
+    au fil de son travail et le libère une fois les indicateurs écrits. Un bail expiré (processus arrêté) peut
+    être réclamé par un autre processus.
+    """
+    run = models.ForeignKey(ExtractionRun, on_delete=models.CASCADE, related_name='leases',
+                            verbose_name="Exécution")
+    client = models.ForeignKey(ClientsOdoo, on_delete=models.CASCADE, related_name='extraction_leases',
+                               verbose_name="Client Odoo")
+    worker = models.CharField(max_length=255, blank=True, verbose_name="Processus Titulaire")
+    leased_until = models.DateTimeField(null=True, blank=True, verbose_name="Bail Valide Jusqu'à")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Nombre de Réclamations")
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name="Date de Fin")
+
+    def __str__(self):
+        return f"Bail {self.client.client_name} ({self.run.run_key})"
+
+    class Meta:
+        verbose_name = "Bail d'Extraction"
+        verbose_name_plural = "Baux d'Extraction"
+        unique_together = ('run', 'client')
@@ -0,0 +1,166 @@
+# core/ratelimit.py
+"""
+Limitation des appels Odoo par hôte, partagée par tous les workers d'une exécution.
+
+Beaucoup de bases clientes sont hébergées sur les mêmes hôtes SaaS : en extraction parallèle, chaque hôte
+reçoit au plus `max_in_flight` appels simultanés et `rate` appels par seconde en régime établi (seau à jetons
+de capacité `burst`). Les limites se configurent par motif d'hôte (ODOO_HOST_RATE_LIMITS) ; l'Odoo du cabinet
+a son propre budget (ODOO_FIRM_RATE_LIMIT), distinct de celui des clients même s'il partage leur hôte.
+"""
+import asyncio
+import fnmatch
+import threading
+import time
+import urllib.parse
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+# Clé du budget de l'Odoo cabinet
+FIRM_LIMIT_KEY = 'cabinet'
+
+
+def odoo_host(url):
+    """Hôte (en minuscules) d'une URL Odoo, clé de limitation des clients."""
+    return (urllib.parse.urlsplit((url or '').strip()).hostname or '').lower()
+
+
+class HostLimiter:
+    """
+    Seau à jetons et plafond d'appels en vol d'un hôte.
+    slot() (threads) et async_slot() (moteur asyncio) attendent une place puis un jeton ;
+    rate <= 0 ou max_in_flight <= 0 désactive la limite correspondante.
+    """
+
+    def __init__(self, key, rate=0, burst=1, max_in_flight=0):
+        self.key = key
+        self._lock = threading.Lock()
+        self._tokens = float(max(burst, 1))
+        self._updated_at = time.monotonic()
+        self.configure(rate, burst, max_in_flight)
+        self.calls = 0
+        self.waited = 0.0
+
+    def configure(self, rate=0, burst=1, max_in_flight=0):
+        """Change les limites ; uniquement quand aucun appel n'est en cours (entre deux lots de clients)."""
+        with self._lock:
+            self.rate = rate
+            self.burst = max(burst, 1)
+            self.max_in_flight = max_in_flight
+            self._tokens = min(self._tokens, float(self.burst))
+            self._slots = threading.BoundedSemaphore(max_in_flight) if max_in_flight > 0 else None
+            self._async_slots = None  # créé dans la boucle asyncio qui l'utilise
+
+    def _reserve(self):
+        """Réserve un jeton ; retourne le délai (secondes) à attendre avant d'émettre l'appel."""
+        with self._lock:
+            self.calls += 1
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            # Le solde peut devenir négatif : chaque appel attend son tour, dans l'ordre des réservations
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += delay
+            return delay
+
+    @contextmanager
+    def slot(self):
+        started = time.monotonic()
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            with self._lock:
+                self.waited += time.monotonic() - started
+            delay = self._reserve()
+            if delay:
+                time.sleep(delay)
+            yield
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        if self.max_in_flight > 0 and self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_in_flight)
+        started = time.monotonic()
+        if self._async_slots is not None:
+            await self._async_slots.acquire()
+        try:
+            self.waited += time.monotonic() - started
+            delay = self._reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            yield
+        finally:
+            if self._async_slots is not None:
+                self._async_slots.release()
+
+
+class HostLimiterRegistry:
+    """
+    Limiteurs d'une exécution, un par hôte Odoo (créé à la première demande) plus celui du cabinet.
+    rules : {motif fnmatch d'hôte: {'rate', 'burst', 'max_in_flight'}} ; le premier motif correspondant,
+    dans l'ordre de déclaration, s'applique ('*' en dernier recours). share divise les débits et plafonds
+    quand plusieurs processus se partagent l'exécution : fixe avec --shard, réévalué par set_share() avec --lease.
+    Les limiteurs restent propres au processus, sans compteur partagé : le total ne respecte le budget que si
+    share correspond au nombre de processus qui appellent effectivement le même hôte.
+    """
+
+    def __init__(self, rules=None, firm_limits=None, share=1):
+        self.rules = settings.ODOO_HOST_RATE_LIMITS if rules is None else rules
+        self.firm_limits = settings.ODOO_FIRM_RATE_LIMIT if firm_limits is None else firm_limits
+        self.share = max(share, 1)
+        self._limiters = {}
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def _limits_for(self, host):
+        for pattern, limits in self.rules.items():
+            if fnmatch.fnmatch(host, pattern.lower()):
+                return limits
+        return {}
+
+    def _scaled(self, limits):
+        max_in_flight = limits.get('max_in_flight', 0)
+        return {
+            'rate': limits.get('rate', 0) / self.share,
+            'burst': max(int(limits.get('burst', 1) / self.share), 1),
+            'max_in_flight': max(max_in_flight // self.share, 1) if max_in_flight > 0 else 0,
+        }
+
+    def _get(self, key, limits_factory):
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limits = self._limits[key] = limits_factory()
+                limiter = self._limiters[key] = HostLimiter(key, **self._scaled(limits))
+            return limiter
+
+    def set_share(self, share):
+        """
+        Répartit les budgets entre `share` processus ; les limiteurs existants sont reconfigurés.
+        Uniquement quand aucun appel n'est en cours (entre deux lots de clients).
+        Simple division d'un budget statique : chaque processus continue de limiter seul, sans compteur partagé.
+        share n'étant réévalué qu'entre deux lots, un processus qui rejoint l'exécution fait dépasser le budget
+        jusqu'au prochain lot des autres, et un processus qui part laisse une part inutilisée.
+        """
+        with self._lock:
+            self.share = max(share, 1)
+            for key, limiter in self._limiters.items():
+                limiter.configure(**self._scaled(self._limits[key]))
+
+    def for_url(self, url):
+        host = odoo_host(url)
+        return self._get(host, lambda: self._limits_for(host))
+
+    def firm(self):
+        return self._get(FIRM_LIMIT_KEY, lambda: self.firm_limits)
+
+    def throttled(self):
+        """Limiteurs ayant fait attendre des appels, du plus au moins pénalisé : (clé, appels, secondes d'attente)."""
+        return sorted(((limiter.key, limiter.calls, limiter.waited) for limiter in self._limiters.values()
+                       if limiter.waited >= 0.001), key=lambda entry: -entry[2])
@@ -0,0 +1,45 @@
+# core/scheduling.py
+"""
+Ordre de traitement des clients d'une exécution.
+
+Les clients sont lancés du plus long au plus court (LPT, longest processing time first) d'après la durée
+estimée de leur extraction (moyenne glissante des exécutions précédentes, ClientOdooStatus.latency_estimate) :
+les clients lents ne démarrent plus en fin d'exécution pendant que les autres workers attendent.
+"""
+import heapq
+
+
+def update_latency_estimate(previous, duration, smoothing):
+    """Moyenne glissante exponentielle : `smoothing` est le poids de la dernière durée mesurée."""
+    if previous is None:
+        return duration
+    return smoothing * duration + (1 - smoothing) * previous
+
+
+def estimated_durations(clients_config, estimates):
+    """
+    Durée estimée de chaque client (dans l'ordre de clients_config) ; un client sans historique reçoit
+    la moyenne des clients connus (0 si aucun).
+    """
+    known = [estimates[client_conf.pk] for client_conf in clients_config if estimates.get(client_conf.pk) is not None]
+    default = sum(known) / len(known) if known else 0.0
+    return [estimates.get(client_conf.pk) if estimates.get(client_conf.pk) is not None else default
+            for client_conf in clients_config]
+
+
+def longest_first(clients_config, estimates):
+    """Clients triés par durée estimée décroissante (à durée égale, par nom)."""
+    durations = estimated_durations(clients_config, estimates)
+    ordered = sorted(zip(clients_config, durations), key=lambda entry: (-entry[1], entry[0].client_name))
+    return [client_conf for client_conf, _ in ordered]
+
+
+def lpt_makespan(durations, workers):
+    """
+    Durée totale prévue quand `durations` (dans l'ordre de lancement) sont distribuées à `workers` workers,
+    chaque client partant sur le premier worker libre.
+    """
+    loads = [0.0] * max(min(workers, len(durations)), 1)
+    for duration in durations:
+        heapq.heappush(loads, heapq.heappop(loads) + duration)
+    return max(loads)
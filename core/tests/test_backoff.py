@@ -0,0 +1,29 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from core.utils import client_backoff_delay
+
+
+@override_settings(ODOO_CLIENT_BACKOFF_BASE=60, ODOO_CLIENT_BACKOFF_MAX=3600)
+class ClientBackoffDelayTests(SimpleTestCase):
+
+    def test_delay_doubles_with_each_failure_within_jitter_bounds(self):
+        for failures, full_delay in ((1, 60), (2, 120), (3, 240)):
+            delay = client_backoff_delay(failures)
+            self.assertGreaterEqual(delay, timedelta(seconds=full_delay / 2))
+            self.assertLessEqual(delay, timedelta(seconds=full_delay))
+
+    def test_delay_is_capped(self):
+        with mock.patch('core.utils.random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual(client_backoff_delay(30), timedelta(seconds=3600))
+
+    def test_half_of_the_delay_is_random(self):
+        with mock.patch('core.utils.random.uniform', side_effect=lambda low, high: low):
+            self.assertEqual(client_backoff_delay(2), timedelta(seconds=60))
+
+    def test_no_failure_or_disabled_backoff_means_no_delay(self):
+        self.assertEqual(client_backoff_delay(0), timedelta(0))
+        with override_settings(ODOO_CLIENT_BACKOFF_BASE=0):
+            self.assertEqual(client_backoff_delay(5), timedelta(0))
@@ -0,0 +1,71 @@
+import asyncio
+import xmlrpc.client
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.indicators import ClientCallAborted, ClientCallGuard, OdooCall
+
+CALL = OdooCall('res.partner', 'search_count', [[]])
+
+
+class ClientCallGuardTests(SimpleTestCase):
+
+    def test_calls_are_refused_once_the_deadline_has_passed(self):
+        with mock.patch('core.indicators.time.monotonic', return_value=100.0):
+            guard = ClientCallGuard(deadline=30)
+            guarded = guard.wrap(lambda call: 'ok')
+            self.assertEqual(guarded(CALL), 'ok')
+        with mock.patch('core.indicators.time.monotonic', return_value=131.0):
+            with self.assertRaises(ClientCallAborted) as aborted:
+                guarded(CALL)
+        self.assertEqual(aborted.exception.reason, 'deadline')
+        self.assertEqual(guard.interruption_reason(), 'deadline')
+        self.assertIn("2 indicateur(s) abandonné(s)", guard.summary(2))
+
+    def test_no_deadline_means_no_limit(self):
+        guard = ClientCallGuard()
+        self.assertIsNone(guard.remaining())
+        guard.check()
+        self.assertIsNone(guard.summary(0))
+
+    def test_breaker_opens_after_consecutive_transport_failures(self):
+        guard = ClientCallGuard(breaker_threshold=2)
+
+        def execute(call):
+            raise TimeoutError("timed out")
+
+        guarded = guard.wrap(execute)
+        for _ in range(2):
+            with self.assertRaises(TimeoutError):
+                guarded(CALL)
+        with self.assertRaises(ClientCallAborted) as aborted:
+            guarded(CALL)
+        self.assertEqual(aborted.exception.reason, 'breaker')
+        self.assertEqual(guard.timeouts, 2)
+
+    def test_odoo_faults_and_successes_reset_the_failure_count(self):
+        guard = ClientCallGuard(breaker_threshold=2)
+        guard.record(ConnectionError("reset"))
+        guard.record(xmlrpc.client.Fault(2, "Invalid field"))
+        guard.record(ConnectionError("reset"))
+        guard.record()
+        guard.record(ConnectionError("reset"))
+        self.assertIsNone(guard.reason)
+        guard.check()
+
+    def test_timeouts_without_breaker_are_reported(self):
+        guard = ClientCallGuard()
+        guard.record(TimeoutError("timed out"))
+        self.assertEqual(guard.interruption_reason(), 'timeout')
+        self.assertIn("1 appel(s) Odoo sans réponse", guard.summary(0))
+
+    def test_async_call_is_interrupted_at_the_deadline(self):
+        guard = ClientCallGuard(deadline=0.05)
+
+        async def execute(call):
+            await asyncio.sleep(1)
+
+        with self.assertRaises(ClientCallAborted):
+            asyncio.run(guard.wrap_async(execute)(CALL))
+        self.assertEqual(guard.interruption_reason(), 'deadline')
@@ -0,0 +1,42 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from core.models import CollaborateurCabinet, ConfigurationCabinet
+from core.utils import sync_cabinet_collaborators
+
+
+class SyncCabinetCollaboratorsTests(TestCase):
+
+    def setUp(self):
+        ConfigurationCabinet.objects.create(firm_odoo_url='https://cabinet.odoo.com', firm_odoo_db='cabinet',
+                                            firm_odoo_api_user='api', firm_odoo_encrypted_api_key='x')
+        for partner_id in range(1, 5):
+            CollaborateurCabinet.objects.create(odoo_partner_id=str(partner_id), name=f"Ancien {partner_id}")
+
+    def sync(self, partners):
+        proxy = mock.Mock()
+        proxy.execute_kw.return_value = [{'id': partner_id, 'name': f"Collaborateur {partner_id}"}
+                                         for partner_id in partners]
+        with mock.patch('core.utils.decrypt_value', return_value='clé'), \
+                mock.patch('core.utils.connect_odoo', return_value=(2, None, proxy, '17.0', None)):
+            return sync_cabinet_collaborators()
+
+    def directory(self):
+        return dict(CollaborateurCabinet.objects.values_list('odoo_partner_id', 'name'))
+
+    def test_departed_partners_are_removed(self):
+        self.assertEqual(self.sync([1, 2, 3, 5]), 4)
+        self.assertEqual(self.directory(), {'1': "Collaborateur 1", '2': "Collaborateur 2", '3': "Collaborateur 3",
+                                            '5': "Collaborateur 5"})
+
+    def test_empty_result_does_not_wipe_the_directory(self):
+        with self.assertLogs('core.utils', 'WARNING'):
+            self.assertEqual(self.sync([]), 0)
+        self.assertEqual(len(self.directory()), 4)
+
+    def test_sudden_shrink_is_not_pruned(self):
+        with self.assertLogs('core.utils', 'WARNING'):
+            self.sync([1])
+        self.assertEqual(self.directory(), {'1': "Collaborateur 1", '2': "Ancien 2", '3': "Ancien 3",
+                                            '4': "Ancien 4"})
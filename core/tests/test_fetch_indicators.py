@@ -0,0 +1,52 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from core.management.commands.fetch_indicators import Command
+from core.models import ClientOdooStatus, ClientsOdoo, ConfigurationCabinet, ExtractionRun
+
+
+class UnexpectedClientErrorMixin:
+    """Un client dont l'extraction lève une exception inattendue est terminé en échec : l'exécution est finalisée."""
+
+    def setUp(self):
+        # Clé du cabinet indéchiffrable : pas d'appel à l'Odoo du cabinet
+        ConfigurationCabinet.objects.create(firm_odoo_url='https://cabinet.odoo.com', firm_odoo_db='cabinet',
+                                            firm_odoo_api_user='api', firm_odoo_encrypted_api_key='x')
+        self.client_conf = ClientsOdoo.objects.create(
+            client_name='Client 0', client_odoo_url='https://client0.odoo.com', client_odoo_db='db0',
+            client_odoo_api_user='api', client_odoo_encrypted_api_key='x')
+
+    def assert_run_finalized_with_failed_client(self, **options):
+        errors = StringIO()
+        with mock.patch.object(Command, '_extract_client', side_effect=RuntimeError("bogue")), \
+                mock.patch.object(Command, '_extract_client_async', side_effect=RuntimeError("bogue")):
+            call_command('fetch_indicators', stdout=StringIO(), stderr=errors, **options)
+        self.assertIn("Erreur inattendue pour Client 0: bogue", errors.getvalue())
+        run = ExtractionRun.objects.get()
+        self.assertEqual(run.status, ExtractionRun.STATUS_FINALIZED)
+        self.assertEqual(run.failed_client_count, 1)
+        status = ClientOdooStatus.objects.get(client=self.client_conf)
+        self.assertFalse(status.connection_successful)
+        self.assertEqual(status.last_error_message, "Erreur inattendue : bogue")
+        self.assertEqual(status.consecutive_failures, 1)
+
+
+
+class UnexpectedClientErrorTests(UnexpectedClientErrorMixin, TestCase):
+
+    def test_sequential_engine(self):
+        self.assert_run_finalized_with_failed_client()
+
+    def test_worker_pool(self):
+        self.assert_run_finalized_with_failed_client(workers=2)
+
+
+
+class AsyncUnexpectedClientErrorTests(UnexpectedClientErrorMixin, TransactionTestCase):
+    # Moteur asyncio : les écritures passent par le thread de sync_to_async, avec sa propre connexion
+
+    def test_async_engine(self):
+        self.assert_run_finalized_with_failed_client(engine='async')
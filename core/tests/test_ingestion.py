@@ -0,0 +1,121 @@
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.ingestion import IndicatorIngestor
+from core.leases import LeaseQueue, new_extraction_run, pending_client_ids, register_clients
+from core.management.commands.fetch_indicators import Command
+from core.models import ClientIncrementalState, ClientOdooStatus, ClientsOdoo, IndicateursHistoriques
+
+
+def create_clients(count):
+    return [ClientsOdoo.objects.create(
+        client_name=f"Client {i}", client_odoo_url=f"https://client{i}.odoo.com", client_odoo_db=f"db{i}",
+        client_odoo_api_user='api', client_odoo_encrypted_api_key='x') for i in range(count)]
+
+
+def state(value):
+    return {'watermarks': {'account.move': '2026-01-01 00:00:00'}, 'values': {'nb': value}, 'refreshed_at': {}}
+
+
+class IndicatorIngestorTests(TestCase):
+
+    def setUp(self):
+        self.clients = create_clients(2)
+        self.run = new_extraction_run()
+        self.ingestor = IndicatorIngestor(self.run, batch_size=3)
+
+    def buffer_client(self, client, successful=True, value='1'):
+        created = self.ingestor.add_status(
+            client, last_connection_attempt=timezone.now(), connection_successful=successful)
+        self.ingestor.add_indicator(client, 'nb', value, self.run.extraction_timestamp, '0', 'N/A')
+        self.ingestor.add_state(client, state(value))
+        return created
+
+    def test_flush_writes_rows_statuses_states_and_run_counters(self):
+        self.assertTrue(self.buffer_client(self.clients[0]))
+        self.buffer_client(self.clients[1], successful=False)
+        self.assertEqual(self.ingestor.flush(), (2, 2))
+        self.assertEqual(IndicateursHistoriques.objects.filter(run=self.run).count(), 2)
+        self.assertEqual(ClientOdooStatus.objects.count(), 2)
+        self.assertEqual(ClientIncrementalState.objects.get(client=self.clients[0]).indicator_values, {'nb': '1'})
+        self.run.refresh_from_db()
+        self.assertEqual((self.run.indicator_count, self.run.failed_client_count), (2, 1))
+        self.assertEqual(self.ingestor.flush(), (0, 0))
+
+    def test_second_flush_updates_statuses_and_states_in_place(self):
+        self.buffer_client(self.clients[0], successful=False)
+        self.ingestor.flush()
+        self.assertFalse(self.buffer_client(self.clients[0], value='2'))
+        self.ingestor.flush()
+        self.assertTrue(ClientOdooStatus.objects.get(client=self.clients[0]).connection_successful)
+        self.assertEqual(ClientIncrementalState.objects.get().indicator_values, {'nb': '2'})
+        self.assertEqual(IndicateursHistoriques.objects.filter(run=self.run).count(), 2)
+
+    def test_should_flush_at_batch_size(self):
+        for value in ('1', '2'):
+            self.ingestor.add_indicator(self.clients[0], value, value, self.run.extraction_timestamp, '0', 'N/A')
+        self.assertFalse(self.ingestor.should_flush())
+        self.ingestor.add_indicator(self.clients[0], '3', '3', self.run.extraction_timestamp, '0', 'N/A')
+        self.assertTrue(self.ingestor.should_flush())
+
+    def test_failed_flush_writes_nothing(self):
+        self.buffer_client(self.clients[0])
+        with mock.patch.object(IndicateursHistoriques.objects, 'bulk_create', side_effect=RuntimeError("disque plein")):
+            with self.assertRaises(RuntimeError):
+                self.ingestor.flush()
+        # Ni statut ni état d'extraction sans les indicateurs du client
+        self.assertFalse(ClientOdooStatus.objects.exists())
+        self.assertFalse(ClientIncrementalState.objects.exists())
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.indicator_count, 0)
+        self.assertEqual(self.ingestor.flush(), (0, 0))
+
+
+class FlushCheckpointTests(TestCase):
+    """Points de reprise (ExtractionLease.completed_at) écrits dans la transaction des indicateurs."""
+
+    def setUp(self):
+        self.clients = create_clients(2)
+        self.run = new_extraction_run()
+        register_clients(self.run, self.clients)
+        self.errors = StringIO()
+        self.command = Command(stdout=StringIO(), stderr=self.errors)
+        self.command._run = self.run
+        self.command._lease_queue = None
+        self.command._ingestor = IndicatorIngestor(self.run)
+        self.command._unflushed_clients = []
+
+    def buffer_clients(self):
+        for client in self.clients:
+            self.command._ingestor.add_status(client, last_connection_attempt=timezone.now(),
+                                              connection_successful=True)
+            self.command._ingestor.add_indicator(client, 'nb', '1', self.run.extraction_timestamp, '0', 'N/A')
+            self.command._unflushed_clients.append(client.pk)
+
+    def test_written_clients_are_completed(self):
+        self.buffer_clients()
+        self.command._flush_ingestor()
+        self.assertEqual(pending_client_ids(self.run), set())
+        self.assertEqual(IndicateursHistoriques.objects.filter(run=self.run).count(), 2)
+
+    def test_lost_batch_leaves_its_clients_pending(self):
+        self.buffer_clients()
+        with mock.patch('core.management.commands.fetch_indicators.complete_clients',
+                        side_effect=RuntimeError("verrou")):
+            self.command._flush_ingestor()
+        self.assertIn("Erreur lors de l'écriture groupée", self.errors.getvalue())
+        # Lot annulé en entier : ses clients seront repris, sans indicateurs en double
+        self.assertEqual(pending_client_ids(self.run), {client.pk for client in self.clients})
+        self.assertFalse(IndicateursHistoriques.objects.exists())
+        self.assertFalse(ClientOdooStatus.objects.exists())
+        self.assertEqual(self.command._unflushed_clients, [])
+
+    def test_lease_mode_completes_only_claimed_clients(self):
+        self.command._lease_queue = LeaseQueue(self.run, 'a', ttl=60)
+        claimed = self.command._lease_queue.claim(1)
+        self.buffer_clients()
+        self.command._flush_ingestor()
+        self.assertEqual(pending_client_ids(self.run), {client.pk for client in self.clients} - set(claimed))
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.jobs import ExtractionJobActive, JobProgress, enqueue_extraction_job, run_extraction_job
+from core.models import ClientsOdoo, ExtractionJob
+
+
+def create_client(name):
+    return ClientsOdoo.objects.create(
+        client_name=name, client_odoo_url="https://client.odoo.com", client_odoo_db='db',
+        client_odoo_api_user='api', client_odoo_encrypted_api_key='x')
+
+
+def client_result(successful, message=None):
+    return {'status': {'connection_successful': successful, 'last_error_message': message}}
+
+
+class JobProgressTests(TestCase):
+
+    def test_progress_is_keyed_by_client_id(self):
+        first, second, deferred = create_client("Dupont"), create_client("Durand"), create_client("Martin")
+        job = ExtractionJob.objects.create()
+        progress = JobProgress(job.pk)
+
+        progress.start([first, second], deferred=[deferred])
+        job.refresh_from_db()
+        self.assertEqual((job.total_clients, job.processed_clients), (3, 1))
+        self.assertEqual(job.client_progress[str(deferred.pk)]['status'], 'deferred')
+
+        progress.client_done(first, client_result(True))
+        # Client renommé pendant le job : son entrée est mise à jour, pas dupliquée
+        second.client_name = "Durand & Fils"
+        progress.client_done(second, client_result(False, "Échec d'authentification."))
+        job.refresh_from_db()
+        self.assertEqual(job.processed_clients, 3)
+        self.assertEqual(
+            {key: (entry['name'], entry['status'], entry['message']) for key, entry in job.client_progress.items()},
+            {str(first.pk): ("Dupont", 'ok', ''),
+             str(second.pk): ("Durand & Fils", 'error', "Échec d'authentification."),
+             str(deferred.pk): ("Martin", 'deferred', "Reporté : échecs consécutifs (backoff).")})
+
+
+class ExtractionJobLifecycleTests(TestCase):
+
+    def test_a_second_job_is_refused_while_one_is_active(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = enqueue_extraction_job()
+        self.assertEqual(len(callbacks), 1)
+        with self.assertRaises(ExtractionJobActive) as raised:
+            enqueue_extraction_job()
+        self.assertEqual(raised.exception.job, job)
+
+    @override_settings(EXTRACTION_JOB_STALE_AFTER=60)
+    def test_a_job_without_heartbeat_is_failed_before_a_new_one_is_queued(self):
+        stale = ExtractionJob.objects.create(
+            status=ExtractionJob.STATUS_RUNNING, heartbeat_at=timezone.now() - timedelta(minutes=5))
+        with self.captureOnCommitCallbacks():
+            job = enqueue_extraction_job()
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.is_active), (ExtractionJob.STATUS_FAILED, False))
+        self.assertEqual((job.status, job.is_active), (ExtractionJob.STATUS_QUEUED, True))
+
+    def run_job(self, job, command):
+        # Le thread d'arrière-plan ferme ses connexions : pas celle du test
+        with mock.patch('core.jobs.call_command', side_effect=command), mock.patch('core.jobs.connections'):
+            run_extraction_job(job.pk)
+        job.refresh_from_db()
+
+    def test_run_records_the_command_outcome(self):
+        job = ExtractionJob.objects.create()
+        self.run_job(job, lambda *args, stdout, **kwargs: stdout.write("Extraction terminée."))
+        self.assertEqual((job.status, job.is_active), (ExtractionJob.STATUS_SUCCEEDED, False))
+        self.assertIsNotNone(job.started_at)
+        self.assertIn("Extraction terminée.", job.output)
+
+        failed = ExtractionJob.objects.create()
+        self.run_job(failed, RuntimeError("base indisponible"))
+        self.assertEqual((failed.status, failed.is_active), (ExtractionJob.STATUS_FAILED, False))
+        self.assertEqual(failed.error_message, "base indisponible")
+
+    def test_a_job_already_started_is_not_run_again(self):
+        job = ExtractionJob.objects.create(status=ExtractionJob.STATUS_RUNNING)
+        command = mock.Mock()
+        self.run_job(job, command)
+        command.assert_not_called()
+        self.assertEqual(job.status, ExtractionJob.STATUS_RUNNING)
+
+
+class ExtractionJobStatusViewTests(TestCase):
+
+    def test_lists_clients_of_id_keyed_and_name_keyed_jobs(self):
+        staff = get_user_model().objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        first, second = create_client("durand"), create_client("Dupont")
+        job = ExtractionJob.objects.create(is_active=False, status=ExtractionJob.STATUS_SUCCEEDED)
+        progress = JobProgress(job.pk)
+        progress.start([first, second])
+        progress.client_done(first, client_result(True))
+        response = self.client.get(reverse('core:extraction_job_status', args=[job.pk]))
+        self.assertEqual([row['name'] for row in response.context['client_rows']], ["Dupont", "durand"])
+
+        legacy = ExtractionJob.objects.create(
+            is_active=False, status=ExtractionJob.STATUS_SUCCEEDED,
+            client_progress={"Martin": {'status': 'ok', 'message': ''}})
+        response = self.client.get(reverse('core:extraction_job_status', args=[legacy.pk]))
+        self.assertEqual([row['name'] for row in response.context['client_rows']], ["Martin"])
@@ -0,0 +1,124 @@
+import random
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.leases import (
+    LeaseQueue, active_extraction_runs, complete_clients, finalize_extraction_run, new_extraction_run, parse_shard, pending_client_ids,
+    register_clients, resumable_extraction_run, shard_clients,
+)
+from core.models import ClientOdooStatus, ClientsOdoo, ExtractionLease, ExtractionRun
+
+
+def create_clients(count):
+    return [ClientsOdoo.objects.create(
+        client_name=f"Client {i}", client_odoo_url=f"https://client{i}.odoo.com", client_odoo_db=f"db{i}",
+        client_odoo_api_user='api', client_odoo_encrypted_api_key='x') for i in range(count)]
+
+
+class ShardTests(SimpleTestCase):
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard('0/4'), (0, 4))
+        self.assertEqual(parse_shard('3/4'), (3, 4))
+        for value in ('4/4', '-1/2', '1/0', '1', 'a/b', None):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+    def test_shards_partition_the_clients_whatever_their_order(self):
+        clients = [ClientsOdoo(client_name=f"Client {i}") for i in range(10)]
+        shuffled = list(clients)
+        random.Random(4).shuffle(shuffled)
+        shards = [shard_clients(clients, index, 3) for index in range(3)]
+        self.assertEqual(sorted(c.pk for shard in shards for c in shard), sorted(c.pk for c in clients))
+        self.assertEqual([len(shard) for shard in shards], [4, 3, 3])
+        # Chaque processus lit les clients dans un ordre quelconque : les parts doivent être les mêmes
+        self.assertEqual([shard_clients(shuffled, index, 3) for index in range(3)], shards)
+
+
+class LeaseQueueTests(TestCase):
+
+    def setUp(self):
+        self.clients = create_clients(3)
+        self.run = new_extraction_run()
+        register_clients(self.run, self.clients)
+
+    def test_a_client_is_claimed_by_one_worker_only(self):
+        first, second = LeaseQueue(self.run, 'a', ttl=60), LeaseQueue(self.run, 'b', ttl=60)
+        claimed_first = first.claim(2)
+        claimed_second = second.claim(2)
+        self.assertEqual(len(claimed_first), 2)
+        self.assertEqual(len(claimed_second), 1)
+        self.assertFalse(set(claimed_first) & set(claimed_second))
+        self.assertEqual(second.claim(2), [])
+        self.assertEqual(first.live_holders(), 2)
+
+    def test_longest_clients_are_claimed_first(self):
+        ClientOdooStatus.objects.create(client=self.clients[0], latency_estimate=1.0)
+        ClientOdooStatus.objects.create(client=self.clients[1], latency_estimate=9.0)
+        # Client 2, sans historique, passe en tête
+        self.assertEqual(LeaseQueue(self.run, 'a').claim(3),
+                         [self.clients[2].pk, self.clients[1].pk, self.clients[0].pk])
+
+    def test_expired_lease_is_claimed_again(self):
+        stopped = LeaseQueue(self.run, 'stopped', ttl=60)
+        claimed = stopped.claim(3)
+        ExtractionLease.objects.filter(run=self.run).update(leased_until=timezone.now() - timedelta(seconds=1))
+        other = LeaseQueue(self.run, 'other', ttl=60)
+        self.assertEqual(sorted(other.claim(3), key=str), sorted(claimed, key=str))
+        self.assertEqual(other.live_holders(), 1)
+        # Le processus arrêté ne peut plus terminer des clients qu'il ne détient plus
+        stopped.complete(claimed)
+        self.assertEqual(pending_client_ids(self.run), set(claimed))
+        other.complete(claimed)
+        self.assertEqual(pending_client_ids(self.run), set())
+        self.assertTrue(finalize_extraction_run(self.run))
+
+    def test_run_is_finalized_only_when_every_client_is_completed(self):
+        complete_clients(self.run, [self.clients[0].pk, self.clients[1].pk])
+        self.assertFalse(finalize_extraction_run(self.run))
+        complete_clients(self.run, [self.clients[2].pk])
+        self.assertTrue(finalize_extraction_run(self.run))
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.status, ExtractionRun.STATUS_FINALIZED)
+        self.assertEqual(self.run.client_count, 3)
+
+
+class ResumableRunTests(TestCase):
+
+    def setUp(self):
+        self.run = new_extraction_run()
+        register_clients(self.run, create_clients(2))
+
+    def test_active_run_is_not_resumed(self):
+        self.assertIsNone(resumable_extraction_run())
+
+    def test_interrupted_run_is_resumed_once(self):
+        ExtractionRun.objects.filter(pk=self.run.pk).update(heartbeat_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(resumable_extraction_run(), self.run)
+        # Réclamée par la première reprise : une seconde reprise ne l'obtient pas
+        self.assertIsNone(resumable_extraction_run())
+
+    def test_run_key_resumes_an_active_run_at_once(self):
+        # Juste après un plantage, le signe de vie est encore récent : l'opérateur désigne l'exécution
+        self.assertEqual(list(active_extraction_runs()), [self.run])
+        self.assertEqual(resumable_extraction_run(self.run.run_key), self.run)
+        self.assertIsNone(resumable_extraction_run('inconnue'))
+        ExtractionRun.objects.filter(pk=self.run.pk).update(status=ExtractionRun.STATUS_FINALIZED)
+        self.assertIsNone(resumable_extraction_run(self.run.run_key))
+
+    def test_resume_fails_when_nothing_can_be_resumed(self):
+        with self.assertRaisesMessage(CommandError, self.run.run_key):
+            call_command('fetch_indicators', resume=True, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "aucune exécution non finalisée 'inconnue'"):
+            call_command('fetch_indicators', resume='inconnue', stdout=StringIO())
+        self.assertEqual(ExtractionRun.objects.count(), 1)
+
+    def test_run_with_a_live_lease_is_not_resumed(self):
+        ExtractionRun.objects.filter(pk=self.run.pk).update(heartbeat_at=timezone.now() - timedelta(days=1))
+        LeaseQueue(self.run, 'a', ttl=3600).claim(1)
+        self.assertIsNone(resumable_extraction_run())
@@ -0,0 +1,334 @@
+import asyncio
+import xmlrpc.client
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from django.core.management.color import no_style
+from django.test import SimpleTestCase
+
+from core.indicators import (
+    INDICATOR_REGISTRY, ClientOutput, ExtractionContext, IndicatorSpec, OdooCall, _run_wave, balances_by_prefix,
+    merge_calls, or_domains, plan_indicators, read_group_unavailable, run_plan, run_plan_async, stream_ledger_groups,
+)
+
+
+def make_ctx():
+    output = ClientOutput()
+    return ExtractionContext(SimpleNamespace(client_name="Client"), 2, output.stdout, output.stderr, no_style())
+
+
+def registry_specs(*names):
+    specs = {spec.name: spec for spec in INDICATOR_REGISTRY}
+    return [specs[name] for name in names]
+
+
+class FakeOdoo:
+    """Odoo simulé pour plan_indicators : société 1, journal de banque 10, comptes et écritures donnés."""
+
+    def __init__(self, accounts=(), groups=None, lines=(), read_group_error=None):
+        self.accounts = dict(accounts)  # ID -> code
+        self.groups = groups or {}  # champs agrégés (tuple) -> groupes read_group
+        self.lines = list(lines)
+        self.read_group_error = read_group_error
+        self.calls = []
+
+    def __call__(self, call):
+        self.calls.append(call)
+        if call.model == 'res.users' and call.method == 'read':
+            return [{'id': 2, 'company_id': [1, "Société"]}]
+        if call.model == 'account.account':
+            return [{'id': account_id, 'code': code} for account_id, code in self.accounts.items()]
+        if call.model == 'account.journal':
+            return [{'id': 10, 'type': 'bank'}]
+        if call.model == 'account.move.line' and call.method == 'read_group':
+            if self.read_group_error:
+                raise self.read_group_error
+            return self.groups[tuple(call.args[1])]
+        if call.model == 'account.move.line' and call.method == 'search_read':
+            last_id = call.args[0][-1][2]
+            page = [line for line in self.lines if line['id'] > last_id]
+            return page[:call.kwargs['limit']]
+        raise AssertionError(f"Appel inattendu : {call}")
+
+    def count(self, model, method):
+        return sum(1 for call in self.calls if (call.model, call.method) == (model, method))
+
+
+class RunPlanTests(SimpleTestCase):
+
+    def test_waves_are_sent_in_order_and_errors_returned_to_the_plan(self):
+        def plan():
+            first = yield [OdooCall('res.partner', 'search_count', [[]]), OdooCall('res.users', 'search_count', [[]])]
+            second = yield [OdooCall('account.move', 'search_count', [[]])]
+            return first, second
+
+        executed = []
+
+        def execute(call):
+            executed.append(call.model)
+            if call.model == 'res.users':
+                raise RuntimeError("refusé")
+            return len(executed)
+
+        first, second = run_plan(plan(), execute)
+        self.assertEqual(executed, ['res.partner', 'res.users', 'account.move'])
+        self.assertEqual(first[0], 1)
+        self.assertIsInstance(first[1], RuntimeError)
+        self.assertEqual(second, [3])
+
+    def test_async_engine_returns_the_same_results(self):
+        def plan():
+            results = yield [OdooCall('res.partner', 'search_count', [[]]), OdooCall('res.users', 'search_count', [[]])]
+            return results
+
+        async def execute(call):
+            if call.model == 'res.users':
+                raise RuntimeError("refusé")
+            return 7
+
+        results = asyncio.run(run_plan_async(plan(), execute))
+        self.assertEqual(results[0], 7)
+        self.assertIsInstance(results[1], RuntimeError)
+
+
+class MergeCallsTests(SimpleTestCase):
+
+    def test_search_read_calls_differing_only_by_fields_are_merged(self):
+        a = OdooCall('res.company', 'search_read', [[('id', '=', 1)]], {'fields': ['name', 'vat']})
+        b = OdooCall('res.company', 'search_read', [[('id', '=', 1)]], {'fields': ['vat', 'currency_id']})
+        merged = merge_calls([('a', a), ('b', b)])
+        self.assertEqual(len(merged), 1)
+        call, members = merged[0]
+        self.assertEqual(call.kwargs['fields'], ['name', 'vat', 'currency_id'])
+        self.assertEqual([spec for spec, _ in members], ['a', 'b'])
+
+    def test_identical_counts_are_deduplicated_and_different_domains_kept(self):
+        a = OdooCall('account.move', 'search_count', [[('state', '=', 'draft')]])
+        b = OdooCall('account.move', 'search_count', [[('state', '=', 'draft')]])
+        c = OdooCall('account.move', 'search_count', [[('state', '=', 'posted')]])
+        merged = merge_calls([('a', a), ('b', b), ('c', c)])
+        self.assertEqual([len(members) for _, members in merged], [2, 1])
+        self.assertIs(merged[0][0], a)
+
+    def test_or_domains_builds_a_prefix_notation_domain(self):
+        self.assertEqual(or_domains([[('code', '=like', '6%')]]), [('code', '=like', '6%')])
+        self.assertEqual(
+            or_domains([[('a', '=', 1), ('b', '=', 2)], [('c', '=', 3)]]),
+            ['|', '&', ('a', '=', 1), ('b', '=', 2), ('c', '=', 3)])
+
+
+class RunWaveTests(SimpleTestCase):
+
+    def test_failed_merged_call_is_replayed_per_indicator(self):
+        name = IndicatorSpec('nom', 'res.company', 'search_read', fields=['name'],
+                             aggregate=lambda records, ctx: records[0]['name'])
+        missing = IndicatorSpec('champ absent', 'res.company', 'search_read', fields=['x_missing'])
+        ctx, outcomes = make_ctx(), {}
+        calls = []
+
+        def execute(call):
+            calls.append(call.kwargs['fields'])
+            if 'x_missing' in call.kwargs['fields']:
+                raise xmlrpc.client.Fault(2, "Invalid field 'x_missing'")
+            return [{'name': 'Cabinet'}]
+
+        run_plan(_run_wave(ctx, [name, missing], outcomes), execute)
+        self.assertEqual(calls, [['name', 'x_missing'], ['name'], ['x_missing']])
+        self.assertEqual(outcomes['nom'], ('ok', 'Cabinet', None))
+        self.assertEqual(outcomes['champ absent'][0], 'error')
+        self.assertEqual(ctx.rpc_count, 3)
+
+
+def ledger_line(line_id, account_id, debit=0.0, credit=0.0):
+    return {'id': line_id, 'account_id': [account_id, f"{LEDGER_ACCOUNTS[account_id]} Compte"],
+            'debit': debit, 'credit': credit}
+
+
+class ReadGroupUnavailableTests(SimpleTestCase):
+
+    def test_only_unsupported_read_group_faults_trigger_the_fallback(self):
+        self.assertTrue(read_group_unavailable(xmlrpc.client.Fault(1, "NotImplementedError: read_group")))
+        self.assertFalse(read_group_unavailable(xmlrpc.client.Fault(3, "Access Denied")))
+        self.assertFalse(read_group_unavailable(
+            xmlrpc.client.Fault(4, "AccessError: not allowed to access read_group")))
+        self.assertFalse(read_group_unavailable(TimeoutError("timed out")))
+
+    def test_pivot_encaissement_is_streamed_when_read_group_is_unsupported(self):
+        odoo = FakeOdoo(
+            accounts={2: '478000'}, read_group_error=xmlrpc.client.Fault(1, "NotImplementedError: read_group"),
+            lines=[ledger_line(1, 2, debit=100.0), ledger_line(2, 2, credit=30.0), ledger_line(3, 2, debit=5.25)])
+        ctx = make_ctx()
+        with self.assertLogs('core.indicators', 'WARNING'):
+            run_plan(plan_indicators(ctx, registry_specs("pivot encaissement")), odoo)
+        self.assertEqual(odoo.count('account.move.line', 'search_read'), 1)
+        self.assertEqual(ctx.indicators["pivot encaissement"], "75.25")
+
+    def test_other_read_group_errors_are_not_followed_by_a_ledger_scan(self):
+        odoo = FakeOdoo(accounts={2: '478000'}, read_group_error=xmlrpc.client.Fault(3, "Access Denied"),
+                        lines=[ledger_line(1, 2, debit=100.0)])
+        ctx = make_ctx()
+        run_plan(plan_indicators(ctx, registry_specs("pivot encaissement")), odoo)
+        self.assertEqual(odoo.count('account.move.line', 'search_read'), 0)
+        self.assertIsNone(ctx.indicators["pivot encaissement"])
+
+    def test_streamed_groups_are_read_by_id_pages(self):
+        odoo = FakeOdoo(lines=[ledger_line(line_id, account_id, debit=10.0, credit=line_id)
+                               for line_id, account_id in ((1, 2), (2, 5), (3, 2), (4, 2), (5, 5))])
+        call = OdooCall('account.move.line', 'read_group',
+                        [[('move_id.state', '=', 'posted')], ['balance'], ['account_id']], {'lazy': False})
+        ctx = make_ctx()
+        groups = run_plan(stream_ledger_groups(ctx, call, chunk_size=2), odoo)
+        self.assertEqual([page.args[0][-1] for page in odoo.calls],
+                         [('id', '>', 0), ('id', '>', 2), ('id', '>', 4)])
+        self.assertEqual(ctx.rpc_count, 3)
+        self.assertEqual(
+            {group['account_id'][0]: (group['__count'], group['balance']) for group in groups},
+            {2: (3, 22.0), 5: (2, 13.0)})
+
+
+LEDGER_ACCOUNTS = {1: '471000', 2: '478000', 3: '401000', 4: '411000', 5: '580000'}
+LEDGER_INDICATORS = ("operations à qualifier", "paiements orphelins", "virements internes non soldés",
+                     "pivot encaissement", "solde virements internes")
+
+
+def ledger_group(account_id, count, **dimensions):
+    group = {'account_id': [account_id, f"{LEDGER_ACCOUNTS[account_id]} Compte"], '__count': count}
+    group.update({name: [value, name] if name.endswith('_id') else value for name, value in dimensions.items()})
+    return group
+
+
+class LedgerAggregationTests(SimpleTestCase):
+
+    def test_ledger_indicators_share_two_read_groups_filtered_by_account_ids(self):
+        odoo = FakeOdoo(accounts=LEDGER_ACCOUNTS, groups={
+            ('account_id',): [
+                ledger_group(1, 3, journal_id=10),
+                ledger_group(2, 2, journal_id=11),  # 478 : hors opérations à qualifier (47 à 475)
+                ledger_group(3, 4, journal_id=10),
+                ledger_group(4, 5, journal_id=11),  # hors journal de banque
+                ledger_group(5, 6, journal_id=11),
+            ],
+            ('balance',): [
+                ledger_group(2, 1, company_id=1, balance=150.5),
+                ledger_group(2, 1, company_id=2, balance=10.0),
+                ledger_group(5, 1, company_id=1, balance=-20.0),
+                ledger_group(5, 1, company_id=2, balance=99.0),
+            ],
+        })
+        ctx = make_ctx()
+        run_plan(plan_indicators(ctx, registry_specs(*LEDGER_INDICATORS)), odoo)
+
+        ledger_calls = {tuple(call.args[1]): call for call in odoo.calls if call.model == 'account.move.line'}
+        self.assertEqual(len(ledger_calls), 2)
+        self.assertEqual(odoo.count('account.move.line', 'read_group'), 2)
+        # Comptes filtrés par ID (pas de jointure sur account_id.code), dimensions ajoutées au regroupement
+        self.assertIn(('account_id', 'in', [1, 3, 4, 5]), ledger_calls[('account_id',)].args[0])
+        self.assertEqual(ledger_calls[('account_id',)].args[2], ['account_id', 'journal_id'])
+        self.assertIn(('account_id', 'in', [2, 5]), ledger_calls[('balance',)].args[0])
+        self.assertEqual(ledger_calls[('balance',)].args[2], ['account_id', 'company_id'])
+        self.assertEqual(
+            {name: ctx.indicators[name] for name in LEDGER_INDICATORS},
+            {"operations à qualifier": 3, "paiements orphelins": 4, "virements internes non soldés": 6,
+             "pivot encaissement": "160.50", "solde virements internes": "-20.00"})
+
+
+class PeriodBalanceTests(SimpleTestCase):
+
+    def test_provisional_result_comes_from_one_grouped_read_group(self):
+        odoo = FakeOdoo(accounts={11: '601000', 12: '641000', 13: '706000'}, groups={('balance',): [
+            {'account_id': [11, "601000 Achats"], 'balance': 400.0},
+            {'account_id': [12, "641000 Salaires"], 'balance': 600.0},
+            {'account_id': [13, "706000 Prestations"], 'balance': -1500.0},
+        ]})
+        ctx = make_ctx()
+        run_plan(plan_indicators(ctx, registry_specs("resultat_provisoire_annee_courante")), odoo)
+        [call] = [call for call in odoo.calls if call.model == 'account.move.line']
+        domain = call.args[0]
+        self.assertIn(('company_id', '=', 1), domain)
+        self.assertIn(('account_id', 'in', [11, 12, 13]), domain)
+        self.assertEqual([leaf[1] for leaf in domain if leaf[0] == 'date'], ['>=', '<='])
+        self.assertEqual(ctx.indicators["resultat_provisoire_annee_courante"], "500.00")
+
+    def test_balances_go_to_the_longest_matching_prefix(self):
+        groups = [{'account_id': [1, "601000 Achats"], 'balance': 10.0},
+                  {'account_id': [2, "607000 Marchandises"], 'balance': 5.0},
+                  {'account_id': [3, "512000 Banque"], 'balance': 99.0}]
+        self.assertEqual(balances_by_prefix(groups, ('6', '607')), {'6': 10.0, '607': 5.0})
+        self.assertEqual(balances_by_prefix(None, ('6', '7')), {'6': 0.0, '7': 0.0})
+
+
+class IncrementalPlanTests(SimpleTestCase):
+    users = IndicatorSpec('utilisateurs', 'res.users', 'search_count')
+    modules = IndicatorSpec('modules', 'ir.module.module', 'search_count')
+    logged_today = IndicatorSpec('connectés du jour', 'res.users', 'search_count',
+                                 domain=[('login_date', '>=', '2026-10-18')], volatile=True)
+    previous_state = {
+        'watermarks': {'res.users': [3, '2026-01-01 00:00:00'], 'ir.module.module': [10, '2026-01-01 00:00:00']},
+        'values': {'utilisateurs': 3, 'modules': 10, 'connectés du jour': 2},
+        'refreshed_at': {},
+    }
+
+    def run_incremental(self, watermark_errors=()):
+        ctx = make_ctx()
+        ctx.incremental = True
+        ctx.previous_state = self.previous_state
+        counts = []
+
+        def execute(call):
+            if call.method == 'read_group':
+                if call.model in watermark_errors:
+                    raise xmlrpc.client.Fault(1, "read_group refusé")
+                # Un module supprimé et un autre installé : même write_date maximale, nombre différent
+                return [{'__count': 3 if call.model == 'res.users' else 11, 'write_date': '2026-01-01 00:00:00'}]
+            counts.append((call.model, call.args[0]))
+            return {'res.users': 1 if call.args[0] else 3, 'ir.module.module': 11}[call.model]
+
+        run_plan(plan_indicators(ctx, [self.users, self.modules, self.logged_today]), execute)
+        return ctx, counts
+
+    def test_values_of_unchanged_models_are_carried_without_calls(self):
+        ctx, counts = self.run_incremental()
+        self.assertEqual(counts, [('ir.module.module', []), ('res.users', [('login_date', '>=', '2026-10-18')])])
+        self.assertEqual(ctx.indicators, {'utilisateurs': 3, 'modules': 11, 'connectés du jour': 1})
+        self.assertEqual(ctx.extraction_state['watermarks'], {
+            'res.users': [3, '2026-01-01 00:00:00'], 'ir.module.module': [11, '2026-01-01 00:00:00']})
+        self.assertEqual(ctx.extraction_state['values'], ctx.indicators)
+
+    def test_a_failed_watermark_counts_as_a_change(self):
+        ctx, counts = self.run_incremental(watermark_errors=('res.users',))
+        self.assertIn(('res.users', []), counts)
+        self.assertEqual(ctx.indicators['utilisateurs'], 3)
+        # Pas de watermark conservé : le modèle sera aussi relu à la prochaine exécution
+        self.assertNotIn('res.users', ctx.extraction_state['watermarks'])
+
+
+class RefreshCadenceTests(SimpleTestCase):
+
+    def test_only_indicators_due_for_refresh_are_called(self):
+        daily = timedelta(days=1)
+        specs = [IndicatorSpec('modules', 'ir.module.module', 'search_count', refresh_interval=daily),
+                 IndicatorSpec('utilisateurs', 'res.users', 'search_count', refresh_interval=daily),
+                 IndicatorSpec('factures', 'account.move', 'search_count')]
+        now = datetime.now(timezone.utc)
+        recent, old = (now - timedelta(hours=2)).isoformat(), (now - timedelta(days=2)).isoformat()
+        ctx = make_ctx()
+        ctx.scheduled = True
+        ctx.previous_state = {
+            'watermarks': {},
+            'values': {'modules': 10, 'utilisateurs': 3, 'factures': 40},
+            'refreshed_at': {'modules': recent, 'utilisateurs': old, 'factures': recent},
+        }
+        called = []
+
+        def execute(call):
+            called.append(call.model)
+            return {'res.users': 4, 'account.move': 42}[call.model]
+
+        run_plan(plan_indicators(ctx, specs), execute)
+        self.assertEqual(sorted(called), ['account.move', 'res.users'])
+        self.assertEqual(ctx.indicators, {'modules': 10, 'utilisateurs': 4, 'factures': 42})
+        # La valeur reportée garde sa date de calcul, les autres sont datées de cette exécution
+        refreshed_at = ctx.extraction_state['refreshed_at']
+        self.assertEqual(refreshed_at['modules'], recent)
+        self.assertGreater(refreshed_at['utilisateurs'], recent)
+        self.assertGreater(refreshed_at['factures'], recent)
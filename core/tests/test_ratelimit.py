@@ -0,0 +1,32 @@
+from django.test import SimpleTestCase
+
+from core.ratelimit import HostLimiterRegistry, odoo_host
+
+RULES = {'*.odoo.com': {'rate': 8, 'burst': 4, 'max_in_flight': 4}, '*': {'rate': 0, 'max_in_flight': 0}}
+
+
+class HostLimiterRegistryTests(SimpleTestCase):
+
+    def test_clients_on_the_same_host_share_a_limiter(self):
+        registry = HostLimiterRegistry(RULES, {'rate': 2})
+        self.assertEqual(odoo_host('https://Client1.odoo.com/odoo'), 'client1.odoo.com')
+        self.assertIs(registry.for_url('https://a.odoo.com'), registry.for_url('https://a.odoo.com/web'))
+        self.assertIsNot(registry.for_url('https://a.odoo.com'), registry.for_url('https://b.odoo.com'))
+        self.assertEqual(registry.for_url('https://erp.example.org').rate, 0)
+        self.assertEqual(registry.firm().rate, 2)
+
+    def test_share_divides_the_budget_between_processes(self):
+        registry = HostLimiterRegistry(RULES, {}, share=2)
+        limiter = registry.for_url('https://a.odoo.com')
+        self.assertEqual((limiter.rate, limiter.burst, limiter.max_in_flight), (4, 2, 2))
+
+    def test_set_share_reconfigures_existing_limiters(self):
+        registry = HostLimiterRegistry(RULES, {})
+        limiter = registry.for_url('https://a.odoo.com')
+        registry.set_share(4)
+        self.assertEqual((limiter.rate, limiter.burst, limiter.max_in_flight), (2, 1, 1))
+        registry.set_share(1)
+        self.assertEqual((limiter.rate, limiter.burst, limiter.max_in_flight), (8, 4, 4))
+        with limiter.slot():
+            pass
+        self.assertEqual(limiter.calls, 1)
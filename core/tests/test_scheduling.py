@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from core.scheduling import estimated_durations, longest_first, lpt_makespan, update_latency_estimate
+
+
+def client(pk, name):
+    return SimpleNamespace(pk=pk, client_name=name)
+
+
+class LongestFirstTests(SimpleTestCase):
+
+    def test_clients_are_ordered_by_decreasing_estimate_then_name(self):
+        clients = [client(1, 'Alpha'), client(2, 'Bravo'), client(3, 'Charlie'), client(4, 'Delta')]
+        ordered = longest_first(clients, {1: 2.0, 2: 9.0, 3: 2.0, 4: 5.0})
+        self.assertEqual([c.client_name for c in ordered], ['Bravo', 'Delta', 'Alpha', 'Charlie'])
+
+    def test_clients_without_history_get_the_mean_estimate(self):
+        clients = [client(1, 'Alpha'), client(2, 'Bravo'), client(3, 'Charlie')]
+        self.assertEqual(estimated_durations(clients, {1: 2.0, 3: 6.0}), [2.0, 4.0, 6.0])
+        self.assertEqual(estimated_durations(clients, {}), [0.0, 0.0, 0.0])
+
+    def test_latency_estimate_is_an_exponential_moving_average(self):
+        self.assertEqual(update_latency_estimate(None, 8.0, 0.3), 8.0)
+        self.assertAlmostEqual(update_latency_estimate(10.0, 20.0, 0.3), 13.0)
+
+
+class LptMakespanTests(SimpleTestCase):
+
+    def test_each_duration_goes_to_the_first_free_worker(self):
+        self.assertEqual(lpt_makespan([7, 5, 4, 3, 1], 2), 10)
+        self.assertEqual(lpt_makespan([1, 3, 4, 5, 7], 2), 12)
+
+    def test_single_worker_and_empty_run(self):
+        self.assertEqual(lpt_makespan([3, 2, 1], 1), 6)
+        self.assertEqual(lpt_makespan([], 4), 0)
+        self.assertEqual(lpt_makespan([2, 1], 8), 2)
@@ -0,0 +1,71 @@
+import xmlrpc.client
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase
+
+from core.indicators import OdooCall
+from core.management.commands.fetch_indicators import Command
+from core.utils import get_cached_odoo_session, open_odoo_session, store_odoo_session
+
+ARGS = ('https://client.odoo.com', 'db', 'api', 'clé')
+
+
+def fake_proxy(uid=5):
+    proxy = mock.Mock()
+    proxy.version.return_value = {'server_version': '17.0'}
+    proxy.authenticate.return_value = uid
+    proxy.execute_kw.return_value = []
+    return proxy
+
+
+class OpenOdooSessionTests(TestCase):
+
+    def test_cache_is_used_only_on_request(self):
+        store_odoo_session(*ARGS, 9, '17.0')
+        with mock.patch('core.utils.odoo_proxy', return_value=fake_proxy()) as odoo_proxy:
+            uid, _, _, version, error, from_cache = open_odoo_session(*ARGS, use_session_cache=True)
+            self.assertEqual((uid, version, error, from_cache), (9, '17.0', None, True))
+            odoo_proxy.return_value.authenticate.assert_not_called()
+            # Par défaut (synchronisation des collaborateurs, benchmark...) : authentification complète
+            uid, _, _, _, _, from_cache = open_odoo_session(*ARGS)
+            self.assertEqual((uid, from_cache), (5, False))
+        self.assertEqual(get_cached_odoo_session(*ARGS), (5, '17.0'))
+
+    def test_store_session_false_leaves_the_cache_to_the_caller(self):
+        with mock.patch('core.utils.odoo_proxy', return_value=fake_proxy()):
+            open_odoo_session(*ARGS, store_session=False)
+        self.assertIsNone(get_cached_odoo_session(*ARGS))
+
+
+class SessionRenewalTests(TestCase):
+    """fetch_indicators : une session en cache refusée par Odoo est renouvelée, le cache mis à jour au thread principal."""
+
+    def setUp(self):
+        store_odoo_session(*ARGS, 9, '17.0')
+        self.command = Command(stdout=StringIO(), stderr=StringIO())
+        self.stale_proxy = mock.Mock()
+        self.stale_proxy.execute_kw.side_effect = xmlrpc.client.Fault(3, "Access Denied")
+        self.session = self.command._new_session(9, self.stale_proxy, verified=False)
+        self.call = OdooCall('res.partner', 'search_count', [[]])
+
+    def test_refused_session_is_renewed_and_the_call_replayed(self):
+        fresh_proxy = mock.Mock()
+        fresh_proxy.execute_kw.return_value = 12
+        with mock.patch('core.management.commands.fetch_indicators.connect_odoo',
+                        return_value=(7, None, fresh_proxy, '17.0', None)):
+            self.assertEqual(self.command._execute_with_session(self.session, ARGS, self.call, 'Client'), 12)
+        self.assertEqual((self.session['uid'], self.session['verified']), (7, True))
+        # Rien n'est écrit par le worker : le thread principal applique la mise à jour
+        self.assertEqual(get_cached_odoo_session(*ARGS), (9, '17.0'))
+        self.command._apply_session_cache(self.session.pop('cache_update'))
+        self.assertEqual(get_cached_odoo_session(*ARGS), (7, '17.0'))
+
+    def test_revoked_key_invalidates_the_cached_session(self):
+        with mock.patch('core.management.commands.fetch_indicators.connect_odoo',
+                        return_value=(None, None, None, '17.0', "Échec de l'authentification")):
+            with self.assertRaises(xmlrpc.client.Fault):
+                self.command._execute_with_session(self.session, ARGS, self.call, 'Client')
+        self.assertEqual(self.session['auth_error'], "Échec de l'authentification")
+        self.command._apply_session_cache(self.session.pop('cache_update'))
+        self.assertIsNone(get_cached_odoo_session(*ARGS))
@@ -8,5 +8,7 @@ urlpatterns = [
     path('dashboard/', views.dashboard_view, name='dashboard'),
     # --- NOUVELLE URL AJOUTÉE ---
     path('trigger-fetch-indicators/', views.trigger_fetch_indicators_view, name='trigger_fetch_indicators'),
+    path('extraction/', views.extraction_job_status_view, name='extraction_job_latest'),
+    path('extraction/<int:job_id>/', views.extraction_job_status_view, name='extraction_job_status'),
     # --- FIN NOUVELLE URL ---
 ]
@@ -1,115 +1,614 @@
 # core/utils.py
 import xmlrpc.client
+import http.client
+import gzip
+import itertools
+import json
 import logging
 import base64
+import hashlib
+import random
+import threading
+from datetime import timedelta
+import urllib.parse
+from collections import defaultdict
+from contextlib import contextmanager
 from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Min
+from django.utils import timezone
 from cryptography.fernet import Fernet, InvalidToken
 
-from .models import ConfigurationCabinet
+from .models import (
+    ConfigurationCabinet, OdooSessionCache, CollaborateurCabinet, ClientReferenceCache,
+    OdooCapabilityCache, ClientIncrementalState, ClientOdooStatus,
+)
 
 logger = logging.getLogger(__name__)
 
-def connect_odoo(url, db, username, password):
+class OdooConnectionPool:
     """
-    Tente de se connecter à Odoo.
-    Retourne uid, common_proxy, object_proxy, full_version_str, error_message.
+    Connexions HTTP/1.1 keep-alive inactives, par (schéma, hôte), partagées par tous les proxies XML-RPC.
+    Les clients hébergés sur un même hôte (*.odoo.com) réutilisent ainsi les connexions TCP/TLS déjà ouvertes.
+    """
+
+    def __init__(self, max_idle_per_host=10):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            return idle.pop() if idle else None
+
+    def release(self, key, connection):
+        with self._lock:
+            idle = self._idle[key]
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def clear(self):
+        with self._lock:
+            idle_connections = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for connection in idle_connections:
+            connection.close()
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    global _connection_pool
+    with _connection_pool_lock:
+        if _connection_pool is None:
+            _connection_pool = OdooConnectionPool(settings.ODOO_RPC_MAX_IDLE_PER_HOST)
+        return _connection_pool
+
+
+def _open_connection(use_https, host, connect_timeout, timeout, context=None, **x509):
+    """Ouvre une connexion HTTP(S) : délai connect_timeout pour l'établissement, puis timeout par réponse."""
+    if use_https:
+        connection = http.client.HTTPSConnection(host, None, context=context, timeout=connect_timeout, **x509)
+    else:
+        connection = http.client.HTTPConnection(host, timeout=connect_timeout)
+    connection.connect()
+    connection.sock.settimeout(timeout)
+    return connection
+
+
+class PooledTransport(xmlrpc.client.SafeTransport):
+    """
+    Transport XML-RPC adossé à OdooConnectionPool : la connexion est empruntée au pool pour chaque appel
+    puis rendue, au lieu d'une connexion par ServerProxy. Réponses gzip acceptées (Accept-Encoding),
+    délais de connexion et de réponse configurables (ODOO_RPC_CONNECT_TIMEOUT, ODOO_RPC_TIMEOUT).
+    Une connexion keep-alive fermée entre-temps par le serveur est rejouée une fois par Transport.request.
+    """
+
+    def __init__(self, use_https, pool=None, connect_timeout=None, timeout=None):
+        super().__init__()
+        self._use_https = use_https
+        self._pool = pool or get_connection_pool()
+        self._connect_timeout = connect_timeout if connect_timeout is not None else settings.ODOO_RPC_CONNECT_TIMEOUT
+        self._timeout = timeout if timeout is not None else settings.ODOO_RPC_TIMEOUT
+
+    def _pool_key(self, host):
+        return ('https' if self._use_https else 'http'), host
+
+    def make_connection(self, host):
+        if self._connection[1]:
+            return self._connection[1]
+        connection = self._pool.acquire(self._pool_key(host))
+        if connection is None:
+            chost, self._extra_headers, x509 = self.get_host_info(host)
+            connection = _open_connection(self._use_https, chost, self._connect_timeout, self._timeout,
+                                          context=self.context, **(x509 or {}))
+        self._connection = host, connection
+        return connection
+
+    def single_request(self, host, handler, request_body, verbose=False):
+        try:
+            result = super().single_request(host, handler, request_body, verbose)
+        except xmlrpc.client.Fault:
+            # Réponse complète reçue : la connexion reste utilisable
+            self._release()
+            raise
+        except Exception:
+            self.close()
+            raise
+        self._release()
+        return result
+
+    def _release(self):
+        host, connection = self._connection
+        self._connection = None, None
+        if connection is not None:
+            self._pool.release(self._pool_key(host), connection)
+
+
+def odoo_server_proxy(url, service):
+    """ServerProxy sur /xmlrpc/2/<service> utilisant le transport partagé (keep-alive, gzip, délais)."""
+    endpoint = f'{url}/xmlrpc/2/{service}'
+    return xmlrpc.client.ServerProxy(endpoint, transport=PooledTransport(endpoint.startswith('https:')))
+
+
+# Connexions sur lesquelles une requête peut être rejouée une fois (keep-alive fermé par le serveur)
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, ConnectionAbortedError,
+                            BrokenPipeError)
+
+
+def odoo_http_post(url, path, body, content_type):
+    """
+    POST brut vers l'Odoo `url` (connexions du pool partagé, gzip accepté). Retourne le corps décompressé.
+    Lève xmlrpc.client.ProtocolError si le statut HTTP n'est pas 200.
+    """
+    parts = urllib.parse.urlsplit(url)
+    use_https = parts.scheme == 'https'
+    key = parts.scheme, parts.netloc
+    endpoint = parts.path.rstrip('/') + path
+    pool = get_connection_pool()
+    headers = {'Content-Type': content_type, 'Accept-Encoding': 'gzip'}
+    for attempt in (0, 1):
+        connection = pool.acquire(key)
+        if connection is None:
+            connection = _open_connection(use_https, parts.netloc, settings.ODOO_RPC_CONNECT_TIMEOUT,
+                                          settings.ODOO_RPC_TIMEOUT)
+        try:
+            connection.request('POST', endpoint, body, headers)
+            response = connection.getresponse()
+            data = response.read()
+        except _STALE_CONNECTION_ERRORS:
+            connection.close()
+            if attempt:
+                raise
+            continue
+        except Exception:
+            connection.close()
+            raise
+        break
+    if response.will_close:
+        connection.close()
+    else:
+        pool.release(key, connection)
+    if response.status != 200:
+        raise xmlrpc.client.ProtocolError(url + path, response.status, response.reason, dict(response.getheaders()))
+    if response.getheader('Content-Encoding', '') == 'gzip':
+        data = gzip.decompress(data)
+    return data
+
+
+def jsonrpc_payload(service, method, args, request_id=None):
+    """Corps d'une requête /jsonrpc : même service, méthode et arguments que l'appel XML-RPC équivalent."""
+    return json.dumps({
+        'jsonrpc': '2.0', 'method': 'call', 'id': request_id,
+        'params': {'service': service, 'method': method, 'args': list(args)},
+    }).encode('utf-8')
+
+
+def jsonrpc_result(response_body):
+    """
+    Décode une réponse /jsonrpc. Une erreur Odoo est relevée en xmlrpc.client.Fault, comme avec XML-RPC,
+    pour que les appelants n'aient qu'un type d'exception à traiter.
+    """
+    response = json.loads(response_body)
+    error = response.get('error')
+    if error:
+        data = error.get('data') or {}
+        raise xmlrpc.client.Fault(error.get('code', 1), data.get('message') or error.get('message', ''))
+    return response.get('result')
+
+
+class JsonRpcProxy:
+    """
+    Équivalent JSON-RPC (/jsonrpc) d'un ServerProxy sur /xmlrpc/2/<service> : mêmes méthodes
+    (version, authenticate, execute_kw...), mêmes exceptions (xmlrpc.client.Fault).
+    Le JSON est plus compact et bien plus rapide à décoder que le XML-RPC, surtout pour les search_read.
+    """
+
+    _request_ids = itertools.count(1)
+
+    def __init__(self, url, service):
+        self._url = url
+        self._service = service
+
+    def call(self, method, *args):
+        body = jsonrpc_payload(self._service, method, args, next(self._request_ids))
+        return jsonrpc_result(odoo_http_post(self._url, '/jsonrpc', body, 'application/json'))
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+        return lambda *args: self.call(method, *args)
+
+
+# Protocoles d'appel Odoo : 'xmlrpc' (/xmlrpc/2/<service>) ou 'jsonrpc' (/jsonrpc)
+RPC_PROTOCOLS = ('xmlrpc', 'jsonrpc')
+
+
+def resolve_rpc_protocol(protocol=None):
+    """Protocole effectif : celui demandé (ex. ClientsOdoo.odoo_rpc_protocol), sinon ODOO_RPC_PROTOCOL."""
+    protocol = protocol or settings.ODOO_RPC_PROTOCOL
+    if protocol not in RPC_PROTOCOLS:
+        raise ValueError(f"Protocole RPC Odoo inconnu : {protocol!r} (attendu : {', '.join(RPC_PROTOCOLS)}).")
+    return protocol
+
+
+def odoo_proxy(url, service, protocol=None):
+    """Proxy Odoo pour `service` ('common' ou 'object') dans le protocole demandé (ou global)."""
+    if resolve_rpc_protocol(protocol) == 'jsonrpc':
+        return JsonRpcProxy(url, service)
+    return odoo_server_proxy(url, service)
+
+
+def version_from_common_info(version_info_dict, url=None):
+    """
+    Déduit la version affichée à partir de la réponse de common.version().
+    Retourne "Inconnue" si ni server_version ni server_serie ne sont renseignés.
+    """
+    full_version_str = "Inconnue"
+    logger.info(f"Odoo Server Info Dict (common.version): {version_info_dict} (URL: {url})")
+
+    # Première tentative avec server_version ou server_serie
+    server_version_api = version_info_dict.get('server_version')
+    server_serie_api = version_info_dict.get('server_serie')
+
+    if server_version_api:
+        full_version_str = server_version_api
+        # Vérifier si c'est une version SaaS avec un format comme "17.0+e-saas~17.3+e"
+        if "saas~" in server_version_api:
+            try:
+                saas_part = server_version_api.split('saas~')[1].split('+')[0]
+                if saas_part: # ex: "17.3"
+                     # Vérifier si saas_part est un format X.Y valide
+                    if len(saas_part.split('.')) >= 2:
+                        full_version_str = saas_part
+                        logger.info(f"Version SaaS détectée et formatée: {full_version_str}")
+            except IndexError:
+                logger.warning(f"Format saas~ inattendu dans server_version: {server_version_api}")
+
+
+    elif server_serie_api:
+        full_version_str = server_serie_api
+    return full_version_str
+
+
+# Deuxième tentative : affiner la version avec ir.module.module pour 'base'
+BASE_MODULE_VERSION_DOMAIN = [('name', '=', 'base')]
+BASE_MODULE_VERSION_OPTIONS = {'fields': ['latest_version'], 'limit': 1}
+
+
+def refine_version_with_base_module(full_version_str, base_module_data):
+    """Affine la version obtenue via common.version() avec le latest_version du module 'base'."""
+    if base_module_data and base_module_data[0].get('latest_version'):
+        module_latest_version = base_module_data[0]['latest_version']
+        logger.info(f"Version du module 'base' (latest_version): {module_latest_version}")
+        # Ex: "17.0.1.2.0" ou "17.0.saas~17.3.1"
+        # Si server_version contenait déjà une version SaaS plus précise (ex: 17.3), on la garde.
+        # Sinon, on essaie de formater module_latest_version.
+        if not ("saas~" in full_version_str and len(full_version_str.split('.')) >= 2 and full_version_str.split('.')[0] == module_latest_version.split('.')[0]):
+            if module_latest_version:
+                # Si module_latest_version contient "saas~", extraire cette partie
+                if "saas~" in module_latest_version:
+                    try:
+                        saas_part_module = module_latest_version.split('saas~')[1].split('.')[0] + '.' + module_latest_version.split('saas~')[1].split('.')[1]
+                        if len(saas_part_module.split('.')) >= 2: # Assure X.Y
+                            full_version_str = saas_part_module
+                            logger.info(f"Version SaaS (module base) formatée: {full_version_str}")
+                    except IndexError:
+                        full_version_str = module_latest_version # Fallback au latest_version complet
+                else:
+                    # Pour les versions comme "17.0.1.0.0", on pourrait prendre "17.0.1"
+                    parts = module_latest_version.split('.')
+                    if len(parts) >= 2:
+                        formatted_module_version = f"{parts[0]}.{parts[1]}"
+                        if len(parts) > 2 and parts[2] != '0': # Ajoute le troisième segment s'il n'est pas 0
+                            formatted_module_version += f".{parts[2]}"
+                        full_version_str = formatted_module_version
+                        logger.info(f"Version module base formatée: {full_version_str}")
+                    else:
+                        full_version_str = module_latest_version # Fallback
+    return full_version_str
+
+
+# --- Transactions d'écriture de l'extraction ---
+
+@contextmanager
+def write_transaction():
+    """
+    transaction.atomic() des écritures de fetch_indicators. Sur SQLite, le verrou d'écriture est pris dès le début
+    (BEGIN IMMEDIATE) : plusieurs processus (--shard, --lease) attendent ce verrou (OPTIONS timeout) au lieu
+    d'échouer en « database is locked » après avoir lu. Les autres transactions gardent le mode par défaut.
+    """
+    connection = transaction.get_connection()
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic():
+            yield
+        return
+    previous_mode = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic():
+            connection.transaction_mode = previous_mode
+            yield
+    finally:
+        connection.transaction_mode = previous_mode
+
+
+# --- Cache des sessions Odoo ---
+# Code de faute XML-RPC d'Odoo pour AccessDenied (odoo.service.wsgi_server.RPC_FAULT_CODE_ACCESS_DENIED)
+ODOO_ACCESS_DENIED_FAULT_CODE = 3
+
+
+def _session_cache_key(url, db, username, password):
+    # La clé API entre dans l'empreinte : la changer invalide la session en cache
+    return hashlib.sha256(f"{url}|{db}|{username}|{password}".encode('utf-8')).hexdigest()
+
+
+def get_cached_odoo_session(url, db, username, password):
+    """Retourne (uid, version) de la session en cache si elle existe et n'a pas expiré, sinon None."""
+    ttl = settings.ODOO_SESSION_CACHE_TTL
+    if ttl <= 0:
+        return None
+    entry = OdooSessionCache.objects.filter(
+        cache_key=_session_cache_key(url, db, username, password),
+        cached_at__gte=timezone.now() - timedelta(seconds=ttl)
+    ).first()
+    if not entry:
+        return None
+    session_json = decrypt_value(entry.encrypted_session)
+    if not session_json:
+        return None
+    try:
+        session = json.loads(session_json)
+        return int(session['uid']), session['version']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def store_odoo_session(url, db, username, password, uid, full_version_str):
+    if settings.ODOO_SESSION_CACHE_TTL <= 0:
+        return
+    try:
+        OdooSessionCache.objects.update_or_create(
+            cache_key=_session_cache_key(url, db, username, password),
+            defaults={
+                'encrypted_session': encrypt_value(json.dumps({'uid': uid, 'version': full_version_str})),
+                'cached_at': timezone.now(),
+            }
+        )
+    except Exception as e:
+        logger.warning(f"Impossible de mettre en cache la session Odoo ({url}): {e}")
+
+
+def invalidate_odoo_session(url, db, username, password):
+    OdooSessionCache.objects.filter(cache_key=_session_cache_key(url, db, username, password)).delete()
+
+
+# --- Cache des références Odoo des clients ---
+
+def get_cached_client_references(client):
+    """
+    Retourne les références en cache du client (voir ExtractionContext.references), ou None si elles
+    n'existent pas ou ont expiré (CLIENT_REFERENCE_CACHE_TTL).
+    """
+    ttl = settings.CLIENT_REFERENCE_CACHE_TTL
+    if ttl <= 0:
+        return None
+    entry = ClientReferenceCache.objects.filter(
+        client=client, cached_at__gte=timezone.now() - timedelta(seconds=ttl)
+    ).first()
+    if not entry:
+        return None
+    return {
+        'company_id': entry.company_id,
+        'journals': entry.journal_ids,
+        'account_prefixes': entry.account_prefixes,
+        # Les clés JSON sont des chaînes : on retrouve les IDs entiers d'Odoo
+        'accounts': {int(account_id): code for account_id, code in entry.account_codes.items()},
+    }
+
+
+def store_client_references(client, references):
+    if settings.CLIENT_REFERENCE_CACHE_TTL <= 0:
+        return
+    try:
+        ClientReferenceCache.objects.update_or_create(
+            client=client,
+            defaults={
+                'company_id': references['company_id'],
+                'journal_ids': references['journals'],
+                'account_prefixes': references['account_prefixes'],
+                'account_codes': references['accounts'],
+                'cached_at': timezone.now(),
+            }
+        )
+    except Exception as e:
+        logger.warning(f"Impossible de mettre en cache les références Odoo de {client.client_name}: {e}")
+
+
+def invalidate_client_references(client):
+    ClientReferenceCache.objects.filter(client=client).delete()
+
+
+# --- État d'extraction (cadences, mode incrémental) ---
+
+def get_incremental_state(client):
+    """
+    Retourne l'état d'extraction du client ({'watermarks': ..., 'values': ..., 'refreshed_at': ...}),
+    ou None s'il n'existe pas.
+    """
+    entry = ClientIncrementalState.objects.filter(client=client).first()
+    if not entry:
+        return None
+    return {'watermarks': entry.watermarks, 'values': entry.indicator_values, 'refreshed_at': entry.refreshed_at}
+
+
+# --- Backoff des clients en échec ---
+
+def get_client_backoff():
+    """Retourne {client_id: (échecs consécutifs, prochaine tentative ou None)} pour tous les clients ayant un statut."""
+    return {
+        client_id: (failures, next_attempt_at)
+        for client_id, failures, next_attempt_at in ClientOdooStatus.objects.values_list(
+            'client_id', 'consecutive_failures', 'next_attempt_at')
+    }
+
+
+def get_client_latency_estimates():
+    """Retourne {client_id: durée d'extraction estimée en secondes} pour les clients ayant un historique."""
+    return dict(ClientOdooStatus.objects.filter(latency_estimate__isnull=False).values_list(
+        'client_id', 'latency_estimate'))
+
+
+def client_backoff_delay(failures):
+    """
+    Délai avant de retenter un client après `failures` échecs consécutifs : ODOO_CLIENT_BACKOFF_BASE doublé à
+    chaque échec, plafonné à ODOO_CLIENT_BACKOFF_MAX, dont la seconde moitié est tirée au hasard (jitter) pour que
+    des clients tombés ensemble (même hôte) ne soient pas retentés ensemble.
+    """
+    base = settings.ODOO_CLIENT_BACKOFF_BASE
+    if base <= 0 or failures <= 0:
+        return timedelta(0)
+    delay = min(base * 2 ** (failures - 1), settings.ODOO_CLIENT_BACKOFF_MAX)
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def reset_client_backoff(client):
+    """Rend le client éligible dès la prochaine exécution (par exemple après correction de sa configuration)."""
+    ClientOdooStatus.objects.filter(client=client).update(consecutive_failures=0, next_attempt_at=None)
+
+
+# --- Cache des capacités des bases Odoo ---
+
+def get_cached_capabilities(url, db, version):
+    """
+    Retourne les capacités sondées de la base ({'models': ..., 'fields': ...}, voir OdooCapabilities),
+    ou None si elles n'existent pas, ont expiré (ODOO_CAPABILITY_CACHE_TTL) ou datent d'une autre version.
+    """
+    ttl = settings.ODOO_CAPABILITY_CACHE_TTL
+    if ttl <= 0 or not version or version == "Inconnue":
+        return None
+    entry = OdooCapabilityCache.objects.filter(
+        odoo_url=url, odoo_db=db, odoo_version=version,
+        probed_at__gte=timezone.now() - timedelta(seconds=ttl)
+    ).first()
+    if not entry:
+        return None
+    return {'models': entry.available_models, 'fields': entry.available_fields}
+
+
+def store_capabilities(url, db, version, capabilities):
+    if settings.ODOO_CAPABILITY_CACHE_TTL <= 0 or not version or version == "Inconnue":
+        return
+    try:
+        OdooCapabilityCache.objects.update_or_create(
+            odoo_url=url, odoo_db=db,
+            defaults={
+                'odoo_version': version,
+                'available_models': capabilities['models'],
+                'available_fields': capabilities['fields'],
+                'probed_at': timezone.now(),
+            }
+        )
+    except Exception as e:
+        logger.warning(f"Impossible de mettre en cache les capacités Odoo ({db}@{url}): {e}")
+
+
+def is_auth_fault(error):
+    """Vrai si l'erreur est un refus d'authentification d'Odoo (session en cache périmée, clé révoquée...)."""
+    if not isinstance(error, xmlrpc.client.Fault):
+        return False
+    fault_string = str(error.faultString).lower()
+    return (error.faultCode == ODOO_ACCESS_DENIED_FAULT_CODE
+            or 'access denied' in fault_string or 'accessdenied' in fault_string)
+
+
+# Début du message d'erreur de connect_odoo quand Odoo n'a pas répondu dans ODOO_RPC_TIMEOUT
+ODOO_TIMEOUT_ERROR_PREFIX = "Délai de réponse du serveur Odoo dépassé"
+
+
+def open_odoo_session(url, db, username, password, protocol=None, use_session_cache=False, store_session=True):
+    """
+    Tente de se connecter à Odoo, en XML-RPC ou en JSON-RPC selon `protocol` (par défaut ODOO_RPC_PROTOCOL).
+    Si une session valide est en cache (use_session_cache), aucun appel n'est fait : uid et version en proviennent,
+    sans preuve que la clé API est toujours acceptée (from_cache, à vérifier au premier appel). Réservé aux
+    appelants qui invalident le cache et se ré-authentifient sur un refus d'Odoo (fetch_indicators).
+    store_session=False laisse à l'appelant l'enregistrement de la nouvelle session (depuis un worker, par exemple).
+    Retourne uid, common_proxy, object_proxy, full_version_str, error_message, from_cache.
     """
     error_message = None
     full_version_str = "Inconnue" # Valeur par défaut
-    server_version_api = None # Pour stocker la version de common.version()
 
     try:
-        common_proxy = xmlrpc.client.ServerProxy(f'{url}/xmlrpc/2/common')
+        if use_session_cache:
+            try:
+                cached_session = get_cached_odoo_session(url, db, username, password)
+            except Exception as e:
+                logger.warning(f"Lecture du cache de session Odoo impossible ({url}): {e}")
+                cached_session = None
+            if cached_session:
+                uid, full_version_str = cached_session
+                logger.info(f"Session Odoo en cache pour {username} (UID: {uid}) sur {url}")
+                return uid, odoo_proxy(url, 'common', protocol), odoo_proxy(url, 'object', protocol), full_version_str, None, True
+
+        common_proxy = odoo_proxy(url, 'common', protocol)
         version_info_dict = common_proxy.version()
-        logger.info(f"Odoo Server Info Dict (common.version): {version_info_dict} (URL: {url})")
-
-        # Première tentative avec server_version ou server_serie
-        server_version_api = version_info_dict.get('server_version')
-        server_serie_api = version_info_dict.get('server_serie')
-
-        if server_version_api:
-            full_version_str = server_version_api
-            # Vérifier si c'est une version SaaS avec un format comme "17.0+e-saas~17.3+e"
-            if "saas~" in server_version_api:
-                try:
-                    saas_part = server_version_api.split('saas~')[1].split('+')[0]
-                    if saas_part: # ex: "17.3"
-                         # Vérifier si saas_part est un format X.Y valide
-                        if len(saas_part.split('.')) >= 2:
-                            full_version_str = saas_part
-                            logger.info(f"Version SaaS détectée et formatée: {full_version_str}")
-                except IndexError:
-                    logger.warning(f"Format saas~ inattendu dans server_version: {server_version_api}")
-
-
-        elif server_serie_api:
-            full_version_str = server_serie_api
+        full_version_str = version_from_common_info(version_info_dict, url)
 
         uid = common_proxy.authenticate(db, username, password, {})
         if not uid:
             error_message = f"Échec de l'authentification Odoo pour {username} sur {db}@{url}"
             logger.error(error_message)
             # On retourne la version obtenue via common.version() même si l'auth échoue
-            return None, None, None, full_version_str, error_message
+            return None, None, None, full_version_str, error_message, False
 
-        object_proxy = xmlrpc.client.ServerProxy(f'{url}/xmlrpc/2/object')
+        object_proxy = odoo_proxy(url, 'object', protocol)
         logger.info(f"Authentification réussie pour {username} (UID: {uid}) sur {url}")
 
-        # Deuxième tentative : affiner la version avec ir.module.module pour 'base'
         try:
             base_module_data = object_proxy.execute_kw(
                 db, uid, password,
                 'ir.module.module', 'search_read',
-                [[('name', '=', 'base')]],
-                {'fields': ['latest_version'], 'limit': 1}
+                [BASE_MODULE_VERSION_DOMAIN],
+                BASE_MODULE_VERSION_OPTIONS
             )
-            if base_module_data and base_module_data[0].get('latest_version'):
-                module_latest_version = base_module_data[0]['latest_version']
-                logger.info(f"Version du module 'base' (latest_version): {module_latest_version}")
-                # Ex: "17.0.1.2.0" ou "17.0.saas~17.3.1"
-                # Si server_version contenait déjà une version SaaS plus précise (ex: 17.3), on la garde.
-                # Sinon, on essaie de formater module_latest_version.
-                if not ("saas~" in full_version_str and len(full_version_str.split('.')) >= 2 and full_version_str.split('.')[0] == module_latest_version.split('.')[0]):
-                    if module_latest_version:
-                        # Si module_latest_version contient "saas~", extraire cette partie
-                        if "saas~" in module_latest_version:
-                            try:
-                                saas_part_module = module_latest_version.split('saas~')[1].split('.')[0] + '.' + module_latest_version.split('saas~')[1].split('.')[1]
-                                if len(saas_part_module.split('.')) >= 2: # Assure X.Y
-                                    full_version_str = saas_part_module
-                                    logger.info(f"Version SaaS (module base) formatée: {full_version_str}")
-                            except IndexError:
-                                full_version_str = module_latest_version # Fallback au latest_version complet
-                        else:
-                            # Pour les versions comme "17.0.1.0.0", on pourrait prendre "17.0.1"
-                            parts = module_latest_version.split('.')
-                            if len(parts) >= 2:
-                                formatted_module_version = f"{parts[0]}.{parts[1]}"
-                                if len(parts) > 2 and parts[2] != '0': # Ajoute le troisième segment s'il n'est pas 0
-                                    formatted_module_version += f".{parts[2]}"
-                                full_version_str = formatted_module_version
-                                logger.info(f"Version module base formatée: {full_version_str}")
-                            else:
-                                full_version_str = module_latest_version # Fallback
-
+            full_version_str = refine_version_with_base_module(full_version_str, base_module_data)
         except Exception as e_mod:
             logger.warning(f"Impossible de récupérer la version depuis ir.module.module: {e_mod}. Utilisation de la version API: {full_version_str}")
             # On garde la version obtenue de common.version() si l'appel au module échoue
 
-        return uid, common_proxy, object_proxy, full_version_str, None
+        if store_session:
+            store_odoo_session(url, db, username, password, uid, full_version_str)
+        return uid, common_proxy, object_proxy, full_version_str, None, False
 
     except xmlrpc.client.Fault as e:
         error_message = f"Erreur XML-RPC Odoo ({url}): {e.faultCode} - {e.faultString}"
         logger.error(error_message)
-        return None, None, None, full_version_str, error_message
+        return None, None, None, full_version_str, error_message, False
     except ConnectionRefusedError as e:
         error_message = f"Connexion refusée par le serveur Odoo ({url}): {e}"
         logger.error(error_message)
-        return None, None, None, "Inconnue", error_message
+        return None, None, None, "Inconnue", error_message, False
+    except TimeoutError as e:
+        error_message = f"{ODOO_TIMEOUT_ERROR_PREFIX} ({url}): {e}"
+        logger.error(error_message)
+        return None, None, None, full_version_str, error_message, False
     except Exception as e:
         error_message = f"Erreur de connexion Odoo inattendue ({url}): {e}"
         logger.error(error_message, exc_info=True)
-        return None, None, None, full_version_str, error_message
+        return None, None, None, full_version_str, error_message, False
+
+
+def connect_odoo(url, db, username, password, protocol=None, use_session_cache=False, store_session=True):
+    """
+    open_odoo_session sans l'indicateur from_cache.
+    Retourne uid, common_proxy, object_proxy, full_version_str, error_message.
+    """
+    return open_odoo_session(url, db, username, password, protocol, use_session_cache, store_session)[:5]
 
 def encrypt_value(plain_text_value):
     if not settings.FERNET_KEY:
@@ -143,41 +642,105 @@ def decrypt_value(encrypted_b64_value):
         logger.error(f"Erreur inattendue lors du déchiffrement (utils): {e}", exc_info=True)
         return None
 
-def get_odoo_cabinet_collaborators():
-    collaborators_choices = []
-    try:
-        config = ConfigurationCabinet.objects.first()
-        if not config:
-            logger.error("Configuration Odoo Cabinet non trouvée (get_odoo_cabinet_collaborators).")
-            return collaborators_choices
-
-        api_key = decrypt_value(config.firm_odoo_encrypted_api_key)
-        if not api_key:
-            logger.error("Impossible de déchiffrer la clé API du cabinet (get_odoo_cabinet_collaborators).")
-            return collaborators_choices
-
-        uid, _, object_proxy, _, conn_error = connect_odoo(
-            config.firm_odoo_url,
-            config.firm_odoo_db,
-            config.firm_odoo_api_user,
-            api_key
+# --- Annuaire local des collaborateurs du cabinet ---
+# Taille des pages de search_read lors de la synchronisation (aucune limite sur le nombre total)
+COLLABORATOR_SYNC_PAGE_SIZE = 1000
+# Part maximale de l'annuaire qu'une synchronisation peut supprimer : au-delà (ou si Odoo ne renvoie aucun
+# partenaire), les disparitions sont ignorées, le plus probable étant une perte de droits de l'utilisateur API
+COLLABORATOR_SYNC_MAX_PRUNE_RATIO = 0.5
+
+_collaborator_refresh_lock = threading.Lock()
+
+
+def sync_cabinet_collaborators():
+    """
+    Synchronise l'annuaire local (CollaborateurCabinet) avec les partenaires internes de l'Odoo cabinet :
+    lecture paginée, upsert en bloc et suppression des partenaires disparus, en une transaction. Les partenaires
+    disparus ne sont pas supprimés si Odoo n'en renvoie aucun ou si plus de COLLABORATOR_SYNC_MAX_PRUNE_RATIO de
+    l'annuaire disparaît d'un coup.
+    Retourne le nombre de collaborateurs synchronisés ; lève une exception si l'Odoo cabinet est inaccessible.
+    """
+    config = ConfigurationCabinet.objects.first()
+    if not config:
+        raise ValueError("Configuration Odoo Cabinet non trouvée.")
+    api_key = decrypt_value(config.firm_odoo_encrypted_api_key)
+    if not api_key:
+        raise ValueError("Impossible de déchiffrer la clé API du cabinet.")
+    uid, _, object_proxy, _, conn_error = connect_odoo(
+        config.firm_odoo_url,
+        config.firm_odoo_db,
+        config.firm_odoo_api_user,
+        api_key
+    )
+    if not uid:
+        raise ConnectionError(conn_error)
+
+    collaborators = {}
+    offset = 0
+    while True:
+        page = object_proxy.execute_kw(
+            config.firm_odoo_db, uid, api_key,
+            'res.partner', 'search_read',
+            [[("partner_share", "=", False)]],
+            {'fields': ['name'], 'order': 'id', 'limit': COLLABORATOR_SYNC_PAGE_SIZE, 'offset': offset}
         )
+        for partner in page:
+            collaborators[str(partner['id'])] = partner['name']
+        if len(page) < COLLABORATOR_SYNC_PAGE_SIZE:
+            break
+        offset += COLLABORATOR_SYNC_PAGE_SIZE
 
-        if conn_error:
-            logger.error(f"Erreur de connexion lors de la récupération des collaborateurs: {conn_error}")
-            return collaborators_choices
-
-        if uid and object_proxy:
-            domain = [("partner_share", "=", False)]
-            fields = ['name']
-            order = 'name'
-            collaborator_data = object_proxy.execute_kw(
-                config.firm_odoo_db, uid, api_key,
-                'res.partner', 'search_read',
-                [domain],
-                {'fields': fields, 'order': order, 'limit': 200}
-            )
-            collaborators_choices = [(str(c['id']), c['name']) for c in collaborator_data]
-    except Exception as e:
-        logger.error(f"Erreur lors de la récupération des collaborateurs Odoo Cabinet: {e}", exc_info=True)
-    return collaborators_choices
+    synced_at = timezone.now()
+    with transaction.atomic():
+        CollaborateurCabinet.objects.bulk_create(
+            [CollaborateurCabinet(odoo_partner_id=partner_id, name=name, synced_at=synced_at)
+             for partner_id, name in collaborators.items()],
+            update_conflicts=True, unique_fields=['odoo_partner_id'], update_fields=['name', 'synced_at'],
+            batch_size=COLLABORATOR_SYNC_PAGE_SIZE
+        )
+        stale = CollaborateurCabinet.objects.filter(synced_at__lt=synced_at)
+        stale_count = stale.count()
+        known_count = stale_count + len(collaborators)
+        if stale_count and (not collaborators or stale_count > known_count * COLLABORATOR_SYNC_MAX_PRUNE_RATIO):
+            logger.warning(
+                f"Synchronisation des collaborateurs : {len(collaborators)} partenaire(s) interne(s) lu(s) sur "
+                f"{known_count} connu(s) ; {stale_count} disparition(s) ignorée(s) (droits de l'utilisateur API "
+                f"sur res.partner ?).")
+        else:
+            stale.delete()
+    logger.info(f"Annuaire des collaborateurs du cabinet synchronisé : {len(collaborators)} collaborateur(s).")
+    return len(collaborators)
+
+
+def _refresh_collaborators_in_background():
+    """Resynchronise l'annuaire dans un thread ; une seule resynchronisation à la fois."""
+    if not _collaborator_refresh_lock.acquire(blocking=False):
+        return
+
+    def refresh():
+        try:
+            sync_cabinet_collaborators()
+        except Exception as e:
+            logger.error(f"Erreur lors de la synchronisation des collaborateurs Odoo Cabinet: {e}", exc_info=True)
+        finally:
+            connections.close_all()
+            _collaborator_refresh_lock.release()
+
+    threading.Thread(target=refresh, name='collaborator-directory-refresh', daemon=True).start()
+
+
+def get_odoo_cabinet_collaborators():
+    """
+    Choix (id partenaire, nom) des collaborateurs du cabinet, lus dans l'annuaire local.
+    Annuaire vide : synchronisation immédiate. Annuaire plus ancien que COLLABORATOR_DIRECTORY_TTL :
+    les données en place sont servies et la resynchronisation se fait en arrière-plan (stale-while-revalidate).
+    """
+    oldest_sync = CollaborateurCabinet.objects.aggregate(oldest=Min('synced_at'))['oldest']
+    if oldest_sync is None:
+        try:
+            sync_cabinet_collaborators()
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des collaborateurs Odoo Cabinet: {e}", exc_info=True)
+    elif oldest_sync < timezone.now() - timedelta(seconds=settings.COLLABORATOR_DIRECTORY_TTL):
+        _refresh_collaborators_in_background()
+    return list(CollaborateurCabinet.objects.order_by('name').values_list('odoo_partner_id', 'name'))
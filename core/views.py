@@ -1,14 +1,15 @@
 # core/views.py
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Max, Q
-from .models import IndicateursHistoriques, UserProfile, ClientsOdoo
+from django.db.models import Exists, OuterRef, Q
+from .models import IndicateursHistoriques, UserProfile, ClientsOdoo, ExtractionJob, ExtractionRun
+from .jobs import enqueue_extraction_job, ExtractionJobActive
 from collections import defaultdict
 import logging
 
-from django.core.management import call_command
 from django.contrib import messages
 from django.urls import reverse
+from django.utils.dateparse import parse_datetime
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +43,7 @@ INDICATOR_CATEGORIES = {
     ],
     'Santé financière': [
         'marge brute 30j',
+        'resultat_provisoire_annee_courante',
     ],
     # La catégorie "Divers" est spéciale et gérée différemment pour l'affichage des colonnes.
     # Elle peut être vide ici si elle ne contient aucun indicateur stocké en BDD.
@@ -98,16 +100,19 @@ def dashboard_view(request):
     show_extraction_date_column = False
 
     current_data_qs = base_qs_for_filter_options
-    if current_data_qs.exists():
-        latest_run_agg = current_data_qs.aggregate(latest_run=Max('extraction_timestamp'))
-        latest_run_timestamp = latest_run_agg.get('latest_run')
-
-    if latest_run_timestamp:
+    # Dernière exécution finalisée ayant des indicateurs visibles par l'utilisateur : les exécutions sont
+    # parcourues de la plus récente à la plus ancienne (index status/extraction_timestamp), chacune vérifiée
+    # par une recherche sur l'index (run, client) des indicateurs. Les exécutions non finalisées (en cours ou
+    # interrompues, cf. fetch_indicators --resume) ne sont pas affichées.
+    latest_run = ExtractionRun.objects.filter(status=ExtractionRun.STATUS_FINALIZED) \
+        .filter(Exists(current_data_qs.filter(run=OuterRef('pk')))) \
+        .order_by('-extraction_timestamp').first()
+
+    if latest_run:
+        latest_run_timestamp = latest_run.extraction_timestamp
         logger.info(
             f"Dernier timestamp trouvé pour l'utilisateur {user.username} ({user_role}): {latest_run_timestamp}")
-        latest_indicators_qs = current_data_qs.filter(
-            extraction_timestamp=latest_run_timestamp
-        )
+        latest_indicators_qs = current_data_qs.filter(run=latest_run)
 
         if selected_collaborator_name:
             latest_indicators_qs = latest_indicators_qs.filter(
@@ -195,18 +200,46 @@ def dashboard_view(request):
 # --- VUE POUR EXÉCUTER LA COMMANDE D'EXTRACTION ---
 @user_passes_test(lambda u: u.is_staff and u.is_superuser)
 def trigger_fetch_indicators_view(request):
-    # ... (code inchangé)
+    # L'extraction est exécutée en arrière-plan (core.jobs) : la requête rend la main immédiatement
     if request.method == 'POST':
         try:
-            logger.info(f"Lancement de fetch_indicators par l'utilisateur: {request.user.username}")
-            call_command('fetch_indicators')
-            messages.success(request,
-                             "L'extraction des indicateurs a été lancée avec succès. Les données seront mises à jour sous peu.")
+            job = enqueue_extraction_job(request.user)
+        except ExtractionJobActive as e:
+            messages.warning(request, f"{e} Suivez son avancement ci-dessous.")
+            return redirect(reverse('core:extraction_job_status', args=[e.job.pk]))
         except Exception as e:
             logger.error(f"Erreur lors du lancement de fetch_indicators via l'admin par {request.user.username}: {e}",
                          exc_info=True)
             messages.error(request, f"Une erreur est survenue lors du lancement de l'extraction : {e}")
-        return redirect(reverse('admin:index'))
+            return redirect(reverse('admin:index'))
+        logger.info(f"Extraction {job.pk} mise en file par l'utilisateur: {request.user.username}")
+        messages.success(request,
+                         "L'extraction des indicateurs a été lancée en arrière-plan. Les données seront mises à jour sous peu.")
+        return redirect(reverse('core:extraction_job_status', args=[job.pk]))
     else:
         messages.warning(request, "Cette action doit être déclenchée via un formulaire POST.")
         return redirect(reverse('admin:index'))
+
+
+# --- VUE DE SUIVI DES EXTRACTIONS ---
+@user_passes_test(lambda u: u.is_staff)
+def extraction_job_status_view(request, job_id=None):
+    """Avancement d'une extraction (par défaut la plus récente), client par client."""
+    if job_id is None:
+        job = ExtractionJob.objects.first()
+    else:
+        job = get_object_or_404(ExtractionJob, pk=job_id)
+    client_rows = []
+    if job:
+        # Entrées indexées par id client ; les jobs plus anciens étaient indexés par nom
+        client_rows = sorted(
+            ({**entry, 'name': entry.get('name', key), 'finished_at': parse_datetime(entry.get('finished_at') or '')}
+             for key, entry in job.client_progress.items()),
+            key=lambda row: row['name'].lower())
+    context = {
+        'page_title': "Suivi de l'extraction",
+        'job': job,
+        'client_rows': client_rows,
+        'recent_jobs': ExtractionJob.objects.select_related('requested_by')[:10],
+    }
+    return render(request, 'core/extraction_job_status.html', context)